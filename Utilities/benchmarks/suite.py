@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark definitions for the Utilities scripts.
+Each benchmark has a setup function (untimed, prepares its input from the
+synthetic tree) and a run function (timed). The scripts are imported
+lazily, so a benchmark whose script cannot be imported (e.g. missing
+'lxml' for merge_code.py) is skipped instead of failing the suite.
+"""
+
+import atexit
+import importlib
+import io
+import json
+import logging
+import shutil
+from pathlib import Path
+
+# --- Constants ---
+# Settings matching the scripts' defaults for the file types the generator writes
+EXCLUDE_DIRS = {'.git', '.vs', 'obj', 'bin', 'pkg', 'node_modules', 'testresults', 'coveragereports'}
+ALLOWED_EXTS = {'.cs', '.csproj', '.resx', '.json'}
+XML_EXTS = {'.csproj', '.resx'}
+JSON_EXTS = {'.json'}
+CSHARP_EXTS = {'.cs'}
+CLEAN_DIR_NAMES = ['obj', 'bin', 'pkg', 'testresults', 'coveragereports', '__pycache__']
+CLEAN_SKIP_DIRS = ['.git', 'node_modules']
+
+# Scripts that exited while being imported (they are not retried)
+FAILED_IMPORTS: dict[str, str] = {}
+# Queue listener of the merge_verbose benchmark; a new setup replaces it, so one runs per process
+MERGE_VERBOSE_LISTENER: dict = {}
+
+
+def import_script(module_name: str):
+    """
+    Imports one of the Utilities scripts.
+
+    Raises:
+        ImportError: If the script or one of its dependencies cannot be imported
+                     (the scripts exit on missing dependencies; that is reported the same way).
+    """
+    if module_name in FAILED_IMPORTS:
+        raise ImportError(FAILED_IMPORTS[module_name])
+    try:
+        return importlib.import_module(module_name)
+    except SystemExit:
+        FAILED_IMPORTS[module_name] = f"'{module_name}' could not import its dependencies"
+        raise ImportError(FAILED_IMPORTS[module_name])
+
+
+def source_files(tree_dir: Path) -> list[Path]:
+    """Lists the files merge_code.py would include, in walk order."""
+    files = []
+    for path in sorted(tree_dir.rglob('*')):
+        if path.is_file() and path.suffix.lower() in ALLOWED_EXTS \
+                and not EXCLUDE_DIRS.intersection(p.lower() for p in path.relative_to(tree_dir).parts[:-1]):
+            files.append(path)
+    return files
+
+
+# --- Benchmarks ---
+
+def setup_walk(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Imports list_project_structure.py."""
+    module = import_script("list_project_structure")
+    return module, tree_dir
+
+
+def run_walk(state):
+    """list_project_structure.py: full walk without snapshot cache, rendered as Markdown."""
+    module, tree_dir = state
+    events = module.walk_directory(tree_dir, 0, EXCLUDE_DIRS, ALLOWED_EXTS, {}, {})
+    render_markdown, _ = module.RENDERERS["markdown"]
+    render_markdown(events, io.StringIO(), tree_dir.name, "  ")
+
+
+def setup_read(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Imports merge_code.py and lists the files to read."""
+    return import_script("merge_code"), source_files(tree_dir), logger
+
+
+def run_read(state):
+    """merge_code.py: read and decode every included file (no compaction)."""
+    module, files, logger = state
+    for path in files:
+        module.read_file_content(path, logger, XML_EXTS, JSON_EXTS, CSHARP_EXTS, False, False)
+
+
+def run_compact(state):
+    """merge_code.py: read every included file with XML and JSON compaction."""
+    module, files, logger = state
+    for path in files:
+        module.read_file_content(path, logger, XML_EXTS, JSON_EXTS, CSHARP_EXTS, True, True)
+
+
+def setup_merge(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Imports merge_code.py."""
+    return import_script("merge_code"), tree_dir, logger
+
+
+def run_merge(state):
+    """merge_code.py: process_folder over the whole tree (walk, read, compact); merge_verbose logs at DEBUG to a file."""
+    module, tree_dir, logger = state
+    module.process_folder(tree_dir, tree_dir, logger, EXCLUDE_DIRS, ALLOWED_EXTS,
+                          XML_EXTS, JSON_EXTS, CSHARP_EXTS, True, True)
+
+
+def setup_merge_verbose(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Imports merge_code.py and routes a DEBUG logger through its queue listener to a log file."""
+    module = import_script("merge_code")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.FileHandler(work_dir / "merge_verbose.log", mode='w', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'))
+    verbose_logger = logging.getLogger("benchmarks.merge_verbose.file")
+    verbose_logger.propagate = False
+    previous = MERGE_VERBOSE_LISTENER.pop("listener", None)
+    if previous is not None:
+        previous.stop()
+        atexit.unregister(previous.stop)
+        for handler in previous.handlers:
+            handler.close()
+    MERGE_VERBOSE_LISTENER["listener"] = module.start_log_listener(verbose_logger, [file_handler], logging.DEBUG)
+    return module, tree_dir, verbose_logger
+
+
+def setup_serialize(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Builds the merged tree that is serialized."""
+    module = import_script("merge_code")
+    return module.process_folder(tree_dir, tree_dir, logger, EXCLUDE_DIRS, ALLOWED_EXTS,
+                                 XML_EXTS, JSON_EXTS, CSHARP_EXTS, False, False)
+
+
+def run_serialize(root_data):
+    """merge_code.py: write the merged tree as compact JSON."""
+    json.dump(root_data, io.StringIO(), ensure_ascii=False, separators=(',', ':'))
+
+
+def setup_clean(tree_dir: Path, work_dir: Path, logger: logging.Logger):
+    """Copies the tree so the round can delete its build output."""
+    module = import_script("clear_artifacts")
+    # Every round deletes its own fresh copy of the tree
+    copy_dir = work_dir / "clean"
+    shutil.rmtree(copy_dir, ignore_errors=True)
+    shutil.copytree(tree_dir, copy_dir, symlinks=True)
+    return module, copy_dir, logger
+
+
+def run_clean(state):
+    """clear_artifacts.py: find and remove bin/obj (node_modules skipped)."""
+    module, copy_dir, logger = state
+    dir_paths, file_paths = module.find_targets(copy_dir, CLEAN_DIR_NAMES, ['*.orig'], CLEAN_SKIP_DIRS, logger)
+    module.clean_directories(dir_paths, CLEAN_DIR_NAMES, logger, False, False)
+    module.clean_files(file_paths, logger, False, False)
+
+
+# Benchmark name -> (setup function, run function, whether setup runs before every round)
+BENCHMARKS = {
+    "walk": (setup_walk, run_walk, False),
+    "read": (setup_read, run_read, False),
+    "compact": (setup_read, run_compact, False),
+    "merge": (setup_merge, run_merge, False),
+    "merge_verbose": (setup_merge_verbose, run_merge, False),
+    "serialize": (setup_serialize, run_serialize, False),
+    "clean": (setup_clean, run_clean, True),
+}
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic synthetic repository generator for the benchmarks.
+Builds a .NET-style source tree (projects with nested folders of .cs,
+.csproj, .resx and .json files) plus fake bin/obj/node_modules build
+output, so the Utilities scripts can be timed on a reproducible tree
+without network access or a real checkout.
+The same seed and settings always produce the same files and contents.
+"""
+
+import random
+from pathlib import Path
+
+# --- Constants ---
+# Tree presets: projects, source files per project, folder depth, average file size in bytes,
+# files per build output folder
+PRESETS = {
+    "small": {"projects": 4, "files_per_project": 25, "depth": 2, "file_size": 2048, "artifact_files": 10},
+    "medium": {"projects": 12, "files_per_project": 80, "depth": 3, "file_size": 4096, "artifact_files": 40},
+    "large": {"projects": 40, "files_per_project": 200, "depth": 4, "file_size": 6144, "artifact_files": 100},
+}
+# Share of each source file type (the rest of each project is .cs)
+FILE_MIX = {".json": 0.08, ".resx": 0.05}
+WORDS = ["Asset", "Board", "Campaign", "Character", "Encounter", "Game", "Layer", "Map", "Media", "Player",
+         "Scene", "Session", "Stage", "Token", "User", "World"]
+
+
+def _identifier(rng: random.Random, parts: int = 2) -> str:
+    """Returns a PascalCase identifier made of random words."""
+    return "".join(rng.choice(WORDS) for _ in range(parts))
+
+
+def csharp_source(rng: random.Random, namespace: str, size: int) -> str:
+    """Returns a C# file of about `size` characters (usings, a namespace, a class with members)."""
+    class_name = _identifier(rng) + rng.choice(["Service", "Handler", "Model", "Tests"])
+    lines = ["using System;", "using System.Collections.Generic;", "using System.Threading.Tasks;", "",
+             f"namespace {namespace};", "", f"/// <summary>Handles {class_name}.</summary>",
+             f"public sealed class {class_name} {{"]
+    length = sum(len(line) + 1 for line in lines)
+    member = 0
+    while length < size:
+        member += 1
+        name = _identifier(rng)
+        body = [f"    private readonly List<string> _{name.lower()}{member} = [];", "",
+                f"    public async Task<int> {name}{member}Async(string value, int count) {{",
+                "        if (string.IsNullOrWhiteSpace(value)) return 0;",
+                f"        var text = \"{name} {{0}} \\\"quoted\\\" // not a comment\";",
+                "        for (var i = 0; i < count; i++) {",
+                f"            _{name.lower()}{member}.Add(string.Format(text, i));",
+                "        }",
+                "        await Task.Yield();",
+                f"        return _{name.lower()}{member}.Count; // {rng.randint(0, 9999)}",
+                "    }", ""]
+        lines.extend(body)
+        length += sum(len(line) + 1 for line in body)
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def csproj_source(rng: random.Random, references: list[str]) -> str:
+    """Returns an SDK-style .csproj with package and project references."""
+    items = "\n".join(f'    <ProjectReference Include="..\\{r}\\{r}.csproj" />' for r in references)
+    packages = "\n".join(f'    <PackageReference Include="Package.{_identifier(rng)}" Version="{rng.randint(1, 9)}.0.0" />'
+                         for _ in range(rng.randint(1, 5)))
+    return ('<Project Sdk="Microsoft.NET.Sdk">\n\n'
+            '  <PropertyGroup>\n    <TargetFramework>net9.0</TargetFramework>\n'
+            '    <Nullable>enable</Nullable>\n  </PropertyGroup>\n\n'
+            f'  <ItemGroup>\n{packages}\n  </ItemGroup>\n\n'
+            f'  <ItemGroup>\n{items}\n  </ItemGroup>\n\n</Project>\n')
+
+
+def resx_source(rng: random.Random, size: int) -> str:
+    """Returns a .resx resource file of about `size` characters."""
+    entries = []
+    length = 0
+    while length < size:
+        entry = (f'  <data name="{_identifier(rng, 3)}{len(entries)}" xml:space="preserve">\n'
+                 f'    <value>{" ".join(rng.choice(WORDS) for _ in range(8))}</value>\n  </data>')
+        entries.append(entry)
+        length += len(entry) + 1
+    return '<?xml version="1.0" encoding="utf-8"?>\n<root>\n' + "\n".join(entries) + "\n</root>\n"
+
+
+def json_source(rng: random.Random, size: int) -> str:
+    """Returns an indented JSON settings file of about `size` characters."""
+    entries = []
+    length = 0
+    while length < size:
+        entry = (f'    "{_identifier(rng)}{len(entries)}": {{\n      "Enabled": {rng.choice(["true", "false"])},\n'
+                 f'      "Limit": {rng.randint(0, 1000)},\n      "Name": "{rng.choice(WORDS)}"\n    }}')
+        entries.append(entry)
+        length += len(entry) + 2
+    return '{\n  "Settings": {\n' + ",\n".join(entries) + "\n  }\n}\n"
+
+
+def _write(path: Path, content: str | bytes, stats: dict):
+    """Writes one generated file and counts it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    path.write_bytes(content)
+    stats["files"] += 1
+    stats["bytes"] += len(content)
+
+
+def generate_tree(root: Path, seed: int = 42, projects: int = 12, files_per_project: int = 80, depth: int = 3,
+                  file_size: int = 4096, artifact_files: int = 40) -> dict:
+    """
+    Generates a synthetic solution tree below `root`.
+
+    Each project folder holds a .csproj (referencing earlier projects), source
+    files spread over nested folders up to `depth` levels, and bin/obj build
+    output. A node_modules folder sits next to the projects.
+
+    Args:
+        root: Directory to create the tree in (created if missing).
+        seed: Random seed; the same seed and settings give the same tree.
+        projects: Number of projects.
+        files_per_project: Number of source files per project.
+        depth: Maximum folder nesting below each project.
+        file_size: Average source file size in bytes.
+        artifact_files: Number of files in each bin, obj and node_modules folder.
+
+    Returns:
+        Dictionary of counts: {"files", "bytes", "source_files", "artifact_dirs"}.
+    """
+    rng = random.Random(seed)
+    stats = {"files": 0, "bytes": 0, "source_files": 0, "artifact_dirs": 0}
+    project_names = [f"VttTools.{_identifier(rng, 1)}{index}" for index in range(projects)]
+
+    for index, project_name in enumerate(project_names):
+        project_dir = root / project_name
+        references = rng.sample(project_names[:index], min(index, 3))
+        _write(project_dir / f"{project_name}.csproj", csproj_source(rng, references), stats)
+
+        folders = [Path()]
+        for _ in range(max(1, files_per_project // 10)):
+            parent = rng.choice(folders)
+            if len(parent.parts) < depth:
+                folders.append(parent / _identifier(rng, 1))
+        for file_index in range(files_per_project):
+            folder = project_dir / rng.choice(folders)
+            size = max(64, int(rng.gauss(file_size, file_size / 3)))
+            kind = rng.random()
+            if kind < FILE_MIX[".json"]:
+                _write(folder / f"settings{file_index}.json", json_source(rng, size), stats)
+            elif kind < FILE_MIX[".json"] + FILE_MIX[".resx"]:
+                _write(folder / f"Resources{file_index}.resx", resx_source(rng, size), stats)
+            else:
+                namespace = ".".join([project_name] + list(folder.relative_to(project_dir).parts))
+                _write(folder / f"{_identifier(rng)}{file_index}.cs", csharp_source(rng, namespace, size), stats)
+            stats["source_files"] += 1
+
+        for artifact_dir in (project_dir / "bin" / "Debug" / "net9.0", project_dir / "obj" / "Debug"):
+            for artifact_index in range(artifact_files):
+                _write(artifact_dir / f"{project_name}.{artifact_index}.dll", rng.randbytes(file_size // 2), stats)
+            stats["artifact_dirs"] += 1
+
+    modules_dir = root / "node_modules"
+    for artifact_index in range(artifact_files):
+        package_dir = modules_dir / f"package-{artifact_index % 10}"
+        _write(package_dir / f"index{artifact_index}.js", f"module.exports = {artifact_index};\n" * 20, stats)
+    stats["artifact_dirs"] += 1
+    return stats
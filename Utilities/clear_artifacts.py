@@ -4,16 +4,33 @@
 """
 Refactored Python script to clean build artifacts, test results, and
 temporary files recursively based on configurable directory names and
-file patterns. Includes logging and a dry-run mode.
+file patterns, using a single pruning pass over the tree. Includes logging
+and a dry-run mode.
 """
 
 import os
 import shutil
+import stat
+import subprocess
 import sys
+import time
 import argparse
+import fnmatch
 import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Assuming 'imports' is a folder in the same directory as this script.
+try:
+    from imports.csproj_utils import build_project_graph, find_dependents, map_files_to_projects, select_projects
+    from imports.git_utils import changed_files_since
+    from imports.profile_utils import add_profile_arguments, run_main
+except ImportError as e:
+    print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'csproj_utils.py', 'git_utils.py' and 'profile_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
 # --- Constants ---
 # ANSI escape codes for colors (optional)
 COLOR_YELLOW = "\033[93m"
@@ -23,6 +40,16 @@ COLOR_RESET = "\033[0m"
 # Default lists (can be overridden by command line args)
 DEFAULT_DIRS_TO_CLEAN = ['obj', 'bin', 'pkg', 'testresults', 'coveragereports', '__pycache__']
 DEFAULT_FILES_TO_CLEAN = ['*.orig']
+# Directories that are never searched (nothing in them is ours to clean)
+DEFAULT_DIRS_TO_SKIP = ['.git', 'node_modules']
+
+# Units accepted by --keep-under and --older-than
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Deferred mode: targets are renamed into <base>/TRASH_DIR_NAME/<batch> and purged in the background
+TRASH_DIR_NAME = '.clear_artifacts_trash'
+TRASH_LOG_NAME = 'purge.log'
 
 # --- Logging Setup ---
 log = logging.getLogger(__name__)
@@ -38,6 +65,177 @@ def colorize(text: str, color_code: str, use_color: bool) -> str:
     """Applies ANSI color codes to text if use_color is True."""
     return f"{color_code}{text}{COLOR_RESET}" if use_color else text
 
+def format_size(num_bytes: int) -> str:
+    """Formats a byte count for humans (binary units)."""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def parse_size(text: str) -> int:
+    """Parses a size such as '20GB', '500M' or '1048576' into bytes (binary units)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*", text.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid size: '{text}' (expected e.g. 500MB or 20GB)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+def parse_duration(text: str) -> float:
+    """Parses a duration such as '7d', '12h', '30m' or '2w' into seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", text.lower())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration: '{text}' (expected e.g. 12h or 7d)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+def measure_tree(root: Path) -> tuple[int, int, float]:
+    """
+    Counts the files and bytes below a directory (like 'du', using os.scandir)
+    and finds the most recent use (access or modification) of any of its files.
+
+    Symbolic links are counted as entries but never followed. A file path is
+    measured as a single file.
+
+    Returns:
+        Tuple of (file count, total size in bytes, newest atime/mtime timestamp).
+    """
+    try:
+        if not root.is_dir() or root.is_symlink():
+            file_stat = root.lstat()
+            return 1, file_stat.st_size, max(file_stat.st_atime, file_stat.st_mtime)
+    except OSError:
+        return 0, 0, 0.0
+
+    file_count = total_bytes = 0
+    newest_use = 0.0
+    pending = [root]
+    while pending:
+        current_dir = pending.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        else:
+                            entry_stat = entry.stat(follow_symlinks=False)
+                            file_count += 1
+                            total_bytes += entry_stat.st_size
+                            newest_use = max(newest_use, entry_stat.st_atime, entry_stat.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return file_count, total_bytes, newest_use
+
+def measure_targets(paths: list[Path], logger: logging.Logger) -> dict[Path, tuple[int, int, float]]:
+    """Measures all targets in parallel (one target per worker thread)."""
+    if not paths:
+        return {}
+    start_time = time.monotonic()
+    with ThreadPoolExecutor() as executor:
+        sizes = dict(zip(paths, executor.map(measure_tree, paths)))
+    logger.debug(f"Measured {len(paths)} targets in {time.monotonic() - start_time:.2f}s.")
+    return sizes
+
+def select_evictions(dir_sizes: dict[Path, tuple[int, int, float]], keep_under: int | None,
+                     older_than: float | None, logger: logging.Logger) -> list[Path]:
+    """
+    Treats build outputs as a cache and picks the directories to evict.
+
+    Targets are grouped per project (their parent directory) and a project's
+    outputs are evicted together. Projects not used for longer than older_than
+    seconds are evicted first; then, while the outputs that remain exceed
+    keep_under bytes, the least recently used projects are evicted.
+
+    Args:
+        dir_sizes: Measured directory targets (see measure_tree()).
+        keep_under: Budget in bytes for the outputs that are kept (None for no budget).
+        older_than: Staleness limit in seconds (None for no limit).
+        logger: Logger instance.
+
+    Returns:
+        The directories to remove, sorted by path.
+    """
+    projects: dict[Path, list] = {}
+    for path, (_, num_bytes, newest_use) in dir_sizes.items():
+        project = projects.setdefault(path.parent, [[], 0, 0.0])
+        project[0].append(path)
+        project[1] += num_bytes
+        project[2] = max(project[2], newest_use)
+
+    now = time.time()
+    # Least recently used first
+    remaining = sorted(projects.items(), key=lambda item: item[1][2])
+    kept_bytes = sum(project[1] for _, project in remaining)
+    evicted = []
+
+    def evict(project_dir: Path, project: list, reason: str):
+        nonlocal kept_bytes
+        age_days = (now - project[2]) / 86400
+        logger.info(f"Evicting outputs of '{project_dir}' ({format_size(project[1])}, last used {age_days:.1f} days ago): {reason}.")
+        evicted.extend(project[0])
+        kept_bytes -= project[1]
+
+    if older_than is not None:
+        stale = [item for item in remaining if now - item[1][2] > older_than]
+        for project_dir, project in stale:
+            evict(project_dir, project, "stale")
+        remaining = [item for item in remaining if item not in stale]
+
+    if keep_under is not None:
+        while remaining and kept_bytes > keep_under:
+            project_dir, project = remaining.pop(0)
+            evict(project_dir, project, "over budget")
+
+    for project_dir, project in remaining:
+        logger.debug(f"Keeping outputs of '{project_dir}' ({format_size(project[1])}).")
+    logger.info(f"Evicting {len(projects) - len(remaining)} of {len(projects)} projects; "
+                f"keeping {format_size(kept_bytes)} of build outputs.")
+    return sorted(evicted)
+
+def target_category(path: Path, file_patterns: list[str]) -> str:
+    """Returns the report category of a target: its directory name or the file pattern it matched."""
+    name_lower = path.name.lower()
+    for pattern in file_patterns:
+        if fnmatch.fnmatchcase(name_lower, pattern.lower()):
+            return pattern.lower()
+    return name_lower
+
+def report_space(sizes: dict[Path, tuple[int, int, float]], file_patterns: list[str],
+                 logger: logging.Logger, dry_run: bool, use_color: bool):
+    """
+    Logs the files and bytes per target, per category and in total.
+
+    In a real run, targets that still exist at their original path after
+    cleaning were not (fully) removed and are left out of the totals.
+    """
+    logger.info(colorize("--- Space Report ---", COLOR_YELLOW, use_color))
+    if not sizes:
+        logger.info("Nothing to reclaim.")
+        return
+
+    categories: dict[str, list[int]] = {}
+    total_files = total_bytes = 0
+    for path, (file_count, num_bytes, _) in sorted(sizes.items(), key=lambda item: item[1][1], reverse=True):
+        if not dry_run and path.exists():
+            logger.warning(f"{path}: not fully removed ({file_count} files, {format_size(num_bytes)} before cleaning)")
+            continue
+        logger.info(f"{format_size(num_bytes):>10} {file_count:>8} files  {path}")
+        category = categories.setdefault(target_category(path, file_patterns), [0, 0, 0])
+        category[0] += 1
+        category[1] += file_count
+        category[2] += num_bytes
+        total_files += file_count
+        total_bytes += num_bytes
+
+    logger.info("By category:")
+    for name, (target_count, file_count, num_bytes) in sorted(categories.items(), key=lambda item: item[1][2], reverse=True):
+        logger.info(f"{format_size(num_bytes):>10} {file_count:>8} files  {name} ({target_count} targets)")
+
+    action = "Would reclaim" if dry_run else "Reclaimed"
+    logger.info(colorize(f"{action} {format_size(total_bytes)} ({total_bytes} bytes) in {total_files} files.", COLOR_YELLOW, use_color))
+
 def remove_directory(dir_path: Path, logger: logging.Logger, dry_run: bool, use_color: bool):
     """Removes a directory and its contents, handling errors and dry-run."""
     if not dir_path.is_dir():
@@ -59,6 +257,108 @@ def remove_directory(dir_path: Path, logger: logging.Logger, dry_run: bool, use_
             error_msg = f"Error removing directory {dir_path}: {e}"
             logger.error(colorize(error_msg, COLOR_RED, use_color))
 
+def move_to_trash(dir_path: Path, batch_dir: Path, index: int, logger: logging.Logger, dry_run: bool, use_color: bool) -> bool:
+    """
+    Atomically renames a directory into the trash batch directory.
+
+    Returns:
+        True if the directory was moved (or would be, in dry run), False if the
+        rename failed (e.g. the target is on another filesystem or in use).
+    """
+    if not dir_path.is_dir():
+        logger.debug(f"Skipping '{dir_path}' as it is not a directory or does not exist.")
+        return True
+
+    action = "Would move" if dry_run else "Moving"
+    logger.info(f"{action} directory to trash: \"{dir_path}\"")
+    if dry_run:
+        return True
+
+    try:
+        # The index keeps equally named targets ('bin', 'obj', ...) apart
+        os.rename(dir_path, batch_dir / f"{index:05d}-{dir_path.name}")
+        return True
+    except OSError as e:
+        logger.warning(colorize(f"Could not move {dir_path} to trash ({e}). Removing it now.", COLOR_YELLOW, use_color))
+        return False
+
+def purge_tree(root: Path, logger: logging.Logger) -> tuple[int, int, int]:
+    """
+    Deletes a directory tree bottom-up without following symbolic links.
+
+    Returns:
+        Tuple of (files removed, bytes removed, errors).
+    """
+    files_removed = bytes_removed = errors = 0
+    for dir_path, dir_names, file_names in os.walk(root, topdown=False):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            try:
+                size = os.lstat(path).st_size
+                try:
+                    os.unlink(path)
+                except PermissionError:
+                    # Read-only files cannot be deleted on Windows
+                    os.chmod(path, stat.S_IWRITE)
+                    os.unlink(path)
+                files_removed += 1
+                bytes_removed += size
+            except OSError as e:
+                errors += 1
+                logger.debug(f"Could not remove file {path}: {e}")
+        for name in dir_names:
+            path = os.path.join(dir_path, name)
+            try:
+                if os.path.islink(path) and os.name != 'nt':
+                    os.unlink(path)
+                else:
+                    os.rmdir(path)
+            except OSError as e:
+                errors += 1
+                logger.debug(f"Could not remove directory {path}: {e}")
+    try:
+        os.rmdir(root)
+    except OSError as e:
+        errors += 1
+        logger.debug(f"Could not remove directory {root}: {e}")
+    return files_removed, bytes_removed, errors
+
+def start_background_purge(batch_dir: Path, logger: logging.Logger) -> int | None:
+    """
+    Starts a detached copy of this script that deletes the trash batch directory.
+
+    Returns:
+        The process id of the background purge, or None if it could not be started.
+    """
+    log_path = batch_dir.parent / TRASH_LOG_NAME
+    command = [sys.executable, str(Path(__file__).resolve()),
+               "--purge-trash", str(batch_dir), "--purge-log", str(log_path)]
+    options = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == 'nt':
+        options["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options["start_new_session"] = True # Survive the terminal/session of the caller
+
+    try:
+        process = subprocess.Popen(command, **options)
+    except OSError as e:
+        logger.error(f"Could not start background purge of '{batch_dir}': {e}")
+        return None
+    logger.info(f"Background purge of '{batch_dir}' started (pid {process.pid}). Totals will be logged to '{log_path}'.")
+    return process.pid
+
+def run_background_purge(batch_dir: Path, log_path: Path):
+    """Entry point of the background purge process started by start_background_purge()."""
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        handlers=[logging.FileHandler(log_path, mode='a', encoding='utf-8')])
+    log.info(f"Purging '{batch_dir}'...")
+    start_time = time.monotonic()
+    files_removed, bytes_removed, errors = purge_tree(batch_dir, log)
+    elapsed = time.monotonic() - start_time
+    log.info(f"Purged '{batch_dir}': {files_removed} files, {bytes_removed} bytes in {elapsed:.1f}s ({errors} errors).")
+
 def remove_file(file_path: Path, logger: logging.Logger, dry_run: bool, use_color: bool):
     """Removes a single file, handling errors and dry-run."""
     if not file_path.is_file():
@@ -80,64 +380,140 @@ def remove_file(file_path: Path, logger: logging.Logger, dry_run: bool, use_colo
             logger.error(colorize(error_msg, COLOR_RED, use_color))
 
 
-def clean_directories(base_path: Path, dir_names: list[str], logger: logging.Logger, dry_run: bool, use_color: bool):
-    """Finds and removes all directories with specific names recursively."""
-    logger.info(colorize(f"--- Cleaning Directories ---", COLOR_YELLOW, use_color))
-    found_any = False
-    for dir_name in dir_names:
-        logger.info(f"Searching for '{dir_name}' directories under '{base_path}'...")
+def find_targets(base_path: Path, dir_names: list[str], file_patterns: list[str],
+                 skip_dirs: list[str], logger: logging.Logger) -> tuple[list[Path], list[Path]]:
+    """
+    Walks the tree once, matching all directory names and file patterns at the same time.
+
+    Matched directories are scheduled for deletion and never descended into, and
+    directories listed in skip_dirs are not descended into at all. Symbolic links
+    are never followed. Names and patterns are matched case-insensitively.
+
+    Args:
+        base_path: Starting directory of the walk (never matched itself).
+        dir_names: Directory names to remove.
+        file_patterns: File name patterns (glob syntax) to remove.
+        skip_dirs: Directory names that are neither matched nor descended into.
+        logger: Logger instance.
+
+    Returns:
+        Tuple of (matched directories, matched files), each sorted by path.
+    """
+    dir_names_set = {d.lower() for d in dir_names}
+    skip_dirs_set = {d.lower() for d in skip_dirs} - dir_names_set
+    patterns_lower = [p.lower() for p in file_patterns]
+
+    found_dirs = []
+    found_files = []
+    pending = [base_path]
+    while pending:
+        current_dir = pending.pop()
         try:
-            # Use rglob for recursive search from the base path
-            # Using Path.glob('**/dir_name') can be more efficient than iterating all files/dirs
-            found_paths = list(base_path.glob(f"**/{dir_name}"))
-        except Exception as e:
-            logger.error(f"Error searching for '{dir_name}' directories: {e}")
-            continue
-
-        actual_dirs = [p for p in found_paths if p.is_dir()]
-
-        if not actual_dirs:
-            logger.info(f"No '{dir_name}' directories found.")
-            continue
-
-        found_any = True
-        # Sort paths by length descending to remove nested directories first
-        actual_dirs.sort(key=lambda p: len(p.parts), reverse=True)
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    name_lower = entry.name.lower()
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if name_lower in dir_names_set:
+                                found_dirs.append(Path(entry.path))
+                            elif name_lower in skip_dirs_set:
+                                logger.debug(f"Not descending into '{entry.path}'.")
+                            else:
+                                pending.append(entry.path)
+                        elif patterns_lower and entry.is_file(follow_symlinks=False):
+                            if any(fnmatch.fnmatchcase(name_lower, p) for p in patterns_lower):
+                                found_files.append(Path(entry.path))
+                    except OSError as e:
+                        logger.warning(f"Could not inspect '{entry.path}': {e}")
+        except PermissionError:
+            logger.warning(f"Permission denied reading directory: {current_dir}. Skipping.")
+        except OSError as e:
+            logger.error(f"Error reading directory {current_dir}: {e}")
+
+    found_dirs.sort()
+    found_files.sort()
+    return found_dirs, found_files
+
+
+def resolve_selected_projects(base_path: Path, source_dir: Path, changed_since: str | None,
+                              project_names: list[str], logger: logging.Logger) -> list[Path] | None:
+    """
+    Finds the project directories to clean in selective mode: the projects
+    owning files changed since a git revision and/or the named projects,
+    plus every project that references them through ProjectReference edges.
+
+    Returns:
+        Sorted project directories, or None if the selection failed.
+    """
+    graph = build_project_graph(source_dir, logger)
+    if not graph:
+        logger.error(f"No .csproj files found under '{source_dir}'.")
+        return None
+
+    selected = select_projects(project_names, graph, logger)
+    if changed_since:
+        changed_files = changed_files_since(changed_since, base_path, logger)
+        if changed_files is None:
+            return None
+        changed_projects = map_files_to_projects(changed_files, graph, logger)
+        logger.info(f"{len(changed_files)} files changed since '{changed_since}', owned by {len(changed_projects)} projects.")
+        selected |= changed_projects
+
+    affected = find_dependents(graph, selected)
+    logger.info(f"Selected {len(selected)} projects; {len(affected)} projects including dependents:")
+    for project in sorted(affected):
+        logger.info(f"  {project.stem}" + ("" if project in selected else " (dependent)"))
+    return sorted(project.parent for project in affected)
+
+
+def clean_directories(dir_paths: list[Path], dir_names: list[str], logger: logging.Logger, dry_run: bool, use_color: bool,
+                      jobs: int = 1, batch_dir: Path | None = None):
+    """
+    Removes the directories found by find_targets().
+
+    With batch_dir set, directories are moved into that trash batch directory
+    instead (falling back to immediate removal when the rename fails); otherwise
+    they are removed with up to `jobs` parallel workers.
+    """
+    logger.info(colorize(f"--- Cleaning Directories ---", COLOR_YELLOW, use_color))
+    if not dir_paths:
+        logger.info(colorize(f"--- No specified directories found to clean ---", COLOR_YELLOW, use_color))
+        return
 
-        for dir_path in actual_dirs:
+    counts = {name.lower(): 0 for name in dir_names}
+    for dir_path in dir_paths:
+        counts[dir_path.name.lower()] = counts.get(dir_path.name.lower(), 0) + 1
+    for name, count in counts.items():
+        if count:
+            logger.info(f"Found {count} '{name}' directories.")
+        else:
+            logger.info(f"No '{name}' directories found.")
+
+    if batch_dir is not None:
+        for index, dir_path in enumerate(dir_paths):
+            if not move_to_trash(dir_path, batch_dir, index, logger, dry_run, use_color):
+                remove_directory(dir_path, logger, dry_run, use_color)
+    elif jobs > 1:
+        # rmtree spends its time in filesystem calls, so threads remove targets concurrently
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for dir_path in dir_paths:
+                executor.submit(remove_directory, dir_path, logger, dry_run, use_color)
+    else:
+        for dir_path in dir_paths:
             # Pass logger, dry_run, use_color down
             remove_directory(dir_path, logger, dry_run, use_color)
 
-    if not found_any:
-         logger.info(colorize(f"--- No specified directories found to clean ---", COLOR_YELLOW, use_color))
-
 
-def clean_files(base_path: Path, file_patterns: list[str], logger: logging.Logger, dry_run: bool, use_color: bool):
-    """Finds and removes all files matching specific patterns recursively."""
+def clean_files(file_paths: list[Path], logger: logging.Logger, dry_run: bool, use_color: bool):
+    """Removes the files found by find_targets()."""
     logger.info(colorize(f"--- Cleaning Files ---", COLOR_YELLOW, use_color))
-    found_any = False
-    for pattern in file_patterns:
-        logger.info(f"Searching for files matching '{pattern}' under '{base_path}'...")
-        try:
-            # Use rglob for recursive search from the base path
-            found_paths = list(base_path.rglob(pattern))
-        except Exception as e:
-            logger.error(f"Error searching for files matching '{pattern}': {e}")
-            continue
-
-        actual_files = [p for p in found_paths if p.is_file()]
-
-        if not actual_files:
-            logger.info(f"No files matching '{pattern}' found.")
-            continue
-
-        found_any = True
-        for file_path in actual_files:
-            # Pass logger, dry_run, use_color down
-            remove_file(file_path, logger, dry_run, use_color)
+    if not file_paths:
+        logger.info(colorize(f"--- No specified files found to clean ---", COLOR_YELLOW, use_color))
+        return
 
-    if not found_any:
-         logger.info(colorize(f"--- No specified files found to clean ---", COLOR_YELLOW, use_color))
+    for file_path in file_paths:
+        # Pass logger, dry_run, use_color down
+        remove_file(file_path, logger, dry_run, use_color)
 
 
 # --- Main Execution ---
@@ -163,6 +539,61 @@ def main():
         default=",".join(DEFAULT_FILES_TO_CLEAN),
         help="Comma-separated list of file patterns (glob syntax) to remove recursively."
     )
+    parser.add_argument(
+        "-s", "--skip-dirs",
+        default=",".join(DEFAULT_DIRS_TO_SKIP),
+        help="Comma-separated list of directory names that are not searched."
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Number of directories to remove in parallel."
+    )
+    parser.add_argument(
+        "--deferred",
+        action="store_true",
+        help=f"Move directories into '{TRASH_DIR_NAME}' under the starting path and delete them in a background process."
+    )
+    # Internal: used by --deferred to run the background purge process
+    parser.add_argument("--purge-trash", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--purge-log", default=None, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--changed-since",
+        default=None,
+        metavar="REV",
+        help="Selective mode: clean only projects owning files changed since git revision REV, and their dependents."
+    )
+    parser.add_argument(
+        "--projects",
+        default=None,
+        help="Selective mode: comma-separated project names (e.g. VttTools.Game or Game) to clean, with their dependents."
+    )
+    parser.add_argument(
+        "--source-dir",
+        default=None,
+        help="Directory searched for .csproj files in selective mode (default: <path>/Source if it exists, else <path>)."
+    )
+    parser.add_argument(
+        "--keep-under",
+        type=parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Eviction mode: remove the least recently used project outputs until the rest fits in SIZE (e.g. 20GB)."
+    )
+    parser.add_argument(
+        "--older-than",
+        type=parse_duration,
+        default=None,
+        metavar="AGE",
+        help="Eviction mode: remove project outputs not used for longer than AGE (e.g. 7d, 12h)."
+    )
+    parser.add_argument(
+        "--no-sizes",
+        action="store_true",
+        help="Skip measuring the targets (no space report). Measuring walks every target before deleting; "
+             "--deferred runs skip it unless --keep-under/--older-than needs the sizes."
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -179,8 +610,14 @@ def main():
         help="Enable verbose (DEBUG level) logging."
     )
 
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
 
+    if args.purge_trash:
+        run_background_purge(Path(args.purge_trash), Path(args.purge_log))
+        return
+
     # --- Setup Logging ---
     log_level = logging.DEBUG if args.verbose else logging.INFO
     # Log to stderr for status messages/errors
@@ -193,30 +630,91 @@ def main():
     base_path = Path(args.path).resolve() # Resolve to absolute path
     dirs_to_clean = [d.strip() for d in args.dirs.split(',') if d.strip()]
     files_to_clean = [f.strip() for f in args.files.split(',') if f.strip()]
+    # The trash directory is never searched, whether or not --deferred is used
+    dirs_to_skip = [d.strip() for d in args.skip_dirs.split(',') if d.strip()] + [TRASH_DIR_NAME]
 
     log.info(f"Starting cleanup process from: {base_path}")
     if args.dry_run:
         log.warning(colorize("*** DRY RUN MODE ENABLED - NO FILES/DIRS WILL BE DELETED ***", COLOR_YELLOW, use_color))
     log.debug(f"Directories to clean: {dirs_to_clean}")
     log.debug(f"File patterns to clean: {files_to_clean}")
+    log.debug(f"Directories not searched: {dirs_to_skip}")
 
     # --- Validate Start Path ---
     if not base_path.is_dir():
         log.error(f"Starting path not found or is not a directory: '{base_path}'")
         sys.exit(1)
+    if args.jobs < 1:
+        log.error("--jobs must be at least 1.")
+        sys.exit(1)
 
     # --- Execute Cleaning ---
     try:
+        search_roots = [base_path]
+        if args.changed_since or args.projects:
+            log.info(colorize("--- Selecting Projects ---", COLOR_YELLOW, use_color))
+            if args.source_dir:
+                source_dir = Path(args.source_dir).resolve()
+            else:
+                source_dir = base_path / "Source" if (base_path / "Source").is_dir() else base_path
+            project_names = [n.strip() for n in (args.projects or "").split(',') if n.strip()]
+            search_roots = resolve_selected_projects(base_path, source_dir, args.changed_since, project_names, log)
+            if search_roots is None:
+                sys.exit(1)
+
+        found_dirs = []
+        found_files = []
+        for search_root in search_roots:
+            log.info(f"Searching for targets under '{search_root}'...")
+            root_dirs, root_files = find_targets(search_root, dirs_to_clean, files_to_clean, dirs_to_skip, log)
+            found_dirs += root_dirs
+            found_files += root_files
+
+        # Sizes are taken before anything is deleted, for dry and real runs alike. Measuring walks every
+        # target, so a real deferred run (which must return right away) skips it unless eviction needs it;
+        # its background purge logs the files and bytes it removed instead.
+        eviction_mode = args.keep_under is not None or args.older_than is not None
+        deferred_run = args.deferred and not args.dry_run
+        sizes = None
+        if eviction_mode or not (args.no_sizes or deferred_run):
+            sizes = measure_targets(found_dirs + found_files, log)
+        elif deferred_run and not args.no_sizes:
+            log.info(f"Skipping the space report in deferred mode; the removed space is logged to "
+                     f"'{base_path / TRASH_DIR_NAME / TRASH_LOG_NAME}'.")
+
+        if eviction_mode:
+            log.info(colorize("--- Selecting Outputs to Evict ---", COLOR_YELLOW, use_color))
+            found_dirs = select_evictions({p: sizes[p] for p in found_dirs}, args.keep_under, args.older_than, log)
+            sizes = None if args.no_sizes else {p: sizes[p] for p in found_dirs + found_files}
+
+        # The trash batch lives under the starting path so renames stay on the same filesystem
+        batch_dir = None
+        if args.deferred and found_dirs:
+            batch_dir = base_path / TRASH_DIR_NAME / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+            if not args.dry_run:
+                batch_dir.mkdir(parents=True, exist_ok=True)
+
         if dirs_to_clean:
-            clean_directories(base_path, dirs_to_clean, log, args.dry_run, use_color)
+            clean_directories(found_dirs, dirs_to_clean, log, args.dry_run, use_color, args.jobs, batch_dir)
         else:
             log.info("No directory cleaning targets specified.")
 
+        if batch_dir is not None and not args.dry_run:
+            if not any(batch_dir.iterdir()):
+                batch_dir.rmdir()
+            elif start_background_purge(batch_dir, log) is None:
+                log.warning("Purging trash in the foreground instead.")
+                files_removed, bytes_removed, errors = purge_tree(batch_dir, log)
+                log.info(f"Purged {files_removed} files, {bytes_removed} bytes ({errors} errors).")
+
         if files_to_clean:
-            clean_files(base_path, files_to_clean, log, args.dry_run, use_color)
+            clean_files(found_files, log, args.dry_run, use_color)
         else:
              log.info("No file cleaning targets specified.")
 
+        if sizes is not None:
+            report_space(sizes, files_to_clean, log, args.dry_run, use_color)
+
         log.info(colorize("--- Cleaning complete. ---", COLOR_YELLOW, use_color))
         if args.dry_run:
             log.warning(colorize("*** DRY RUN MODE - NO CHANGES WERE MADE ***", COLOR_YELLOW, use_color))
@@ -226,4 +724,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "clear_artifacts")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Looks up the coverage of source lines in the line coverage index written
+by generate_coverage_report.py, without parsing coverage.xml.
+Locations are 'File.cs:120' (one line), 'File.cs:120-140' (a range) or
+'File.cs' (the file's line counts); the file may be given by any path
+suffix. Meant for editor integrations and pre-commit checks.
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+
+# Assuming 'imports' is a folder in the same directory as this script.
+try:
+    from imports.coverage_index_utils import (STATE_NOT_COVERABLE, STATE_UNCOVERED, close_coverage_index,
+                                              find_indexed_files, indexed_file, line_state, open_coverage_index)
+    from imports.profile_utils import add_profile_arguments, run_main
+except ImportError as e:
+    print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'coverage_index_utils.py' and 'profile_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
+# --- Constants ---
+# The line part of a location: '120' or '120-140'
+LINE_RANGE_PATTERN = re.compile(r"(\d+)(?:-(\d+))?")
+
+# --- Logging Setup ---
+log = logging.getLogger(__name__)
+
+# --- Helper Functions ---
+
+def parse_location(location: str) -> tuple[str, int | None, int | None]:
+    """
+    Splits 'File.cs:120' or 'File.cs:120-140' into (path, first line, last line).
+
+    Returns:
+        Tuple of (path, first line, last line); the lines are None for a bare path.
+
+    Raises:
+        ValueError: If the line part is not a number or a range.
+    """
+    path, separator, lines = location.rpartition(':')
+    # 'C:\Source\File.cs' has a colon but no line part
+    if not separator or '/' in lines or '\\' in lines:
+        return location, None, None
+    match = LINE_RANGE_PATTERN.fullmatch(lines)
+    if match is None:
+        raise ValueError(f"Invalid line in '{location}'.")
+    first_line = int(match.group(1))
+    last_line = int(match.group(2)) if match.group(2) else first_line
+    if first_line < 1 or last_line < first_line:
+        raise ValueError(f"Invalid line range in '{location}'.")
+    return path, first_line, last_line
+
+def query_location(index: dict, location: str, logger: logging.Logger) -> dict | None:
+    """
+    Looks up one location.
+
+    Returns:
+        Dictionary {"location", "path", "lines": {line: state}} for line queries or
+        {"location", "path", "summary": {...}} for a bare path, or None if the
+        location is invalid or does not match exactly one indexed file.
+    """
+    try:
+        path, first_line, last_line = parse_location(location)
+    except ValueError as e:
+        logger.error(str(e))
+        return None
+    matches = find_indexed_files(index, path)
+    if not matches:
+        logger.error(f"'{path}' is not in the coverage index.")
+        return None
+    if len(matches) > 1:
+        logger.error(f"'{path}' matches {len(matches)} files; use a longer path: "
+                     + ", ".join(indexed_file(index, file_id)["path"] for file_id in matches))
+        return None
+
+    file_info = indexed_file(index, matches[0])
+    result = {"location": location, "path": file_info.pop("path")}
+    if first_line is None:
+        result["summary"] = file_info
+        return result
+    states = {line: line_state(index, matches[0], line) for line in range(first_line, last_line + 1)}
+    if last_line > first_line:
+        # Ranges only list the lines that have code
+        states = {line: state for line, state in states.items() if state != STATE_NOT_COVERABLE}
+    result["lines"] = states
+    return result
+
+def print_result(result: dict):
+    """Prints the result of one location as text."""
+    if "summary" in result:
+        summary = result["summary"]
+        print(f"{result['path']}: {summary['covered']} covered, {summary['partial']} partial, "
+              f"{summary['uncovered']} uncovered")
+        return
+    for line, state in result["lines"].items():
+        print(f"{result['path']}:{line} {state}")
+
+
+# --- Main Execution ---
+
+def main():
+    """Parses arguments and looks up the requested locations."""
+    parser = argparse.ArgumentParser(
+        description="Look up the coverage of source lines in the line coverage index.",
+        epilog="Example: python Utilities/coverage_at.py Source/Game/GameService.cs:120 --fail-on-uncovered",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "locations",
+        nargs="+",
+        metavar="FILE[:LINE[-LINE]]",
+        help="Source file (any path suffix) with an optional line or line range."
+    )
+    parser.add_argument(
+        "--index",
+        default="TestResults/coverage.idx",
+        help="Path relative to CWD for the line coverage index written by generate_coverage_report.py."
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    parser.add_argument(
+        "--fail-on-uncovered",
+        action="store_true",
+        help="Exit with code 2 if any queried line is uncovered (for pre-commit checks)."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable verbose (DEBUG level) logging."
+    )
+
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+
+    # --- Setup Logging ---
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s', stream=sys.stderr)
+
+    index_path = Path.cwd() / args.index
+    try:
+        index = open_coverage_index(index_path)
+    except FileNotFoundError:
+        log.error(f"Coverage index not found: '{index_path}'. Run generate_coverage_report.py first.")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        log.error(f"Could not open coverage index '{index_path}': {e}")
+        sys.exit(1)
+
+    try:
+        results = [query_location(index, location, log) for location in args.locations]
+    finally:
+        close_coverage_index(index)
+
+    found = [result for result in results if result is not None]
+    if args.json:
+        print(json.dumps(found, indent=2))
+    else:
+        for result in found:
+            print_result(result)
+
+    if len(found) < len(results):
+        sys.exit(1)
+    if args.fail_on_uncovered and any(state == STATE_UNCOVERED
+                                      for result in found for state in result.get("lines", {}).values()):
+        sys.exit(2)
+
+if __name__ == "__main__":
+    run_main(main, "coverage_at")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Queries the coverage history store written by generate_coverage_report.py.
+Shows coverage trends for the solution, an assembly or a class, lists the
+stored runs and finds classes whose coverage dropped between two runs.
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+
+# Assuming 'imports' is a folder in the same directory as this script.
+try:
+    from imports.history_utils import open_history, query_drops, query_runs, query_trend
+except ImportError as e:
+    print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'history_utils.py' exists in an 'imports' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
+# --- Logging Setup ---
+log = logging.getLogger(__name__)
+
+# --- Helper Functions ---
+
+def format_rate(covered: int, total: int) -> str:
+    """Formats a coverage percentage ('-' when there is nothing to cover)."""
+    return f"{100.0 * covered / total:5.1f}%" if total else "    -"
+
+def print_trend(rows: list[tuple], as_json: bool):
+    """Prints trend rows as a table or JSON."""
+    if as_json:
+        print(json.dumps([{"run": r[0], "started_at": r[1], "revision": r[2],
+                           "covered_lines": r[3], "coverable_lines": r[4],
+                           "covered_branches": r[5], "total_branches": r[6]} for r in rows], indent=2))
+        return
+    print(f"{'Run':>5}  {'Started':19}  {'Revision':10}  {'Lines':>6}  {'Branches':>8}  Covered/Coverable")
+    for run_id, started_at, revision, covered, coverable, covered_branches, total_branches in rows:
+        print(f"{run_id:>5}  {started_at:19}  {(revision or '-')[:10]:10}  {format_rate(covered, coverable):>6}  "
+              f"{format_rate(covered_branches, total_branches):>8}  {covered}/{coverable}")
+
+def print_drops(rows: list[tuple], as_json: bool):
+    """Prints coverage drops as a table or JSON."""
+    if as_json:
+        print(json.dumps([{"assembly": r[0], "class": r[1], "base_coverage": r[2], "coverage": r[3], "drop": r[4]}
+                          for r in rows], indent=2))
+        return
+    if not rows:
+        print("No class coverage dropped.")
+        return
+    print(f"{'Drop':>6}  {'Before':>6}  {'After':>6}  Class")
+    for assembly, class_name, base_rate, rate, drop in rows:
+        print(f"{drop:>6.1f}  {base_rate:>6.1f}  {rate:>6.1f}  {class_name} ({assembly})")
+
+
+# --- Main Execution ---
+
+def main():
+    """Parses arguments and runs the requested history query."""
+    parser = argparse.ArgumentParser(
+        description="Query the coverage history store.",
+        epilog="Example: python Utilities/coverage_history.py trend --assembly VttTools.Game --last 50",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--db",
+        default="CoverageReport/history.db",
+        help="Path relative to CWD for the coverage history database."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable verbose (DEBUG level) logging."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    # Options shared by all queries
+    output_parser = argparse.ArgumentParser(add_help=False)
+    output_parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+
+    trend_parser = subparsers.add_parser("trend", help="Coverage over the last runs.", parents=[output_parser],
+                                         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    trend_parser.add_argument("--assembly", default=None, help="Assembly name (default: whole solution).")
+    trend_parser.add_argument("--class", dest="class_name", default=None, help="Fully qualified class name.")
+    trend_parser.add_argument("--last", type=int, default=50, help="Number of most recent runs.")
+
+    runs_parser = subparsers.add_parser("runs", help="Stored runs with their solution totals.", parents=[output_parser],
+                                        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    runs_parser.add_argument("--last", type=int, default=50, help="Number of most recent runs.")
+
+    drops_parser = subparsers.add_parser("drops", help="Classes whose coverage dropped between two runs.", parents=[output_parser],
+                                         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    drops_parser.add_argument("--run", type=int, default=None, help="Run to check (default: latest).")
+    drops_parser.add_argument("--base-run", type=int, default=None, help="Run to compare against (default: the previous run).")
+    drops_parser.add_argument("--min-drop", type=float, default=0.0, help="Minimum drop in percentage points.")
+
+    args = parser.parse_args()
+
+    # --- Setup Logging ---
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s', stream=sys.stderr)
+
+    db_path = Path.cwd() / args.db
+    if not db_path.is_file():
+        log.error(f"Coverage history database not found: '{db_path}'. Run generate_coverage_report.py first.")
+        sys.exit(1)
+
+    try:
+        connection = open_history(db_path)
+        if args.command == "trend":
+            print_trend(query_trend(connection, args.assembly, args.class_name, args.last), args.json)
+        elif args.command == "runs":
+            print_trend(query_runs(connection, args.last), args.json)
+        else:
+            print_drops(query_drops(connection, args.base_run, args.run, args.min_drop), args.json)
+        connection.close()
+    except sqlite3.Error as e:
+        log.error(f"Could not query coverage history '{db_path}': {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,58 @@ and reportgenerator global tools. Displays command output directly.
 
 Assumes it's run from the solution root directory.
 Requires dotnet-coverage and reportgenerator to be installed as global tools.
+The JSON summary is produced by a built-in streaming Cobertura merger, so
+reportgenerator only runs when other report types (e.g. Html) are requested.
 """
 
 import argparse
+import fnmatch
+import hashlib
+import json
 import logging
+import os
 import shutil
+import sqlite3
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Assuming 'imports' is a folder in the same directory as this script.
+try:
+    from imports.csproj_utils import build_project_graph, find_dependents, map_files_to_projects, read_solution_projects
+    from imports.git_utils import changed_files_since, run_git
+    from imports.profile_utils import add_profile_arguments, run_main
+    from imports.history_utils import ingest_run, open_history
+    from imports.cobertura_utils import merge_cobertura_files, write_cobertura, write_json_summary
+    from imports.coverage_index_utils import write_coverage_index
+    from imports.trx_utils import (estimate_durations, load_duration_history, log_slowest, plan_shards,
+                                   read_trx_files, save_duration_history, update_duration_history)
+    from imports.timing_utils import (finish_run_report, format_timing_table, new_run_report, run_timed_process,
+                                      timed_step, write_run_report)
+except ImportError as e:
+    print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'csproj_utils.py', 'git_utils.py', 'profile_utils.py', 'cobertura_utils.py', 'coverage_index_utils.py', 'history_utils.py', 'timing_utils.py' and 'trx_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
+# --- Constants ---
+# Per-test-project coverage files and the impact map live in this folder next to the coverage file
+PARTS_DIR_NAME = "parts"
+IMPACT_MAP_FILE_NAME = "impact.json"
+# TRX test results (--trx) and the test duration history live next to the coverage file
+TRX_DIR_NAME = "trx"
+DURATIONS_FILE_NAME = "durations.json"
+# The line coverage index (queried with coverage_at.py) lives next to the coverage file
+COVERAGE_INDEX_FILE_NAME = "coverage.idx"
+
+# Build avoidance: files whose content is part of the input fingerprint
+FINGERPRINT_EXTS = {'.cs', '.razor', '.csproj', '.props', '.targets', '.sln', '.slnx', '.json',
+                    '.resx', '.config', '.runsettings', '.editorconfig'}
+# Directories never included in the fingerprint (build outputs, results, tooling)
+FINGERPRINT_SKIP_DIRS = {'.git', '.vs', 'bin', 'obj', 'node_modules', 'testresults', 'coveragereport', 'coveragereports'}
+# Fingerprints are stored next to the coverage file and the report directory with this suffix
+FINGERPRINT_SUFFIX = ".fingerprint"
+
 # --- Logging Setup ---
 log = logging.getLogger(__name__)
 
@@ -31,7 +74,8 @@ def setup_logging(verbose: bool):
                         stream=sys.stderr) # Explicitly log to stderr
     log.info(f"Logging level set to {logging.getLevelName(log_level)}")
 
-def run_command(command_args: list[str], logger: logging.Logger, dry_run: bool, cwd: Path | None = None):
+def run_command(command_args: list[str], logger: logging.Logger, dry_run: bool, cwd: Path | None = None,
+                output_file: Path | None = None, timings: list | None = None):
     """
     Runs an external command using subprocess, displaying its output directly.
 
@@ -40,33 +84,48 @@ def run_command(command_args: list[str], logger: logging.Logger, dry_run: bool,
         logger: Logger instance.
         dry_run: If True, only log the command without running it.
         cwd: The working directory to run the command in (defaults to None).
+        output_file: If given, the command output is written to this file
+                     instead of the console (used when commands run in parallel).
+        timings: If given, the wall time, CPU time and peak RSS of the command
+                 are appended to this list (see imports.timing_utils).
 
     Returns:
         True if the command succeeded (or in dry run), False otherwise.
     """
     cmd_string = ' '.join(command_args) # For logging purposes
     logger.info(f"Running command: {cmd_string}" + (" (DRY RUN)" if dry_run else ""))
-    logger.info("Command output will be displayed below:")
+    if output_file is None:
+        logger.info("Command output will be displayed below:")
+    else:
+        logger.info(f"Command output will be written to: {output_file}")
 
     if dry_run:
         return True # Simulate success in dry run
 
+    output_fh = None
+    if output_file is not None:
+        try:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            output_fh = open(output_file, 'w', encoding='utf-8')
+        except OSError as e:
+            logger.error(f"Could not create output file '{output_file}': {e}")
+            return False
+
     try:
         # Run the command.
-        # By default (without capture_output=True), stdout and stderr
-        # are inherited from the parent process (this script), so the
-        # command's output will print directly to the console.
-        # check=True raises CalledProcessError on non-zero exit code.
-        # text=True ensures streams are handled as text (requires encoding).
-        process = subprocess.run(
+        # stdout and stderr are inherited from the parent process (this
+        # script) unless an output file is given, so the command's output
+        # prints directly to the console.
+        # The process is reaped by run_timed_process so its resource usage can be recorded.
+        return_code = run_timed_process(
             command_args,
-            check=True,
-            text=True,            # Handle streams as text
-            encoding='utf-8',     # Specify encoding for text mode
-            cwd=cwd
-            # No capture_output=True
-            # stdout=None, stderr=None are defaults, meaning inherit
+            timings,
+            cwd=cwd,
+            stdout=output_fh,
+            stderr=subprocess.STDOUT if output_fh else None
         )
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, command_args)
         # No need to log process.stdout/stderr as it went directly to console
         logger.info(f"Command '{command_args[0]}' executed successfully.")
         return True
@@ -78,10 +137,255 @@ def run_command(command_args: list[str], logger: logging.Logger, dry_run: bool,
         logger.error(f"Command '{cmd_string}' failed with exit code {e.returncode}.")
         # Log the command again for context, as the actual error output might be scrolled away.
         logger.error(f"Failed command: {cmd_string}")
+        if output_file is not None:
+            logger.error(f"See the command output in: {output_file}")
         return False
     except Exception as e:
         logger.exception(f"An unexpected error occurred while running command: {cmd_string}")
         return False
+    finally:
+        if output_fh is not None:
+            output_fh.close()
+
+def find_test_projects(solution_path: Path, pattern: str, logger: logging.Logger) -> list[Path]:
+    """Lists the projects of a .slnx solution whose file name matches a glob pattern."""
+    projects = read_solution_projects(solution_path, logger)
+    test_projects = [p for p in projects if fnmatch.fnmatch(p.name.lower(), pattern.lower())]
+    logger.info(f"Found {len(test_projects)} test projects in '{solution_path.name}'.")
+    for project in test_projects:
+        logger.debug(f"  {project}")
+    return test_projects
+
+def part_file_path(parts_dir: Path, project: Path) -> Path:
+    """Returns the per-project Cobertura file of a test project."""
+    return parts_dir / f"{project.stem}.cobertura.xml"
+
+def collect_coverage_parallel(test_projects: list[Path], parts_dir: Path, solution_path: Path,
+                              dotnet_test_args: str, jobs: int, logger: logging.Logger, dry_run: bool,
+                              cwd: Path, timings: list | None = None, trx_dir: Path | None = None,
+                              durations: dict | None = None) -> bool:
+    """
+    Collects coverage for each test project in its own dotnet-coverage process
+    (at most `jobs` at a time), writing one Cobertura file per project into parts_dir.
+
+    The solution is built once up front so the parallel test runs do not
+    build shared projects concurrently. If `timings` is given, every
+    process run is recorded in it (see run_command()). If `trx_dir` is
+    given, each project writes TRX test results into its own subfolder.
+    If a duration history is given, the slowest projects start first so
+    the parallel jobs finish at about the same time.
+
+    Returns:
+        True if every step succeeded (or in dry run), False otherwise.
+    """
+    test_args = dotnet_test_args.strip()
+    if "--no-build" not in test_args.split():
+        if not run_command(["dotnet", "build", str(solution_path)], logger, dry_run, cwd=cwd, timings=timings):
+            logger.error("Failed to build the solution before collecting coverage.")
+            return False
+        test_args = f"{test_args} --no-build".strip()
+
+    def collect(project: Path) -> bool:
+        part_file = part_file_path(parts_dir, project)
+        delete_path(part_file, is_dir=False, logger=logger, dry_run=dry_run)
+        # The inner command is passed to dotnet-coverage as a single string
+        dotnet_test_command = f'dotnet test "{project}" {test_args}'
+        if trx_dir is not None:
+            dotnet_test_command += f' --logger trx --results-directory "{trx_dir / project.stem}"'
+        command = ["dotnet-coverage", "collect", "-f", "cobertura", "-o", str(part_file), dotnet_test_command]
+        return run_command(command, logger, dry_run, cwd=cwd, output_file=parts_dir / f"{project.stem}.log",
+                           timings=timings)
+
+    if durations is not None:
+        estimates = estimate_durations([p.stem for p in test_projects], durations)
+        test_projects = sorted(test_projects, key=lambda p: -estimates[p.stem])
+    logger.info(f"Collecting coverage for {len(test_projects)} test projects with {jobs} parallel jobs...")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(collect, test_projects))
+
+    failed = [project.stem for project, succeeded in zip(test_projects, results) if not succeeded]
+    if failed:
+        logger.error(f"Coverage collection failed for: {', '.join(failed)}")
+        return False
+    return True
+
+def merge_coverage_parts(test_projects: list[Path], parts_dir: Path, coverage_file_path: Path,
+                         logger: logging.Logger, dry_run: bool) -> bool:
+    """Merges the per-project Cobertura files of the given test projects into one coverage file."""
+    part_files = [part_file_path(parts_dir, project) for project in test_projects]
+    logger.info(f"Merging {len(part_files)} coverage files into: {coverage_file_path}")
+    if dry_run:
+        return True
+    # Unfiltered merge: filters are applied when the report is generated
+    coverage = merge_cobertura_files(part_files, "", "", logger)
+    return coverage is not None and write_cobertura(coverage, coverage_file_path, logger)
+
+def load_impact_map(parts_dir: Path, logger: logging.Logger) -> dict:
+    """Loads the map of test project name -> source files it covered in its last run."""
+    impact_map_path = parts_dir / IMPACT_MAP_FILE_NAME
+    try:
+        with open(impact_map_path, 'r', encoding='utf-8') as impact_fh:
+            return json.load(impact_fh)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read impact map '{impact_map_path}'. Ignoring it. Error: {e}")
+        return {}
+
+def update_impact_map(test_projects: list[Path], parts_dir: Path, logger: logging.Logger, dry_run: bool):
+    """Records, for each freshly collected test project, the source files its tests hit."""
+    if dry_run:
+        return
+    impact_map = load_impact_map(parts_dir, logger)
+    for project in test_projects:
+        coverage = merge_cobertura_files([part_file_path(parts_dir, project)], "", "", logger)
+        if coverage is None:
+            impact_map.pop(project.stem, None)
+            continue
+        impact_map[project.stem] = sorted({
+            os.path.normcase(file_name)
+            for classes in coverage.values() for class_data in classes.values()
+            for file_name, lines in class_data["files"].items()
+            if file_name and any(line[0] > 0 for line in lines.values())})
+    try:
+        with open(parts_dir / IMPACT_MAP_FILE_NAME, 'w', encoding='utf-8') as impact_fh:
+            json.dump(impact_map, impact_fh, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write impact map in '{parts_dir}': {e}")
+
+def find_impacted_test_projects(test_projects: list[Path], parts_dir: Path, revision: str,
+                                cwd: Path, logger: logging.Logger) -> list[Path] | None:
+    """
+    Selects the test projects affected by the changes since a git revision.
+
+    A test project is affected if it (transitively) references a project that
+    owns a changed file, if its last run covered a changed source file, or if
+    it has no cached results to reuse.
+
+    Returns:
+        The affected test projects (in solution order), or None if git failed.
+    """
+    changed_files = changed_files_since(revision, cwd, logger)
+    if changed_files is None:
+        return None
+
+    graph = build_project_graph(cwd, logger)
+    affected_projects = find_dependents(graph, map_files_to_projects(changed_files, graph, logger))
+    changed_names = {os.path.normcase(str(f)) for f in changed_files}
+    impact_map = load_impact_map(parts_dir, logger)
+
+    impacted = []
+    for project in test_projects:
+        if project in affected_projects:
+            reason = "references a changed project"
+        elif changed_names.intersection(impact_map.get(project.stem, [])):
+            reason = "covered a changed file"
+        elif not part_file_path(parts_dir, project).is_file():
+            reason = "no cached coverage"
+        else:
+            logger.debug(f"  {project.stem}: reusing cached coverage")
+            continue
+        logger.info(f"  {project.stem}: {reason}")
+        impacted.append(project)
+    logger.info(f"{len(changed_files)} files changed since '{revision}'; "
+                f"{len(impacted)} of {len(test_projects)} test projects need to run.")
+    return impacted
+
+def compute_source_fingerprint(root_dir: Path, output_dirs: list[Path], logger: logging.Logger) -> str:
+    """
+    Hashes the paths and contents of all source and project files below a directory,
+    skipping build outputs and the script's own output directories.
+    """
+    digest = hashlib.sha256()
+    file_count = 0
+    skipped_paths = {os.path.normcase(str(d.resolve())) for d in output_dirs}
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names[:] = sorted(d for d in dir_names
+                              if d.lower() not in FINGERPRINT_SKIP_DIRS
+                              and os.path.normcase(os.path.join(dir_path, d)) not in skipped_paths)
+        for file_name in sorted(file_names):
+            if os.path.splitext(file_name)[1].lower() not in FINGERPRINT_EXTS and file_name.lower() not in FINGERPRINT_EXTS:
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            digest.update(os.path.relpath(file_path, root_dir).replace('\\', '/').encode('utf-8') + b'\0')
+            try:
+                with open(file_path, 'rb') as source_fh:
+                    for chunk in iter(lambda: source_fh.read(1 << 16), b''):
+                        digest.update(chunk)
+            except OSError as e:
+                logger.warning(f"Could not read '{file_path}' for the fingerprint: {e}")
+            digest.update(b'\0')
+            file_count += 1
+    logger.debug(f"Fingerprinted {file_count} source and project files.")
+    return digest.hexdigest()
+
+def compute_fingerprints(args: argparse.Namespace, cwd: Path, output_dirs: list[Path],
+                         logger: logging.Logger) -> tuple[str, str]:
+    """
+    Computes the input fingerprints of the collect and report steps.
+
+    Returns:
+        Tuple of (collect fingerprint, report fingerprint). The report fingerprint
+        includes the collect fingerprint, since the report depends on the coverage data.
+    """
+    collect_inputs = [compute_source_fingerprint(cwd, output_dirs, logger), args.dotnet_test_args,
+                      str(args.parallel > 1 or bool(args.changed_since)), args.solution, args.test_projects,
+                      str(args.trx)]
+    collect_fingerprint = hashlib.sha256("\0".join(collect_inputs).encode('utf-8')).hexdigest()
+    report_inputs = [collect_fingerprint, args.assembly_filters, args.class_filters, args.report_types,
+                     str(args.use_reportgenerator)]
+    report_fingerprint = hashlib.sha256("\0".join(report_inputs).encode('utf-8')).hexdigest()
+    return collect_fingerprint, report_fingerprint
+
+def read_fingerprint(fingerprint_path: Path) -> str | None:
+    """Reads a stored fingerprint (None if there is none)."""
+    try:
+        return fingerprint_path.read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+
+def write_fingerprint(fingerprint_path: Path, fingerprint: str, logger: logging.Logger, dry_run: bool):
+    """Stores a fingerprint after the step it describes has succeeded."""
+    if dry_run:
+        return
+    try:
+        fingerprint_path.write_text(fingerprint + "\n", encoding='utf-8')
+        logger.debug(f"Stored fingerprint in: {fingerprint_path}")
+    except OSError as e:
+        logger.warning(f"Could not write fingerprint '{fingerprint_path}': {e}")
+
+def record_history(coverage: dict, db_path: Path, cwd: Path, logger: logging.Logger):
+    """Ingests the filtered coverage of this run into the coverage history store."""
+    revision = run_git(["rev-parse", "HEAD"], cwd, logger, quiet=True)
+    try:
+        connection = open_history(db_path)
+        try:
+            ingest_run(connection, coverage, revision[0] if revision else None, logger)
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        # History is a convenience; never fail the coverage run because of it
+        logger.warning(f"Could not record coverage history in '{db_path}': {e}")
+
+def build_coverage_index(coverage: dict | None, coverage_file_path: Path, index_path: Path,
+                         args: argparse.Namespace, logger: logging.Logger):
+    """Writes the line coverage index of this run (reading the coverage file if it is not merged yet)."""
+    if coverage is None:
+        coverage = merge_cobertura_files([coverage_file_path], args.assembly_filters, args.class_filters, logger)
+    if coverage is None or not write_coverage_index(coverage, index_path, logger):
+        # Like the history, the index is a convenience; never fail the coverage run because of it
+        logger.warning("Could not build the line coverage index.")
+
+def analyze_test_durations(trx_dir: Path, history_path: Path, top: int, logger: logging.Logger):
+    """Reports the slowest projects, classes and tests of this run and adds them to the duration history."""
+    trx_paths = sorted(trx_dir.rglob("*.trx"))
+    logger.info(f"Reading {len(trx_paths)} TRX files from: {trx_dir}")
+    tests = read_trx_files(trx_paths, logger)
+    log_slowest(tests, top, logger)
+    if tests:
+        history = load_duration_history(history_path, logger)
+        update_duration_history(history, tests)
+        save_duration_history(history, history_path, logger)
 
 def delete_path(path_to_delete: Path, is_dir: bool, logger: logging.Logger, dry_run: bool):
     """Deletes a file or directory if it exists."""
@@ -110,6 +414,196 @@ def delete_path(path_to_delete: Path, is_dir: bool, logger: logging.Logger, dry_
         logger.debug(f"{path_type.capitalize()} '{path_to_delete}' does not exist. No action needed.")
 
 
+def generate_coverage(args: argparse.Namespace, current_working_dir: Path, coverage_file_path: Path,
+                      report_dir_path: Path, run_report: dict):
+    """
+    Runs the coverage generation steps, timing each one in the run report.
+
+    Exits the script (sys.exit(1)) when a step fails.
+    """
+    # --- Build avoidance: compare input fingerprints with the previous run ---
+    with timed_step(run_report, "fingerprint"):
+        collect_fingerprint, report_fingerprint = compute_fingerprints(args, current_working_dir,
+                                                                       [coverage_file_path.parent, report_dir_path], log)
+    collect_fingerprint_path = coverage_file_path.with_name(coverage_file_path.name + FINGERPRINT_SUFFIX)
+    report_fingerprint_path = report_dir_path.with_name(report_dir_path.name + FINGERPRINT_SUFFIX)
+    coverage_index_path = coverage_file_path.parent / COVERAGE_INDEX_FILE_NAME
+    skip_collect = (not args.force and coverage_file_path.is_file()
+                    and read_fingerprint(collect_fingerprint_path) == collect_fingerprint)
+    skip_report = (skip_collect and report_dir_path.is_dir()
+                   and read_fingerprint(report_fingerprint_path) == report_fingerprint)
+
+    if skip_collect:
+        log.info("--- Steps 1-2: Skipped, sources, projects and test arguments are unchanged since the last run ---")
+        with timed_step(run_report, "collect") as step:
+            step["skipped"] = True
+    else:
+        with timed_step(run_report, "clean coverage"):
+            # A failed run must not leave a fingerprint that matches the new inputs
+            delete_path(collect_fingerprint_path, is_dir=False, logger=log, dry_run=args.dry_run)
+            # --- Step 1: Delete old coverage file ---
+            log.info("--- Step 1: Cleaning old coverage file ---")
+            delete_path(coverage_file_path, is_dir=False, logger=log, dry_run=args.dry_run)
+            delete_path(coverage_index_path, is_dir=False, logger=log, dry_run=args.dry_run)
+
+        # --- Step 2: Generate raw coverage data ---
+        log.info("--- Step 2: Generating raw coverage data (dotnet-coverage) ---")
+        trx_dir = coverage_file_path.parent / TRX_DIR_NAME if args.trx else None
+        durations_path = coverage_file_path.parent / DURATIONS_FILE_NAME
+        with timed_step(run_report, "collect") as step:
+            if trx_dir is not None:
+                # Only the results of this run are analyzed
+                delete_path(trx_dir, is_dir=True, logger=log, dry_run=args.dry_run)
+            # Ensure parent directory for coverage file exists
+            if not args.dry_run:
+                try:
+                    coverage_file_path.parent.mkdir(parents=True, exist_ok=True)
+                except OSError as e:
+                    log.error(f"Could not create directory '{coverage_file_path.parent}': {e}")
+                    sys.exit(1)
+
+            if args.parallel > 1 or args.changed_since:
+                # Per-project mode: one Cobertura part per test project, merged afterwards
+                solution_path = current_working_dir / args.solution
+                parts_dir = coverage_file_path.parent / PARTS_DIR_NAME
+                test_projects = find_test_projects(solution_path, args.test_projects, log)
+                if not test_projects:
+                    log.error(f"No test projects matching '{args.test_projects}' found in '{solution_path}'. Aborting.")
+                    sys.exit(1)
+
+                if args.changed_since:
+                    projects_to_run = find_impacted_test_projects(test_projects, parts_dir, args.changed_since,
+                                                                  current_working_dir, log)
+                    if projects_to_run is None:
+                        log.error("Could not determine the affected test projects. Aborting.")
+                        sys.exit(1)
+                else:
+                    projects_to_run = test_projects
+                    delete_path(parts_dir, is_dir=True, logger=log, dry_run=args.dry_run)
+
+                if projects_to_run:
+                    if not collect_coverage_parallel(projects_to_run, parts_dir, solution_path, args.dotnet_test_args,
+                                                     args.parallel, log, args.dry_run, current_working_dir,
+                                                     timings=step["processes"], trx_dir=trx_dir,
+                                                     durations=load_duration_history(durations_path, log)):
+                        log.error("Failed to generate raw coverage data. Aborting.")
+                        sys.exit(1)
+                    update_impact_map(projects_to_run, parts_dir, log, args.dry_run)
+                if not merge_coverage_parts(test_projects, parts_dir, coverage_file_path, log, args.dry_run):
+                    log.error("Failed to merge raw coverage data. Aborting.")
+                    sys.exit(1)
+            else:
+                # Construct the inner 'dotnet test' command string, including additional args
+                dotnet_test_command = f"dotnet test {args.dotnet_test_args}".strip()
+                if trx_dir is not None:
+                    dotnet_test_command += f' --logger trx --results-directory "{trx_dir}"'
+
+                coverage_command = [
+                    "dotnet-coverage", "collect",
+                    "-f", "cobertura",
+                    "-o", str(coverage_file_path),
+                    dotnet_test_command # Pass the inner command as a single argument
+                ]
+                if not run_command(coverage_command, log, args.dry_run, cwd=current_working_dir,
+                                   timings=step["processes"]):
+                    log.error("Failed to generate raw coverage data. Aborting.")
+                    sys.exit(1)
+
+        if trx_dir is not None and not args.dry_run:
+            with timed_step(run_report, "test durations"):
+                analyze_test_durations(trx_dir, durations_path, args.slowest, log)
+
+        write_fingerprint(collect_fingerprint_path, collect_fingerprint, log, args.dry_run)
+
+    if skip_report:
+        log.info("--- Steps 3-4: Skipped, coverage data and report options are unchanged since the last run ---")
+        with timed_step(run_report, "report") as step:
+            step["skipped"] = True
+        if not args.no_coverage_index and not args.dry_run and not coverage_index_path.is_file():
+            with timed_step(run_report, "coverage index"):
+                build_coverage_index(None, coverage_file_path, coverage_index_path, args, log)
+        return
+
+    with timed_step(run_report, "clean report"):
+        delete_path(report_fingerprint_path, is_dir=False, logger=log, dry_run=args.dry_run)
+        # --- Step 3: Delete old report directory ---
+        log.info("--- Step 3: Cleaning old report directory ---")
+        delete_path(report_dir_path, is_dir=True, logger=log, dry_run=args.dry_run)
+
+    # --- Step 4: Generate final report ---
+    log.info("--- Step 4: Generating final report ---")
+    with timed_step(run_report, "report") as step:
+        # Ensure target directory exists before running reportgenerator
+        if not args.dry_run:
+            try:
+                report_dir_path.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                log.error(f"Could not create directory '{report_dir_path}': {e}")
+                sys.exit(1)
+
+        # Check if the coverage file was actually created before proceeding
+        if not coverage_file_path.exists() and not args.dry_run:
+             log.error(f"Coverage file '{coverage_file_path}' not found after running dotnet-coverage. Cannot generate report. Aborting.")
+             sys.exit(1)
+
+        # The JsonSummary is produced natively; reportgenerator only runs for the other report types
+        coverage = None
+        report_types = [t.strip() for t in args.report_types.split(';') if t.strip()]
+        if not args.use_reportgenerator and any(t.lower() == "jsonsummary" for t in report_types):
+            report_types = [t for t in report_types if t.lower() != "jsonsummary"]
+            log.info(f"Generating JSON summary (built-in Cobertura merger){' (DRY RUN)' if args.dry_run else ''}")
+            if not args.dry_run:
+                coverage = merge_cobertura_files([coverage_file_path], args.assembly_filters, args.class_filters, log)
+                if coverage is None or not write_json_summary(coverage, report_dir_path / "Summary.json", log):
+                    log.error("Failed to generate JSON summary. Aborting.")
+                    sys.exit(1)
+
+        if report_types:
+            report_command = [
+                "reportgenerator",
+                f"-reports:{coverage_file_path}",
+                f"-targetdir:{report_dir_path}",
+                f"-assemblyfilters:{args.assembly_filters}",
+                f"-classfilters:{args.class_filters}",
+                f"-reporttypes:{';'.join(report_types)}"
+            ]
+            if not run_command(report_command, log, args.dry_run, cwd=current_working_dir, timings=step["processes"]):
+                log.error("Failed to generate final report. Aborting.")
+                sys.exit(1)
+        else:
+            log.info("No other report types requested; skipping reportgenerator.")
+
+    write_fingerprint(report_fingerprint_path, report_fingerprint, log, args.dry_run)
+
+    # --- Record the run in the coverage history ---
+    if not args.no_history and not args.dry_run:
+        with timed_step(run_report, "history"):
+            if coverage is None:
+                coverage = merge_cobertura_files([coverage_file_path], args.assembly_filters, args.class_filters, log)
+            if coverage is not None:
+                record_history(coverage, current_working_dir / args.history_db, current_working_dir, log)
+
+    # --- Build the line coverage index ---
+    if not args.no_coverage_index and not args.dry_run:
+        with timed_step(run_report, "coverage index"):
+            build_coverage_index(coverage, coverage_file_path, coverage_index_path, args, log)
+
+
+def print_shard_plan(args: argparse.Namespace, current_working_dir: Path, durations_path: Path):
+    """Prints the test projects split into --plan-shards time-balanced groups."""
+    if args.plan_shards < 1:
+        log.error("--plan-shards must be at least 1.")
+        sys.exit(1)
+    test_projects = find_test_projects(current_working_dir / args.solution, args.test_projects, log)
+    if not test_projects:
+        log.error(f"No test projects matching '{args.test_projects}' found in '{args.solution}'. Aborting.")
+        sys.exit(1)
+    history = load_duration_history(durations_path, log)
+    if not history["projects"]:
+        log.warning(f"No duration history in '{durations_path}' (run with --trx first); projects are weighted equally.")
+    for index, (seconds, names) in enumerate(plan_shards([p.stem for p in test_projects], history, args.plan_shards), 1):
+        print(f"Shard {index} (~{seconds:.1f}s): {' '.join(names)}")
+
 # --- Main Execution ---
 
 def main():
@@ -144,12 +638,89 @@ def main():
         default="Html;JsonSummary",
         help="Report types for reportgenerator (semicolon-separated)."
     )
+    parser.add_argument(
+        "--use-reportgenerator",
+        action="store_true",
+        help="Generate the JsonSummary with reportgenerator instead of the built-in Cobertura merger."
+    )
     parser.add_argument(
         "--dotnet-test-args",
         default="",
         help="Additional arguments to pass to the 'dotnet test' command (e.g., '--no-build'). Quote if contains spaces."
     )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Collect coverage per test project with up to N concurrent dotnet-coverage processes, then merge (1: single collection for the whole solution)."
+    )
+    parser.add_argument(
+        "--changed-since",
+        default=None,
+        metavar="REV",
+        help="Incremental mode: re-run only the test projects affected by changes since git revision REV and reuse the cached coverage of the others."
+    )
+    parser.add_argument(
+        "--solution",
+        default="VttTools.slnx",
+        help="Solution file (relative to CWD) the test projects are discovered from in --parallel/--changed-since mode."
+    )
+    parser.add_argument(
+        "--test-projects",
+        default="*.UnitTests.csproj",
+        help="File name pattern (glob) of the test projects to run in --parallel/--changed-since mode."
+    )
+    parser.add_argument(
+        "--trx",
+        action="store_true",
+        help="Also write TRX test results ('dotnet test --logger trx'), report the slowest tests, classes and projects, and record their durations for --plan-shards and --parallel scheduling."
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest projects, classes and tests to report with --trx."
+    )
+    parser.add_argument(
+        "--plan-shards",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Print a split of the test projects into N groups of about equal duration (from the --trx duration history) and exit."
+    )
     # Control Arguments
+    parser.add_argument(
+        "--history-db",
+        default="CoverageReport/history.db",
+        help="Path relative to CWD for the coverage history database (query it with coverage_history.py)."
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not record this run in the coverage history database."
+    )
+    parser.add_argument(
+        "--no-coverage-index",
+        action="store_true",
+        help=f"Do not build the line coverage index ({COVERAGE_INDEX_FILE_NAME} next to the coverage file, queried with coverage_at.py)."
+    )
+    parser.add_argument(
+        "--run-report",
+        default="CoverageReport/run-report.json",
+        help="Path relative to CWD for the JSON run report (wall time, CPU time and peak RSS per step and per process)."
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print a summary table of the step and process timings at the end of the run."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Collect coverage and generate the report even if the inputs are unchanged since the last run."
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -161,10 +732,15 @@ def main():
         help="Enable verbose (DEBUG level) logging."
     )
 
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
 
     # --- Setup ---
     setup_logging(args.verbose)
+    if args.parallel < 1:
+        log.error("--parallel must be at least 1.")
+        sys.exit(1)
     current_working_dir = Path.cwd()
     log.info(f"Running in directory: {current_working_dir}")
     if args.dry_run:
@@ -173,67 +749,27 @@ def main():
     coverage_file_path = current_working_dir / args.coverage_file
     report_dir_path = current_working_dir / args.report_dir
 
-    # --- Step 1: Delete old coverage file ---
-    log.info("--- Step 1: Cleaning old coverage file ---")
-    delete_path(coverage_file_path, is_dir=False, logger=log, dry_run=args.dry_run)
-
-    # --- Step 2: Generate raw coverage data ---
-    log.info("--- Step 2: Generating raw coverage data (dotnet-coverage) ---")
-    # Ensure parent directory for coverage file exists
-    if not args.dry_run:
-        try:
-            coverage_file_path.parent.mkdir(parents=True, exist_ok=True)
-        except OSError as e:
-            log.error(f"Could not create directory '{coverage_file_path.parent}': {e}")
-            sys.exit(1)
-
-    # Construct the inner 'dotnet test' command string, including additional args
-    dotnet_test_command = f"dotnet test {args.dotnet_test_args}".strip()
-
-    coverage_command = [
-        "dotnet-coverage", "collect",
-        "-f", "cobertura",
-        "-o", str(coverage_file_path),
-        dotnet_test_command # Pass the inner command as a single argument
-    ]
-    if not run_command(coverage_command, log, args.dry_run, cwd=current_working_dir):
-        log.error("Failed to generate raw coverage data. Aborting.")
-        sys.exit(1)
-
-    # --- Step 3: Delete old report directory ---
-    log.info("--- Step 3: Cleaning old report directory ---")
-    delete_path(report_dir_path, is_dir=True, logger=log, dry_run=args.dry_run)
+    if args.plan_shards is not None:
+        print_shard_plan(args, current_working_dir, coverage_file_path.parent / DURATIONS_FILE_NAME)
+        return
 
-    # --- Step 4: Generate final report ---
-    log.info("--- Step 4: Generating final report (reportgenerator) ---")
-    # Ensure target directory exists before running reportgenerator
-    if not args.dry_run:
-        try:
-            report_dir_path.mkdir(parents=True, exist_ok=True)
-        except OSError as e:
-            log.error(f"Could not create directory '{report_dir_path}': {e}")
-            sys.exit(1)
-
-    # Check if the coverage file was actually created before proceeding
-    if not coverage_file_path.exists() and not args.dry_run:
-         log.error(f"Coverage file '{coverage_file_path}' not found after running dotnet-coverage. Cannot generate report. Aborting.")
-         sys.exit(1)
-
-    report_command = [
-        "reportgenerator",
-        f"-reports:{coverage_file_path}",
-        f"-targetdir:{report_dir_path}",
-        f"-assemblyfilters:{args.assembly_filters}",
-        f"-classfilters:{args.class_filters}",
-        f"-reporttypes:{args.report_types}"
-    ]
-    if not run_command(report_command, log, args.dry_run, cwd=current_working_dir):
-        log.error("Failed to generate final report. Aborting.")
-        sys.exit(1)
+    run_report = new_run_report(Path(__file__).name)
+    status = "failed"
+    try:
+        generate_coverage(args, current_working_dir, coverage_file_path, report_dir_path, run_report)
+        status = "ok"
+    finally:
+        # Written even when a step aborts the run, so the slow or failing step can be found
+        finish_run_report(run_report, status)
+        if not args.dry_run:
+            write_run_report(run_report, current_working_dir / args.run_report, log)
+        if args.timings:
+            for line in format_timing_table(run_report):
+                print(line, file=sys.stderr)
 
     log.info("--- Coverage generation process completed successfully. ---")
     if args.dry_run:
         log.warning("*** DRY RUN MODE - NO CHANGES WERE MADE ***")
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "generate_coverage_report")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for merge_code.py checkpoints (--resume).
+A checkpoint is a JSON-lines file next to the output: a header line with
+the merge settings, then one line per processed file (path, mtime, size
+and processed content). Lines are appended as files are processed and
+flushed to disk periodically, so an interrupted run can continue with the
+files it already processed instead of starting over.
+Uses the built-in 'json' library.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+# --- Constants ---
+CHECKPOINT_VERSION = 1
+# Returned by lookup_checkpoint() for files that must be processed again
+# (None is a valid processed content: the file was excluded)
+NOT_CHECKPOINTED = object()
+
+
+def checkpoint_path_for(output_file_path: Path) -> Path:
+    """Returns the checkpoint file of an output file ('<output>.checkpoint')."""
+    return output_file_path.with_name(output_file_path.name + ".checkpoint")
+
+
+def _load_checkpoint(checkpoint_path: Path, settings: dict, logger: logging.Logger) -> tuple[dict, int] | None:
+    """
+    Reads the files recorded in a checkpoint.
+
+    Returns:
+        Tuple of (path -> (mtime_ns, size, content), size in bytes of the valid
+        lines), or None if there is no usable checkpoint (missing, unreadable
+        or written with other settings).
+    """
+    done = {}
+    try:
+        with open(checkpoint_path, 'rb') as checkpoint_fh:
+            header_line = checkpoint_fh.readline()
+            try:
+                header = json.loads(header_line)
+            except ValueError:
+                header = None
+            if not isinstance(header, dict) or header.get("version") != CHECKPOINT_VERSION:
+                logger.warning(f"Checkpoint '{checkpoint_path}' has an unsupported format. Starting over.")
+                return None
+            if header.get("settings") != settings:
+                logger.warning(f"Checkpoint '{checkpoint_path}' was written with other settings. Starting over.")
+                return None
+            valid_end = len(header_line)
+            for line in checkpoint_fh:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    path, mtime_ns, size, content = json.loads(line)
+                except ValueError:
+                    # The last line may have been cut by the interruption
+                    break
+                done[path] = (mtime_ns, size, content)
+                valid_end += len(line)
+    except FileNotFoundError:
+        logger.info(f"No checkpoint found at '{checkpoint_path}'. Starting over.")
+        return None
+    except OSError as e:
+        logger.warning(f"Could not read checkpoint '{checkpoint_path}'. Starting over. Error: {e}")
+        return None
+    return done, valid_end
+
+
+def open_checkpoint(checkpoint_path: Path, settings: dict, resume: bool, interval: float,
+                    logger: logging.Logger) -> dict | None:
+    """
+    Opens the checkpoint of a merge run.
+
+    Args:
+        checkpoint_path: The checkpoint file.
+        settings: JSON-serializable merge settings; a checkpoint is only resumed with the same settings.
+        resume: Whether to reuse the files recorded by an interrupted run.
+        interval: Seconds between two flushes of the checkpoint to disk.
+        logger: Logger instance.
+
+    Returns:
+        Checkpoint state used by lookup_checkpoint(), record_checkpoint() and
+        close_checkpoint(), or None if the checkpoint cannot be written.
+    """
+    loaded = _load_checkpoint(checkpoint_path, settings, logger) if resume else None
+    done = {}
+    try:
+        checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        if loaded is not None:
+            done, valid_end = loaded
+            logger.info(f"Resuming from checkpoint '{checkpoint_path}' ({len(done)} files already processed).")
+            # Drop a line cut by the interruption and keep appending
+            os.truncate(checkpoint_path, valid_end)
+            checkpoint_fh = open(checkpoint_path, 'a', encoding='utf-8')
+        else:
+            checkpoint_fh = open(checkpoint_path, 'w', encoding='utf-8')
+            checkpoint_fh.write(json.dumps({"version": CHECKPOINT_VERSION, "settings": settings},
+                                           ensure_ascii=False, separators=(',', ':')) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write checkpoint '{checkpoint_path}'. Continuing without it. Error: {e}")
+        return None
+    return {
+        "path": checkpoint_path,
+        "fh": checkpoint_fh,
+        "done": done,
+        "interval": interval,
+        "last_flush": time.monotonic(),
+        "resumed": 0,
+    }
+
+
+def lookup_checkpoint(checkpoint: dict, file_path: Path, stat: os.stat_result):
+    """
+    Returns the processed content of a file recorded in the checkpoint.
+
+    Args:
+        checkpoint: Checkpoint state from open_checkpoint().
+        file_path: The file.
+        stat: Current os.stat() of the file.
+
+    Returns:
+        The recorded content (None if the file was excluded), or
+        NOT_CHECKPOINTED if the file is not recorded or changed since.
+    """
+    recorded = checkpoint["done"].get(str(file_path))
+    if recorded is None:
+        return NOT_CHECKPOINTED
+    mtime_ns, size, content = recorded
+    if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+        return NOT_CHECKPOINTED
+    checkpoint["resumed"] += 1
+    return content
+
+
+def record_checkpoint(checkpoint: dict, file_path: Path, stat: os.stat_result, content: str | None,
+                      logger: logging.Logger):
+    """
+    Appends a processed file to the checkpoint and flushes it to disk when the interval has passed.
+
+    `stat` must be taken before the file was read: if the file is saved while
+    it is processed, the recorded stamp then no longer matches and --resume
+    reads it again instead of reusing the stale content.
+    """
+    if checkpoint["fh"] is None:
+        return
+    try:
+        checkpoint["fh"].write(json.dumps([str(file_path), stat.st_mtime_ns, stat.st_size, content],
+                                          ensure_ascii=False, separators=(',', ':')) + "\n")
+        now = time.monotonic()
+        if now - checkpoint["last_flush"] >= checkpoint["interval"]:
+            flush_checkpoint(checkpoint)
+            checkpoint["last_flush"] = now
+    except OSError as e:
+        logger.warning(f"Could not write checkpoint '{checkpoint['path']}'. Continuing without it. Error: {e}")
+        close_checkpoint(checkpoint, remove=False)
+
+
+def flush_checkpoint(checkpoint: dict):
+    """Writes the buffered checkpoint lines to disk."""
+    if checkpoint["fh"] is not None:
+        checkpoint["fh"].flush()
+        os.fsync(checkpoint["fh"].fileno())
+
+
+def close_checkpoint(checkpoint: dict, remove: bool):
+    """
+    Closes the checkpoint.
+
+    Args:
+        checkpoint: Checkpoint state from open_checkpoint().
+        remove: True once the output is committed (the checkpoint is deleted);
+                False to keep it for --resume.
+    """
+    checkpoint_fh = checkpoint["fh"]
+    checkpoint["fh"] = None
+    if checkpoint_fh is not None:
+        try:
+            checkpoint_fh.close()
+        except OSError:
+            pass
+    if remove:
+        checkpoint["path"].unlink(missing_ok=True)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for Cobertura coverage files.
+Streams one or more coverage.xml files with iterparse (memory stays flat
+regardless of file size), merges them, applies reportgenerator-style
+assembly/class filters and writes a merged Cobertura file or a
+reportgenerator-compatible JSON summary.
+Uses the built-in 'xml.etree.ElementTree' library.
+
+Merged coverage is a nested dictionary:
+    {assembly: {class_name: {"files": {file_name: {line_number: [hits, covered_branches, total_branches]}},
+                             "methods": {(name, signature): set_of_(file_name, line_number)}}}}
+Lines are kept per file: a partial class (or one with a source-generated
+half) spans several files, and the same line number means a different
+line in each of them.
+"""
+
+import json
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+# --- Constants ---
+# Matches the "(covered/total)" part of condition-coverage="50% (1/2)"
+CONDITION_COVERAGE_PATTERN = re.compile(r"\((\d+)/(\d+)\)")
+
+
+def parse_filters(filter_string: str) -> tuple[list[re.Pattern], list[re.Pattern]]:
+    """
+    Parses a reportgenerator filter string such as "+VttTools.*;-VttTools.*.UnitTests".
+
+    Args:
+        filter_string: Semicolon-separated filters; '+' includes, '-' excludes, '*' is a wildcard.
+
+    Returns:
+        Tuple of (include patterns, exclude patterns), matched case-insensitively.
+    """
+    includes = []
+    excludes = []
+    for item in (f.strip() for f in (filter_string or "").split(';')):
+        if len(item) < 2 or item[0] not in "+-":
+            continue
+        pattern = re.compile("^" + ".*".join(re.escape(part) for part in item[1:].split('*')) + "$", re.IGNORECASE)
+        (includes if item[0] == '+' else excludes).append(pattern)
+    return includes, excludes
+
+
+def matches_filters(name: str, filters: tuple[list[re.Pattern], list[re.Pattern]]) -> bool:
+    """Returns True if a name passes the filters (reportgenerator semantics: no includes means include all)."""
+    includes, excludes = filters
+    if includes and not any(p.match(name) for p in includes):
+        return False
+    return not any(p.match(name) for p in excludes)
+
+
+def normalize_class_name(class_name: str) -> str:
+    """
+    Folds compiler-generated nested classes (closures, state machines) into
+    the class that declares them, as reportgenerator does.
+    """
+    class_name = class_name.split('/', 1)[0]
+    marker = class_name.find('.<')
+    return class_name[:marker] if marker > 0 else class_name
+
+
+def read_cobertura(coverage_path: Path, coverage: dict, assembly_filters, class_filters,
+                   logger: logging.Logger) -> bool:
+    """
+    Streams a Cobertura file and merges its line, branch and method data into `coverage`.
+
+    Hits of the same line are summed; branch counts keep the best coverage seen.
+
+    Args:
+        coverage_path: Path to the Cobertura XML file.
+        coverage: Merged coverage dictionary (updated in place).
+        assembly_filters: Result of parse_filters() applied to package (assembly) names.
+        class_filters: Result of parse_filters() applied to normalized class names.
+        logger: Logger instance.
+
+    Returns:
+        True if the file was read completely, False otherwise.
+    """
+    source_dir = None
+    assembly = None
+    file_name = None
+    file_lines = None
+    method_lines = None
+    classes_elem = None
+    try:
+        for event, elem in ET.iterparse(coverage_path, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == 'package':
+                    name = elem.get('name', '')
+                    assembly = name if matches_filters(name, assembly_filters) else None
+                elif tag == 'classes':
+                    classes_elem = elem
+                elif tag == 'class' and assembly is not None:
+                    class_name = normalize_class_name(elem.get('name', ''))
+                    if matches_filters(class_name, class_filters):
+                        file_name = elem.get('filename', '')
+                        if source_dir and file_name and not Path(file_name).is_absolute():
+                            file_name = str(Path(source_dir) / file_name)
+                        class_data = coverage.setdefault(assembly, {}).setdefault(
+                            class_name, {"files": {}, "methods": {}})
+                        file_lines = class_data["files"].setdefault(file_name, {})
+                elif tag == 'method' and file_lines is not None:
+                    method_key = (elem.get('name', ''), elem.get('signature', ''))
+                    method_lines = class_data["methods"].setdefault(method_key, set())
+                continue
+
+            # --- 'end' events ---
+            if tag == 'line' and file_lines is not None:
+                number = int(elem.get('number', 0))
+                if method_lines is not None:
+                    method_lines.add((file_name, number))
+                else:
+                    hits = int(elem.get('hits', 0))
+                    covered = total = 0
+                    if elem.get('branch', '').lower() == 'true':
+                        match = CONDITION_COVERAGE_PATTERN.search(elem.get('condition-coverage', ''))
+                        if match:
+                            covered, total = int(match.group(1)), int(match.group(2))
+                    line = file_lines.get(number)
+                    if line is None:
+                        file_lines[number] = [hits, covered, total]
+                    else:
+                        line[0] += hits
+                        line[1] = max(line[1], covered)
+                        line[2] = max(line[2], total)
+                elem.clear()
+            elif tag == 'method':
+                method_lines = None
+                elem.clear()
+            elif tag == 'class':
+                file_lines = None
+                # Drop finished classes so memory does not grow with the file
+                if classes_elem is not None:
+                    classes_elem.clear()
+            elif tag == 'package':
+                assembly = None
+                elem.clear()
+            elif tag == 'source' and source_dir is None and elem.text:
+                source_dir = elem.text.strip()
+    except (ET.ParseError, OSError, ValueError) as e:
+        logger.error(f"Could not read Cobertura file '{coverage_path}': {e}")
+        return False
+    return True
+
+
+def merge_cobertura_files(coverage_paths: list[Path], assembly_filters: str, class_filters: str,
+                          logger: logging.Logger) -> dict | None:
+    """
+    Merges several Cobertura files into one coverage dictionary.
+
+    Args:
+        coverage_paths: Cobertura XML files to merge.
+        assembly_filters: reportgenerator-style assembly filter string.
+        class_filters: reportgenerator-style class filter string.
+        logger: Logger instance.
+
+    Returns:
+        The merged coverage dictionary, or None if any file could not be read.
+    """
+    parsed_assembly_filters = parse_filters(assembly_filters)
+    parsed_class_filters = parse_filters(class_filters)
+    coverage: dict = {}
+    start_time = time.monotonic()
+    for coverage_path in coverage_paths:
+        logger.debug(f"Reading Cobertura file: {coverage_path}")
+        if not read_cobertura(coverage_path, coverage, parsed_assembly_filters, parsed_class_filters, logger):
+            return None
+    logger.info(f"Merged {len(coverage_paths)} Cobertura files ({len(coverage)} assemblies, "
+                f"{sum(len(c) for c in coverage.values())} classes) in {time.monotonic() - start_time:.2f}s.")
+    return coverage
+
+
+def _count_file_lines(file_name: str, cache: dict) -> int | None:
+    """Counts the lines of a source file (None if it cannot be read)."""
+    if file_name not in cache:
+        try:
+            with open(file_name, 'rb') as source_fh:
+                cache[file_name] = sum(chunk.count(b'\n') for chunk in iter(lambda: source_fh.read(1 << 16), b''))
+        except OSError:
+            cache[file_name] = None
+    return cache[file_name]
+
+
+def _percentage(covered: int, total: int) -> float | None:
+    return round(100.0 * covered / total, 1) if total else None
+
+
+def _class_statistics(class_data: dict) -> dict:
+    """Computes line, branch and method statistics of one merged class (over all its files)."""
+    files = class_data["files"]
+    lines = [line for file_lines in files.values() for line in file_lines.values()]
+    covered_lines = sum(1 for line in lines if line[0] > 0)
+    covered_branches = sum(line[1] for line in lines)
+    total_branches = sum(line[2] for line in lines)
+    covered_methods = fully_covered_methods = 0
+    for method_lines in class_data["methods"].values():
+        hits = [files[f][n][0] > 0 for f, n in method_lines if n in files.get(f, ())]
+        if any(hits):
+            covered_methods += 1
+            if all(hits):
+                fully_covered_methods += 1
+    return {
+        "coveredlines": covered_lines,
+        "coverablelines": len(lines),
+        "coveredbranches": covered_branches,
+        "totalbranches": total_branches,
+        "coveredmethods": covered_methods,
+        "fullycoveredmethods": fully_covered_methods,
+        "totalmethods": len(class_data["methods"]),
+    }
+
+
+def _add_rates(stats: dict) -> dict:
+    """Adds reportgenerator's percentage fields to a statistics dictionary."""
+    stats["coverage"] = _percentage(stats["coveredlines"], stats["coverablelines"])
+    stats["branchcoverage"] = _percentage(stats["coveredbranches"], stats["totalbranches"])
+    stats["methodcoverage"] = _percentage(stats["coveredmethods"], stats["totalmethods"])
+    stats["fullmethodcoverage"] = _percentage(stats["fullycoveredmethods"], stats["totalmethods"])
+    return stats
+
+
+def _split_class_by_file(class_data: dict) -> list[tuple[str, dict]]:
+    """
+    Splits a merged class into one single-file class per source file.
+
+    Returns:
+        List of (file name, class data) sorted by file name; each method goes
+        with the file of its lines (methods without lines go with the first file).
+    """
+    parts = []
+    for index, file_name in enumerate(sorted(class_data["files"])):
+        methods = {key: {(f, n) for f, n in method_lines if f == file_name}
+                   for key, method_lines in class_data["methods"].items()}
+        parts.append((file_name, {
+            "files": {file_name: class_data["files"][file_name]},
+            "methods": {key: method_lines for key, method_lines in methods.items()
+                        if method_lines or (index == 0 and not class_data["methods"][key])},
+        }))
+    return parts
+
+
+def summarize_coverage(coverage: dict) -> dict:
+    """
+    Builds a summary in the layout of reportgenerator's JsonSummary (Summary.json).
+
+    Args:
+        coverage: Merged coverage dictionary.
+
+    Returns:
+        Dictionary with "summary" and "coverage" sections.
+    """
+    counters = ("coveredlines", "coverablelines", "coveredbranches", "totalbranches",
+                "coveredmethods", "fullycoveredmethods", "totalmethods")
+    line_counts: dict = {}
+    totals = dict.fromkeys(counters, 0)
+    files = set()
+    assemblies = []
+    for assembly_name in sorted(coverage):
+        assembly_totals = dict.fromkeys(counters, 0)
+        assembly_files = set()
+        classes = []
+        for class_name in sorted(coverage[assembly_name]):
+            class_data = coverage[assembly_name][class_name]
+            stats = _class_statistics(class_data)
+            class_files = [f for f in class_data["files"] if f]
+            file_line_counts = [n for n in (_count_file_lines(f, line_counts) for f in class_files) if n is not None]
+            stats["totallines"] = sum(file_line_counts) if file_line_counts else None
+            assembly_files.update(class_files)
+            for key in counters:
+                assembly_totals[key] += stats[key]
+            classes.append({"name": class_name, **_add_rates(stats)})
+        # Several (partial) classes can share a file, so total lines are counted per file
+        assembly_totals["totallines"] = sum(line_counts.get(f) or 0 for f in assembly_files)
+        files |= assembly_files
+        for key in counters:
+            totals[key] += assembly_totals[key]
+        assemblies.append({"name": assembly_name, "classes": len(classes),
+                           **_add_rates(assembly_totals), "classesinassembly": classes})
+
+    summary = {
+        "generatedon": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "parser": "Cobertura",
+        "assemblies": len(assemblies),
+        "classes": sum(a["classes"] for a in assemblies),
+        "files": len(files),
+        "uncoveredlines": totals["coverablelines"] - totals["coveredlines"],
+        "totallines": sum(line_counts.get(f) or 0 for f in files),
+        **totals,
+    }
+    _add_rates(summary)
+    summary["linecoverage"] = summary.pop("coverage")
+    return {"summary": summary, "coverage": {"assemblies": assemblies}}
+
+
+def write_json_summary(coverage: dict, output_path: Path, logger: logging.Logger) -> bool:
+    """
+    Writes the reportgenerator-compatible JSON summary of merged coverage.
+
+    Args:
+        coverage: Merged coverage dictionary.
+        output_path: Path of the Summary.json file to write.
+        logger: Logger instance.
+
+    Returns:
+        True on success, False otherwise.
+    """
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as output_fh:
+            json.dump(summarize_coverage(coverage), output_fh, indent=2, ensure_ascii=False)
+    except OSError as e:
+        logger.error(f"Could not write JSON summary '{output_path}': {e}")
+        return False
+    logger.info(f"JSON summary written to: {output_path}")
+    return True
+
+
+def write_cobertura(coverage: dict, output_path: Path, logger: logging.Logger) -> bool:
+    """
+    Writes merged coverage as a Cobertura XML file, one class at a time.
+
+    Args:
+        coverage: Merged coverage dictionary.
+        output_path: Path of the Cobertura file to write.
+        logger: Logger instance.
+
+    Returns:
+        True on success, False otherwise.
+    """
+    def rate(covered: int, total: int) -> str:
+        return f"{covered / total:.4f}" if total else "1"
+
+    def write_lines(output_fh, lines: dict, line_numbers, indent: str):
+        output_fh.write(f"{indent}<lines>\n")
+        for number in line_numbers:
+            hits, covered, total = lines[number]
+            if total:
+                output_fh.write(f'{indent}  <line number="{number}" hits="{hits}" branch="True" '
+                                f'condition-coverage="{round(100 * covered / total)}% ({covered}/{total})" />\n')
+            else:
+                output_fh.write(f'{indent}  <line number="{number}" hits="{hits}" branch="False" />\n')
+        output_fh.write(f"{indent}</lines>\n")
+
+    all_stats = [_class_statistics(c) for classes in coverage.values() for c in classes.values()]
+    covered_lines = sum(s["coveredlines"] for s in all_stats)
+    valid_lines = sum(s["coverablelines"] for s in all_stats)
+    covered_branches = sum(s["coveredbranches"] for s in all_stats)
+    valid_branches = sum(s["totalbranches"] for s in all_stats)
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as output_fh:
+            output_fh.write('<?xml version="1.0" encoding="utf-8"?>\n')
+            output_fh.write(f'<coverage line-rate="{rate(covered_lines, valid_lines)}" '
+                            f'branch-rate="{rate(covered_branches, valid_branches)}" version="1.9" '
+                            f'timestamp="{int(time.time())}" lines-covered="{covered_lines}" lines-valid="{valid_lines}" '
+                            f'branches-covered="{covered_branches}" branches-valid="{valid_branches}">\n')
+            output_fh.write('  <packages>\n')
+            for assembly_name in sorted(coverage):
+                classes = coverage[assembly_name]
+                stats = [_class_statistics(c) for c in classes.values()]
+                output_fh.write(f'    <package name={quoteattr(assembly_name)} '
+                                f'line-rate="{rate(sum(s["coveredlines"] for s in stats), sum(s["coverablelines"] for s in stats))}" '
+                                f'branch-rate="{rate(sum(s["coveredbranches"] for s in stats), sum(s["totalbranches"] for s in stats))}" '
+                                f'complexity="0">\n      <classes>\n')
+                for class_name in sorted(classes):
+                    # One <class> element per file of the class, as dotnet-coverage writes partial classes
+                    for file_name, file_data in _split_class_by_file(classes[class_name]):
+                        class_stats = _class_statistics(file_data)
+                        lines = file_data["files"][file_name]
+                        output_fh.write(f'        <class name={quoteattr(class_name)} filename={quoteattr(file_name)} '
+                                        f'line-rate="{rate(class_stats["coveredlines"], class_stats["coverablelines"])}" '
+                                        f'branch-rate="{rate(class_stats["coveredbranches"], class_stats["totalbranches"])}" '
+                                        f'complexity="0">\n          <methods>\n')
+                        for (method_name, signature), method_lines in sorted(file_data["methods"].items()):
+                            numbers = sorted(n for _, n in method_lines if n in lines)
+                            method_covered = sum(1 for n in numbers if lines[n][0] > 0)
+                            output_fh.write(f'            <method name={quoteattr(method_name)} signature={quoteattr(signature)} '
+                                            f'line-rate="{rate(method_covered, len(numbers))}" branch-rate="1" complexity="0">\n')
+                            write_lines(output_fh, lines, numbers, "              ")
+                            output_fh.write('            </method>\n')
+                        output_fh.write('          </methods>\n')
+                        write_lines(output_fh, lines, sorted(lines), "          ")
+                        output_fh.write('        </class>\n')
+                output_fh.write('      </classes>\n    </package>\n')
+            output_fh.write('  </packages>\n</coverage>\n')
+    except OSError as e:
+        logger.error(f"Could not write Cobertura file '{output_path}': {e}")
+        return False
+    logger.info(f"Merged Cobertura file written to: {output_path}")
+    return True
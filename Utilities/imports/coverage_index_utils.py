@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for the line coverage index (coverage.idx).
+The index is a compact binary file built from the merged coverage: a path
+table sorted by reversed path (so "File.cs" or "Game/File.cs" is found by
+binary search on the path suffix) and, per source file, three bitmaps of
+covered, partial (some branches missed) and uncovered lines. It is read
+through mmap, so a lookup only touches the header, a few path table
+records and one byte of each bitmap.
+Uses the built-in 'mmap' and 'struct' libraries.
+
+File layout (little-endian):
+    header   MAGIC, version, file count, path table offset, string offset
+    records  per file: key offset/length, path offset/length, line count,
+             covered/partial/uncovered counts, bitmaps offset
+    strings  UTF-8 lookup keys (reversed, lowercase, '/'-separated) and paths
+    bitmaps  per file: covered, partial, uncovered; bit N is line N
+"""
+
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+
+# --- Constants ---
+INDEX_MAGIC = b"VTTCOVIX"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+RECORD = struct.Struct("<8IQ")
+
+STATE_COVERED = "covered"
+STATE_PARTIAL = "partial"
+STATE_UNCOVERED = "uncovered"
+# The line has no code (or the file is indexed but the line is past its end)
+STATE_NOT_COVERABLE = "not-coverable"
+# Bitmap order within a file
+LINE_STATES = (STATE_COVERED, STATE_PARTIAL, STATE_UNCOVERED)
+
+
+def _lookup_key(path: str) -> str:
+    """Returns the lookup key of a path: '/'-separated, lowercase and reversed."""
+    return path.replace('\\', '/').lower()[::-1]
+
+
+def collect_line_states(coverage: dict) -> dict:
+    """
+    Merges the lines of all classes per source file.
+
+    A line is covered when it was hit and all its branches were taken,
+    partial when it was hit but some branches were not, uncovered otherwise
+    (reportgenerator semantics). The merged coverage keeps the lines of each
+    class per file; lines of several classes in the same file are combined
+    with the hits summed and the best branch coverage kept.
+
+    Args:
+        coverage: Merged coverage dictionary (see cobertura_utils).
+
+    Returns:
+        Dictionary {file path: {line number: state}}.
+    """
+    files = {}
+    for classes in coverage.values():
+        for class_data in classes.values():
+            for file_name, class_lines in class_data["files"].items():
+                if not file_name:
+                    continue
+                file_lines = files.setdefault(file_name, {})
+                for number, (hits, covered, total) in class_lines.items():
+                    line = file_lines.get(number)
+                    if line is None:
+                        file_lines[number] = [hits, covered, total]
+                    else:
+                        line[0] += hits
+                        line[1] = max(line[1], covered)
+                        line[2] = max(line[2], total)
+
+    states = {}
+    for file_name, file_lines in files.items():
+        states[file_name] = {
+            number: STATE_UNCOVERED if hits <= 0 else STATE_PARTIAL if covered < total else STATE_COVERED
+            for number, (hits, covered, total) in file_lines.items()
+        }
+    return states
+
+
+def write_coverage_index(coverage: dict, index_path: Path, logger: logging.Logger) -> bool:
+    """
+    Builds the line coverage index of a merged coverage and writes it atomically.
+
+    Args:
+        coverage: Merged coverage dictionary (see cobertura_utils).
+        index_path: Path of the index file.
+        logger: Logger instance.
+
+    Returns:
+        True if the index was written, False otherwise.
+    """
+    line_states = collect_line_states(coverage)
+    entries = sorted((_lookup_key(file_name), file_name) for file_name in line_states)
+
+    strings = bytearray()
+    bitmaps = bytearray()
+    records = []
+    for key, file_name in entries:
+        states = line_states[file_name]
+        line_count = max(states, default=0) + 1
+        size = (line_count + 7) // 8
+        file_bitmaps = {state: bytearray(size) for state in LINE_STATES}
+        for number, state in states.items():
+            if number > 0:
+                file_bitmaps[state][number >> 3] |= 1 << (number & 7)
+        counts = [sum(1 for s in states.values() if s == state) for state in LINE_STATES]
+
+        key_bytes = key.encode('utf-8')
+        path_bytes = file_name.encode('utf-8')
+        records.append((len(strings), len(key_bytes), len(strings) + len(key_bytes), len(path_bytes),
+                        line_count, *counts, len(bitmaps)))
+        strings += key_bytes + path_bytes
+        for state in LINE_STATES:
+            bitmaps += file_bitmaps[state]
+
+    records_offset = HEADER.size
+    strings_offset = records_offset + RECORD.size * len(records)
+    bitmaps_offset = strings_offset + len(strings)
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as index_fh:
+            index_fh.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(records), records_offset, strings_offset))
+            for record in records:
+                index_fh.write(RECORD.pack(*record[:-1], bitmaps_offset + record[-1]))
+            index_fh.write(strings)
+            index_fh.write(bitmaps)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        logger.error(f"Could not write coverage index '{index_path}': {e}")
+        tmp_path.unlink(missing_ok=True)
+        return False
+    logger.info(f"Coverage index with {len(records)} files written to: {index_path}")
+    return True
+
+
+def open_coverage_index(index_path: Path) -> dict:
+    """
+    Memory-maps a line coverage index.
+
+    Returns:
+        Index state used by find_indexed_files(), line_state() and coverage_at().
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not a coverage index of a supported version.
+    """
+    with open(index_path, 'rb') as index_fh:
+        data = mmap.mmap(index_fh.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) < HEADER.size:
+        data.close()
+        raise ValueError(f"'{index_path}' is not a coverage index.")
+    magic, version, file_count, records_offset, strings_offset = HEADER.unpack_from(data, 0)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        data.close()
+        raise ValueError(f"'{index_path}' is not a coverage index of version {INDEX_VERSION}.")
+    return {
+        "data": data,
+        "count": file_count,
+        "records": records_offset,
+        "strings": strings_offset,
+    }
+
+
+def close_coverage_index(index: dict):
+    """Releases the memory map of an index."""
+    index["data"].close()
+
+
+def _record(index: dict, file_id: int) -> tuple:
+    """Unpacks the path table record of a file."""
+    return RECORD.unpack_from(index["data"], index["records"] + file_id * RECORD.size)
+
+
+def _record_key(index: dict, file_id: int) -> bytes:
+    """Returns the lookup key of a file."""
+    key_offset, key_length = RECORD.unpack_from(index["data"], index["records"] + file_id * RECORD.size)[:2]
+    start = index["strings"] + key_offset
+    return index["data"][start:start + key_length]
+
+
+def indexed_file(index: dict, file_id: int) -> dict:
+    """
+    Returns the path and line counts of an indexed file.
+
+    Returns:
+        Dictionary {"path", "lines", "covered", "partial", "uncovered"}
+        ("lines" is the highest coverable line number).
+    """
+    _, _, path_offset, path_length, line_count, covered, partial, uncovered, _ = _record(index, file_id)
+    start = index["strings"] + path_offset
+    return {
+        "path": index["data"][start:start + path_length].decode('utf-8'),
+        "lines": line_count - 1,
+        STATE_COVERED: covered,
+        STATE_PARTIAL: partial,
+        STATE_UNCOVERED: uncovered,
+    }
+
+
+def find_indexed_files(index: dict, path: str) -> list[int]:
+    """
+    Finds the indexed files whose path ends with `path` (case-insensitive).
+
+    The match is on whole path components: "Foo.cs" matches ".../Game/Foo.cs"
+    but not ".../Game/BarFoo.cs"; an absolute path only matches itself.
+
+    Returns:
+        Ids of the matching files (empty if none, several if `path` is ambiguous).
+    """
+    query = path.replace('\\', '/')
+    while query.startswith("./"):
+        query = query[2:]
+    absolute = query.startswith("/") or query[1:2] == ":"
+    key = _lookup_key(query).encode('utf-8')
+    # Keys are sorted, so all the keys starting with `key` are contiguous
+    low, high = 0, index["count"]
+    while low < high:
+        middle = (low + high) // 2
+        if _record_key(index, middle) < key:
+            low = middle + 1
+        else:
+            high = middle
+    matches = []
+    for file_id in range(low, index["count"]):
+        candidate = _record_key(index, file_id)
+        if not candidate.startswith(key):
+            break
+        # Only whole path components (or the whole path) count as a match
+        if len(candidate) == len(key) or (not absolute and candidate[len(key):len(key) + 1] == b"/"):
+            matches.append(file_id)
+    return matches
+
+
+def line_state(index: dict, file_id: int, line: int) -> str:
+    """Returns the coverage state of a line of an indexed file."""
+    record = _record(index, file_id)
+    line_count, bitmaps_offset = record[4], record[8]
+    if line <= 0 or line >= line_count:
+        return STATE_NOT_COVERABLE
+    size = (line_count + 7) // 8
+    byte_offset = bitmaps_offset + (line >> 3)
+    bit = 1 << (line & 7)
+    data = index["data"]
+    for position, state in enumerate(LINE_STATES):
+        if data[byte_offset + position * size] & bit:
+            return state
+    return STATE_NOT_COVERABLE
+
+
+def coverage_at(index: dict, path: str, line: int) -> str | None:
+    """
+    Returns the coverage state of a line of a source file.
+
+    Args:
+        index: Index state from open_coverage_index().
+        path: Path or path suffix of the source file (see find_indexed_files()).
+        line: 1-based line number.
+
+    Returns:
+        One of STATE_COVERED, STATE_PARTIAL, STATE_UNCOVERED or STATE_NOT_COVERABLE,
+        or None if no indexed file (or more than one) matches `path`.
+    """
+    matches = find_indexed_files(index, path)
+    if len(matches) != 1:
+        return None
+    return line_state(index, matches[0], line)
@@ -3,15 +3,21 @@
 
 """
 Utility functions for C# source file processing.
-Includes excluding auto-generated files and compacting leading indentation.
+Includes excluding auto-generated files and compacting leading indentation,
+and splitting files into namespace, type and member chunks.
 """
 
+import bisect
+import hashlib
 import logging
+import re
 from pathlib import Path
 import io # To handle different line endings gracefully
 
 # --- Constants ---
 AUTO_GENERATED_MARKER = "// <auto-generated />"
+# Chunk kinds whose blocks are split further into chunks
+CONTAINER_KINDS = ("namespace", "class", "struct", "interface", "record")
 
 def process_csharp_content(csharp_string: str, logger: logging.Logger, file_path_for_log: Path) -> str | None:
     """
@@ -46,3 +52,384 @@ def process_csharp_content(csharp_string: str, logger: logging.Logger, file_path
         logger.warning(f"Returning original content for {file_path_for_log.name} due to processing error.")
         return csharp_string # Fallback to original content on error
 
+
+# --- Semantic Chunking ---
+# Code tokens that may start a comment, literal or interpolation hole
+_CODE_TOKEN_RE = re.compile(r'//|/\*|(?m:^[ \t]*#)|\'|(\$*)("{3,})|([@$]{0,3})"|[{}]')
+_CHAR_LITERAL_RE = re.compile(r"'(?:\\.|[^'\\\n])*'?")
+_STRING_END_RE = re.compile(r'\\.|"|\n')
+_VERBATIM_END_RE = re.compile(r'""|"')
+_INTERPOLATED_RE = re.compile(r'\\.|\{\{|\{|"|\n')
+_VERBATIM_INTERPOLATED_RE = re.compile(r'""|\{\{|\{|"')
+_BOUNDARY_RE = re.compile(r'[{};]')
+_NEXT_CODE_RE = re.compile(r'\S')
+# Characters that continue a declaration after a closing brace ('} = ...;', '}.ToList();', '};')
+_CONTINUATION_CHARS = set(';=.?)(,!+-*/%&|^<>:')
+_NON_NEWLINE_RE = re.compile(r'[^\n]')
+
+_ATTRIBUTES_RE = re.compile(r'^\s*(?:\[[^\]]*\]\s*)*')
+_NAMESPACE_RE = re.compile(r'namespace\s+([\w.@]+)')
+_TYPE_RE = re.compile(r'\b(class|struct|interface|enum|record)\s+(?:(?:class|struct)\s+)?(@?\w+(?:\s*<[^>]*>)?)')
+_OPERATOR_RE = re.compile(r'\boperator\s*([^\s(]+)')
+_INDEXER_RE = re.compile(r'\bthis\s*\[')
+_CALLABLE_NAME_RE = re.compile(r'(@?[A-Za-z_][\w.]*)\s*(?:<[^()]*>)?\s*$')
+_LAST_IDENTIFIER_RE = re.compile(r'(@?[A-Za-z_]\w*)\W*$')
+_PARAMETER_NAME_RE = re.compile(r'(?<=\S)\s+@?\w+$')
+_TYPE_SPACING_RE = re.compile(r'\s*([<>,()\[\]?])\s*')
+_PARAMETER_MODIFIERS = {"this", "ref", "out", "in", "params", "scoped", "readonly"}
+
+
+def mask_csharp_code(csharp_string: str) -> str:
+    """
+    Blanks comments and string/char literals (keeping newlines and offsets).
+
+    Handles line and block comments, preprocessor directives, char literals, regular, verbatim,
+    interpolated (including nested literals in interpolation holes) and raw
+    string literals, so the braces and semicolons left in the result are the
+    ones that structure the code.
+
+    Args:
+        csharp_string: The C# content.
+
+    Returns:
+        String of the same length with comment and literal characters replaced by spaces.
+    """
+    source = csharp_string
+    length = len(source)
+    blank_ranges = []       # (start, end) of the outermost comments and literals
+    interpolations = []     # open interpolated strings: [verbatim, hole brace depth]
+    literal_start = 0
+    position = 0
+    while position < length:
+        if interpolations and interpolations[-1][1] == 0:
+            # Inside the text of an interpolated string
+            verbatim = interpolations[-1][0]
+            match = (_VERBATIM_INTERPOLATED_RE if verbatim else _INTERPOLATED_RE).search(source, position)
+            if match is None:
+                break
+            token = match.group()
+            position = match.end()
+            if token == '{':
+                interpolations[-1][1] = 1
+            elif token == '"' or token == '\n':
+                interpolations.pop()
+                if not interpolations:
+                    blank_ranges.append((literal_start, position))
+            continue
+
+        match = _CODE_TOKEN_RE.search(source, position)
+        if match is None:
+            break
+        token = match.group()
+        start = match.start()
+        position = match.end()
+        if token == '{' or token == '}':
+            if interpolations:
+                interpolations[-1][1] += 1 if token == '{' else -1
+            continue
+        if token == '//' or token.endswith('#'):
+            # Line comment or preprocessor directive
+            end = source.find('\n', position)
+            end = length if end < 0 else end
+        elif token == '/*':
+            end = source.find('*/', position)
+            end = length if end < 0 else end + 2
+        elif token == "'":
+            end = _CHAR_LITERAL_RE.match(source, start).end()
+        elif match.group(2):
+            # Raw string literal: ends at the same number of quotes
+            quotes = match.group(2)
+            end = source.find(quotes, position)
+            end = length if end < 0 else end + len(quotes)
+        else:
+            prefix = match.group(3)
+            verbatim = '@' in prefix
+            if '$' in prefix:
+                if not interpolations:
+                    literal_start = start
+                interpolations.append([verbatim, 0])
+                continue
+            end_re = _VERBATIM_END_RE if verbatim else _STRING_END_RE
+            end = length
+            for end_match in end_re.finditer(source, position):
+                if end_match.group() in ('"', '\n'):
+                    end = end_match.end()
+                    break
+        if not interpolations:
+            blank_ranges.append((start, end))
+        position = end
+    if interpolations:
+        blank_ranges.append((literal_start, length))
+
+    pieces = []
+    previous_end = 0
+    for start, end in blank_ranges:
+        pieces.append(source[previous_end:start])
+        pieces.append(_NON_NEWLINE_RE.sub(' ', source[start:end]))
+        previous_end = end
+    pieces.append(source[previous_end:])
+    return "".join(pieces)
+
+
+def _parameter_types(declaration: str, open_char: str = '(') -> str:
+    """
+    Returns the parameter types of the first parameter list of a declaration,
+    e.g. 'string,int' for '(this string value, int count = 1)'.
+    """
+    open_index = declaration.find(open_char)
+    depth = 0
+    parameters = [[]]
+    for char in declaration[open_index + 1:]:
+        if char in '(<[':
+            depth += 1
+        elif char in ')>]':
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parameters.append([])
+            continue
+        parameters[-1].append(char)
+    types = []
+    for parameter in parameters:
+        text = "".join(parameter).split('=', 1)[0]
+        text = text[_ATTRIBUTES_RE.match(text).end():].strip()
+        text = " ".join(w for w in text.split() if w not in _PARAMETER_MODIFIERS)
+        # Drop the parameter name
+        text = _PARAMETER_NAME_RE.sub('', text)
+        if text:
+            types.append(" ".join(_TYPE_SPACING_RE.sub(r'\1', text).split()))
+    return ",".join(types)
+
+
+def _top_level_equals(declaration: str) -> int:
+    """Returns the index of the first '=' or '=>' outside brackets (initializer or expression body), or -1."""
+    depth = 0
+    for index, char in enumerate(declaration):
+        if char in '([<':
+            depth += 1
+        elif char in ')]>' and not (char == '>' and declaration[index - 1:index] == '='):
+            depth -= 1
+        elif char == '=' and depth <= 0:
+            return index
+    return -1
+
+
+def _has_expression_body(header: str, kind: str) -> bool:
+    """Tells whether a member header already has its '=>' or '=' (so a following '{' belongs to the expression)."""
+    declaration = header[_ATTRIBUTES_RE.match(header).end():]
+    if kind == "operator":
+        # 'operator ==', 'operator <=' ... are not initializers
+        declaration = declaration[_OPERATOR_RE.search(declaration).end():]
+    return _top_level_equals(declaration) >= 0
+
+
+def _classify_declaration(header: str, terminator: str, parent: dict | None) -> tuple[str, str] | None:
+    """
+    Classifies the declaration before a '{' or ';' at namespace or type level.
+
+    Returns:
+        Tuple of (kind, name), or None if the text does not declare a namespace, type or member.
+    """
+    declaration = header[_ATTRIBUTES_RE.match(header).end():].strip()
+    if not declaration or declaration.startswith(('using ', 'global ', 'extern alias')):
+        return None
+    namespace_match = _NAMESPACE_RE.match(declaration)
+    if namespace_match:
+        return "namespace", namespace_match.group(1)
+    operator_match = _OPERATOR_RE.search(declaration)
+    if operator_match and parent is not None and '(' in declaration:
+        operator = operator_match.group(1)
+        if re.match(r'\w', operator):
+            # Conversion operator: 'implicit operator Target(...)'
+            operator = f" {operator}"
+        return "operator", f"operator{operator}({_parameter_types(declaration)})"
+
+    equals_index = _top_level_equals(declaration)
+    signature = declaration if equals_index < 0 else declaration[:equals_index]
+    paren_index = signature.find('(')
+    type_match = _TYPE_RE.search(signature if paren_index < 0 else signature[:paren_index])
+    if type_match:
+        return type_match.group(1), re.sub(r'\s+', '', type_match.group(2))
+    if parent is None or parent["kind"] == "namespace":
+        if re.search(r'\bdelegate\b', signature) and paren_index >= 0:
+            name_match = _CALLABLE_NAME_RE.search(signature[:paren_index])
+            return "delegate", f"{name_match.group(1) if name_match else 'delegate'}({_parameter_types(signature)})"
+        return None
+
+    if _INDEXER_RE.search(signature):
+        return "indexer", f"this[{_parameter_types(signature, '[')}]"
+    if paren_index >= 0:
+        name_match = _CALLABLE_NAME_RE.search(signature[:paren_index])
+        if name_match is None:
+            return None
+        name = name_match.group(1)
+        kind = "constructor" if name == parent["name"].split('<', 1)[0] else "method"
+        if signature[:paren_index].rstrip().endswith(f"~{name}"):
+            kind = "finalizer"
+            name = f"~{name}"
+        return kind, f"{name}({_parameter_types(signature)})"
+    name_match = _LAST_IDENTIFIER_RE.search(signature)
+    if name_match is None:
+        return None
+    if re.search(r'\bevent\b', signature):
+        return "event", name_match.group(1)
+    if equals_index >= 0:
+        is_expression_body = declaration[equals_index:equals_index + 2] == '=>'
+        return ("property" if is_expression_body else "field"), name_match.group(1)
+    return ("property" if terminator == '{' else "field"), name_match.group(1)
+
+
+def _is_closable(frames: list) -> bool:
+    """Tells whether the innermost open brace can be closed (the file and a file-scoped namespace cannot)."""
+    chunk = frames[-1][0]
+    return len(frames) > 1 and not (chunk is not None and chunk.get("file_scoped", False))
+
+
+def chunk_csharp_content(csharp_string: str, relative_path: str, logger: logging.Logger) -> list[dict]:
+    """
+    Splits C# content into namespace, type and member chunks.
+
+    Uses a brace- and literal-aware scan (see mask_csharp_code()) instead of a
+    full parser. Each chunk has a stable ID ("<path>#<Namespace>.<Type>.<Member>",
+    methods with their parameter types, repeated names with '~2', '~3', ...),
+    its kind, the 1-based line range and its content. Members hold their full
+    text (with the attributes and comments above them); namespace, type and
+    file chunks hold only the non-blank lines not in a child chunk (usings,
+    declarations, braces), so every line is in exactly one chunk's content.
+
+    Args:
+        csharp_string: The C# content.
+        relative_path: Path of the file used in the chunk IDs.
+        logger: Logger instance.
+
+    Returns:
+        List of chunks: {"id", "path", "kind", "name", "parent", "start_line",
+        "end_line", "hash", "content"}; the first one is the file chunk.
+    """
+    masked = mask_csharp_code(csharp_string)
+    line_starts = [0] + [m.end() for m in re.finditer('\n', csharp_string)]
+    lines = csharp_string.split('\n')
+    if lines and lines[-1] == '' and len(lines) > 1:
+        lines.pop()
+
+    def line_of(offset: int) -> int:
+        return bisect.bisect_right(line_starts, offset)
+
+    file_chunk = {"kind": "file", "name": relative_path.rsplit('/', 1)[-1], "qualified": "",
+                  "start": 0, "end": len(csharp_string), "children": []}
+    chunks = [file_chunk]
+    # Open braces: the chunk they belong to (None for statement blocks) and whether they hold declarations
+    frames: list[tuple[dict | None, bool]] = [(file_chunk, True)]
+    segment_start = 0
+    # Chunk whose block is followed by more of its declaration (an initializer, a
+    # call chain or a switch expression); it ends at the next ';'
+    continued = None
+
+    for match in _BOUNDARY_RE.finditer(masked):
+        position = match.start()
+        boundary = match.group()
+        owner, holds_declarations = frames[-1]
+        if boundary == '}':
+            if _is_closable(frames):
+                closed, _ = frames.pop()
+                if closed is not None:
+                    closed["end"] = position + 1
+                    next_code = _NEXT_CODE_RE.search(masked, position + 1)
+                    if next_code and next_code.group() in _CONTINUATION_CHARS:
+                        continued = closed
+            segment_start = position + 1
+            continue
+
+        if not holds_declarations:
+            if boundary == '{':
+                frames.append((None, False))
+            segment_start = position + 1
+            continue
+
+        if continued is not None:
+            if boundary == '{':
+                frames.append((None, False))
+            else:
+                continued["end"] = position + 1
+                continued = None
+            segment_start = position + 1
+            continue
+
+        header = masked[segment_start:position]
+        stripped = header.strip()
+        classified = _classify_declaration(header, boundary, None if owner is file_chunk else owner) if stripped else None
+        if classified is None:
+            if boundary == '{':
+                frames.append((None, False))
+            segment_start = position + 1
+            continue
+
+        kind, name = classified
+        # The chunk starts with the attributes and comments above the declaration
+        # (not with a comment trailing the previous declaration's last line)
+        first_newline = csharp_string.find('\n', segment_start, position)
+        if first_newline >= 0 and not masked[segment_start:first_newline].strip():
+            segment_start = first_newline + 1
+        start = position - len(csharp_string[segment_start:position].lstrip())
+        chunk = {"kind": kind, "name": name, "parent_chunk": owner,
+                 "qualified": f"{owner['qualified']}.{name}" if owner["qualified"] else name,
+                 "start": start, "end": position + 1, "children": []}
+        owner["children"].append(chunk)
+        chunks.append(chunk)
+        if boundary == '{' and kind not in CONTAINER_KINDS and kind != "enum" and _has_expression_body(header, kind):
+            # The '{' is inside an expression body or initializer ('=> x is { } y ? ...;',
+            # '=> x switch { ... };', '= new() { ... };'): the member ends at its ';'
+            frames.append((None, False))
+            continued = chunk
+        elif boundary == '{':
+            # Enum members are not split; member blocks hold statements
+            frames.append((chunk, kind in CONTAINER_KINDS))
+        elif kind == "namespace":
+            # File-scoped namespace: holds the rest of the file
+            chunk["end"] = len(csharp_string)
+            chunk["file_scoped"] = True
+            frames.append((chunk, True))
+        segment_start = position + 1
+
+    if _is_closable(frames):
+        logger.warning(f"Unbalanced braces in '{relative_path}'; chunks may be incomplete.")
+
+    # Stable IDs: qualified name, with an ordinal for repeated names
+    seen = {}
+    for chunk in chunks:
+        base_id = f"{relative_path}#{chunk['qualified']}" if chunk["qualified"] else relative_path
+        seen[base_id] = seen.get(base_id, 0) + 1
+        chunk["id"] = base_id if seen[base_id] == 1 else f"{base_id}~{seen[base_id]}"
+
+    for chunk in chunks:
+        start_line = line_of(chunk["start"])
+        end_line = max(start_line, min(line_of(max(chunk["end"] - 1, chunk["start"])), len(lines)))
+        chunk["start_line"], chunk["end_line"] = start_line, end_line
+    results = []
+    for chunk in chunks:
+        child_ranges = [(child["start_line"], child["end_line"]) for child in chunk["children"]]
+        own_lines = []
+        child_index = 0
+        line_number = chunk["start_line"]
+        while line_number <= chunk["end_line"]:
+            if child_index < len(child_ranges) and line_number >= child_ranges[child_index][0]:
+                line_number = max(line_number, child_ranges[child_index][1] + 1)
+                child_index += 1
+                continue
+            if lines[line_number - 1].strip():
+                own_lines.append(lines[line_number - 1])
+            line_number += 1
+        content = "\n".join(own_lines) if chunk["children"] else "\n".join(lines[chunk["start_line"] - 1:chunk["end_line"]])
+        results.append({
+            "id": chunk["id"],
+            "path": relative_path,
+            "kind": chunk["kind"],
+            "name": chunk["name"],
+            "parent": chunk["parent_chunk"]["id"] if "parent_chunk" in chunk else None,
+            "start_line": chunk["start_line"],
+            "end_line": chunk["end_line"],
+            "hash": hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest(),
+            "content": content,
+        })
+    return results
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for working with the .csproj project graph.
+Discovers projects, reads their ProjectReference edges, maps files to the
+project that owns them and finds the projects affected by a change.
+Uses the built-in 'xml.etree.ElementTree' library.
+"""
+
+import logging
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# --- Constants ---
+# Directories that never contain projects of their own
+SKIPPED_DIR_NAMES = {'.git', '.vs', 'bin', 'obj', 'node_modules', 'testresults', 'coveragereports'}
+# MSBuild files that are imported by every project in or below their directory
+BUILD_WIDE_FILE_NAMES = {'directory.build.props', 'directory.build.targets', 'directory.packages.props',
+                         'global.json', 'nuget.config'}
+
+
+def find_csproj_files(source_dir: Path) -> list[Path]:
+    """
+    Finds all .csproj files below a directory (skipping build output folders).
+
+    Args:
+        source_dir: Directory to search.
+
+    Returns:
+        Sorted list of resolved .csproj paths.
+    """
+    projects = []
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        dir_names[:] = [d for d in dir_names if d.lower() not in SKIPPED_DIR_NAMES]
+        for file_name in file_names:
+            if file_name.lower().endswith('.csproj'):
+                projects.append(Path(dir_path, file_name).resolve())
+    return sorted(projects)
+
+
+def read_project_references(csproj_path: Path, logger: logging.Logger) -> list[Path]:
+    """
+    Reads the ProjectReference items of a .csproj file.
+
+    Args:
+        csproj_path: Path to the .csproj file.
+        logger: Logger instance for logging warnings.
+
+    Returns:
+        Resolved paths of the referenced projects (empty if the file cannot be parsed).
+    """
+    try:
+        root = ET.parse(csproj_path).getroot()
+    except (ET.ParseError, OSError) as e:
+        logger.warning(f"Could not read project references from '{csproj_path}': {e}")
+        return []
+
+    references = []
+    # SDK-style projects have no XML namespace; legacy ones use the MSBuild namespace
+    for element in root.iter():
+        if element.tag.rsplit('}', 1)[-1] == 'ProjectReference':
+            include = element.get('Include')
+            if include:
+                # Include paths use Windows separators
+                references.append((csproj_path.parent / include.replace('\\', '/')).resolve())
+    return references
+
+
+def build_project_graph(source_dir: Path, logger: logging.Logger) -> dict[Path, list[Path]]:
+    """
+    Builds the project reference graph of all .csproj files below a directory.
+
+    Args:
+        source_dir: Directory to search for projects.
+        logger: Logger instance.
+
+    Returns:
+        Dictionary mapping each .csproj path to the .csproj paths it references.
+    """
+    graph = {project: read_project_references(project, logger) for project in find_csproj_files(source_dir)}
+    logger.debug(f"Found {len(graph)} projects with {sum(len(r) for r in graph.values())} references under '{source_dir}'.")
+    return graph
+
+
+def find_dependents(graph: dict[Path, list[Path]], projects: set[Path]) -> set[Path]:
+    """
+    Finds the given projects plus every project that references them, directly or transitively.
+
+    Args:
+        graph: Project reference graph (see build_project_graph()).
+        projects: Starting set of .csproj paths.
+
+    Returns:
+        Set of affected .csproj paths (including the starting projects).
+    """
+    dependents: dict[Path, list[Path]] = {}
+    for project, references in graph.items():
+        for reference in references:
+            dependents.setdefault(reference, []).append(project)
+
+    affected = set(projects)
+    pending = list(projects)
+    while pending:
+        for dependent in dependents.get(pending.pop(), []):
+            if dependent not in affected:
+                affected.add(dependent)
+                pending.append(dependent)
+    return affected
+
+
+def projects_by_directory(graph: dict[Path, list[Path]]) -> dict[Path, Path]:
+    """Maps each project directory to its .csproj path (built once, see find_owning_project())."""
+    return {project.parent: project for project in graph}
+
+
+def find_owning_project(file_path: Path, project_by_dir: dict[Path, Path]) -> Path | None:
+    """
+    Finds the project whose directory is the nearest ancestor of a file.
+
+    Args:
+        file_path: Resolved path of the file.
+        project_by_dir: Project directories and their .csproj paths (see projects_by_directory()).
+
+    Returns:
+        The owning .csproj path, or None if the file is outside every project.
+    """
+    for parent in file_path.parents:
+        if parent in project_by_dir:
+            return project_by_dir[parent]
+    return None
+
+
+def map_files_to_projects(file_paths: list[Path], graph: dict[Path, list[Path]],
+                          logger: logging.Logger) -> set[Path]:
+    """
+    Maps changed files to the projects they directly affect.
+
+    A file belongs to its owning project. A build-wide MSBuild file (e.g.
+    Directory.Build.props) affects every project in or below its directory.
+    Other files outside every project are ignored.
+
+    Args:
+        file_paths: Resolved paths of the changed files.
+        graph: Project reference graph (see build_project_graph()).
+        logger: Logger instance.
+
+    Returns:
+        Set of directly affected .csproj paths.
+    """
+    affected = set()
+    project_by_dir = projects_by_directory(graph)
+    for file_path in file_paths:
+        if file_path.name.lower() in BUILD_WIDE_FILE_NAMES:
+            scope = file_path.parent
+            matches = {p for p in graph if p.parent == scope or scope in p.parents}
+            logger.debug(f"Build-wide file '{file_path}' affects {len(matches)} projects.")
+            affected |= matches
+            continue
+
+        project = find_owning_project(file_path, project_by_dir)
+        if project is None:
+            logger.debug(f"Changed file '{file_path}' is not part of any project.")
+        else:
+            affected.add(project)
+    return affected
+
+
+def select_projects(names: list[str], graph: dict[Path, list[Path]], logger: logging.Logger) -> set[Path]:
+    """
+    Resolves project names given on the command line to .csproj paths.
+
+    A name matches a project by assembly name ('VttTools.Game'), folder
+    name ('Game') or .csproj path, case-insensitively.
+
+    Args:
+        names: Project names or paths.
+        graph: Project reference graph (see build_project_graph()).
+        logger: Logger instance for logging unknown names.
+
+    Returns:
+        Set of matching .csproj paths.
+    """
+    selected = set()
+    for name in names:
+        name_lower = name.lower().replace('\\', '/').rstrip('/')
+        matches = {p for p in graph
+                   if name_lower in (p.stem.lower(), p.parent.name.lower())
+                   or p.as_posix().lower().endswith('/' + name_lower)}
+        if not matches:
+            logger.warning(f"No project matches '{name}'.")
+        selected |= matches
+    return selected
+
+
+def read_solution_projects(solution_path: Path, logger: logging.Logger) -> list[Path]:
+    """
+    Reads the project paths listed in a .slnx solution file.
+
+    Args:
+        solution_path: Path to the .slnx file.
+        logger: Logger instance for logging errors.
+
+    Returns:
+        Resolved project paths in solution order (empty if the file cannot be parsed).
+    """
+    try:
+        root = ET.parse(solution_path).getroot()
+    except (ET.ParseError, OSError) as e:
+        logger.error(f"Could not read solution '{solution_path}': {e}")
+        return []
+    return [(solution_path.parent / element.get('Path').replace('\\', '/')).resolve()
+            for element in root.iter('Project') if element.get('Path')]
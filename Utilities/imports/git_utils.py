@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for querying the git working tree.
+Requires the 'git' command line tool in PATH.
+"""
+
+import logging
+import subprocess
+from pathlib import Path
+
+
+def run_git(args: list[str], repo_dir: Path, logger: logging.Logger, quiet: bool = False) -> list[str] | None:
+    """
+    Runs a git command and returns its non-empty output lines.
+
+    Args:
+        args: Arguments passed to git (without the 'git' command itself).
+        repo_dir: Directory inside the repository to run git in.
+        logger: Logger instance for logging errors.
+        quiet: Log failures at DEBUG level (for optional information).
+
+    Returns:
+        Output lines, or None if git is missing or the command failed.
+    """
+    try:
+        process = subprocess.run(["git", *args], cwd=repo_dir, check=True,
+                                 capture_output=True, text=True, encoding='utf-8')
+    except FileNotFoundError:
+        (logger.debug if quiet else logger.error)("Error: Command not found: 'git'. Is git installed and in PATH?")
+        return None
+    except subprocess.CalledProcessError as e:
+        (logger.debug if quiet else logger.error)(f"'git {' '.join(args)}' failed with exit code {e.returncode}: {e.stderr.strip()}")
+        return None
+    return [line for line in process.stdout.splitlines() if line.strip()]
+
+
+def changed_files_since(revision: str, repo_dir: Path, logger: logging.Logger) -> list[Path] | None:
+    """
+    Lists the files changed in the working tree since a revision,
+    including uncommitted and untracked (but not ignored) files.
+
+    Args:
+        revision: Any git revision (commit, branch, tag, 'HEAD~3', ...).
+        repo_dir: Directory inside the repository.
+        logger: Logger instance.
+
+    Returns:
+        Sorted resolved paths of the changed files (deleted files included),
+        or None if git failed.
+    """
+    top_level = run_git(["rev-parse", "--show-toplevel"], repo_dir, logger)
+    changed = run_git(["diff", "--name-only", revision, "--"], repo_dir, logger)
+    untracked = run_git(["ls-files", "--others", "--exclude-standard", "--full-name"], repo_dir, logger)
+    if top_level is None or changed is None or untracked is None:
+        return None
+
+    # Both commands report paths relative to the repository root
+    root = Path(top_level[0])
+    files = sorted({(root / name).resolve() for name in changed + untracked})
+    logger.debug(f"{len(files)} files changed since '{revision}'.")
+    return files
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for the local coverage history store.
+Each coverage run is ingested into a SQLite database (per-assembly,
+per-class and per-file line and branch counts), indexed by run, assembly
+and class so trend and regression queries answer in milliseconds.
+Uses the built-in 'sqlite3' library.
+"""
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+# --- Constants ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    revision TEXT,
+    covered_lines INTEGER NOT NULL,
+    coverable_lines INTEGER NOT NULL,
+    covered_branches INTEGER NOT NULL,
+    total_branches INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assembly_coverage (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    assembly TEXT NOT NULL,
+    covered_lines INTEGER NOT NULL,
+    coverable_lines INTEGER NOT NULL,
+    covered_branches INTEGER NOT NULL,
+    total_branches INTEGER NOT NULL,
+    PRIMARY KEY (run_id, assembly)
+);
+CREATE TABLE IF NOT EXISTS class_coverage (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    assembly TEXT NOT NULL,
+    class TEXT NOT NULL,
+    file TEXT, -- ';'-separated when a (partial) class spans several files
+    covered_lines INTEGER NOT NULL,
+    coverable_lines INTEGER NOT NULL,
+    covered_branches INTEGER NOT NULL,
+    total_branches INTEGER NOT NULL,
+    PRIMARY KEY (run_id, assembly, class)
+);
+CREATE TABLE IF NOT EXISTS file_coverage (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    file TEXT NOT NULL,
+    covered_lines INTEGER NOT NULL,
+    coverable_lines INTEGER NOT NULL,
+    covered_branches INTEGER NOT NULL,
+    total_branches INTEGER NOT NULL,
+    PRIMARY KEY (run_id, file)
+);
+CREATE INDEX IF NOT EXISTS ix_assembly_coverage_assembly ON assembly_coverage(assembly, run_id);
+CREATE INDEX IF NOT EXISTS ix_class_coverage_class ON class_coverage(class, run_id);
+CREATE INDEX IF NOT EXISTS ix_class_coverage_assembly ON class_coverage(assembly, run_id);
+CREATE INDEX IF NOT EXISTS ix_file_coverage_file ON file_coverage(file, run_id);
+"""
+
+
+def open_history(db_path: Path) -> sqlite3.Connection:
+    """
+    Opens (and creates if needed) the history database.
+
+    Args:
+        db_path: Path to the SQLite file.
+
+    Returns:
+        An open connection with the schema in place.
+    """
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _count_lines(lines: dict) -> tuple[int, int, int, int]:
+    """Returns (covered lines, coverable lines, covered branches, total branches) of the lines of a file."""
+    return (sum(1 for line in lines.values() if line[0] > 0), len(lines),
+            sum(line[1] for line in lines.values()), sum(line[2] for line in lines.values()))
+
+
+def ingest_run(connection: sqlite3.Connection, coverage: dict, revision: str | None,
+               logger: logging.Logger) -> int:
+    """
+    Stores one coverage run.
+
+    Args:
+        connection: Open history connection (see open_history()).
+        coverage: Merged coverage dictionary (see imports.cobertura_utils).
+        revision: Source revision the run was taken from, if known.
+        logger: Logger instance.
+
+    Returns:
+        The id of the new run.
+    """
+    class_rows = []
+    assembly_rows = []
+    file_totals: dict[str, list[int]] = {}
+    for assembly_name, classes in coverage.items():
+        assembly_totals = [0, 0, 0, 0]
+        for class_name, class_data in classes.items():
+            class_totals = [0, 0, 0, 0]
+            for file_name, lines in class_data["files"].items():
+                file_total = file_totals.setdefault(file_name, [0, 0, 0, 0])
+                for index, value in enumerate(_count_lines(lines)):
+                    class_totals[index] += value
+                    file_total[index] += value
+            class_rows.append((assembly_name, class_name, ";".join(sorted(f for f in class_data["files"] if f)) or None,
+                               *class_totals))
+            for index, value in enumerate(class_totals):
+                assembly_totals[index] += value
+        assembly_rows.append((assembly_name, *assembly_totals))
+    run_totals = [sum(row[index] for row in assembly_rows) for index in range(1, 5)]
+
+    with connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (started_at, revision, covered_lines, coverable_lines, covered_branches, total_branches) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (time.strftime('%Y-%m-%dT%H:%M:%S'), revision, *run_totals))
+        run_id = cursor.lastrowid
+        connection.executemany("INSERT INTO assembly_coverage VALUES (?, ?, ?, ?, ?, ?)",
+                               [(run_id, *row) for row in assembly_rows])
+        connection.executemany("INSERT INTO class_coverage VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               [(run_id, *row) for row in class_rows])
+        connection.executemany("INSERT INTO file_coverage VALUES (?, ?, ?, ?, ?, ?)",
+                               [(run_id, file_name, *totals) for file_name, totals in file_totals.items() if file_name])
+    logger.info(f"Stored coverage run {run_id} ({len(assembly_rows)} assemblies, {len(class_rows)} classes) in history.")
+    return run_id
+
+
+def query_runs(connection: sqlite3.Connection, limit: int = 50) -> list[tuple]:
+    """
+    Lists the stored runs with their solution totals.
+
+    Args:
+        connection: Open history connection.
+        limit: Number of most recent runs to return.
+
+    Returns:
+        Rows of (run id, started at, revision, covered lines, coverable lines,
+        covered branches, total branches), oldest first.
+    """
+    rows = connection.execute(
+        "SELECT id, started_at, revision, covered_lines, coverable_lines, covered_branches, total_branches "
+        "FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return rows[::-1]
+
+
+def query_trend(connection: sqlite3.Connection, assembly: str | None = None, class_name: str | None = None,
+                limit: int = 50) -> list[tuple]:
+    """
+    Returns the coverage of the whole solution, an assembly or a class over the last runs.
+
+    Args:
+        connection: Open history connection.
+        assembly: Assembly name (None for the whole solution).
+        class_name: Fully qualified class name (takes precedence over assembly).
+        limit: Number of most recent runs to return.
+
+    Returns:
+        Rows of (run id, started at, revision, covered lines, coverable lines,
+        covered branches, total branches), oldest first.
+    """
+    if class_name:
+        table, condition, parameter = "class_coverage", "c.class = ?", class_name
+    elif assembly:
+        table, condition, parameter = "assembly_coverage", "c.assembly = ?", assembly
+    else:
+        return query_runs(connection, limit)
+    rows = connection.execute(
+        f"SELECT r.id, r.started_at, r.revision, c.covered_lines, c.coverable_lines, c.covered_branches, c.total_branches "
+        f"FROM {table} c JOIN runs r ON r.id = c.run_id WHERE {condition} ORDER BY r.id DESC LIMIT ?",
+        (parameter, limit)).fetchall()
+    return rows[::-1]
+
+
+def query_drops(connection: sqlite3.Connection, base_run: int | None = None, run: int | None = None,
+                min_drop: float = 0.0) -> list[tuple]:
+    """
+    Finds classes whose line coverage dropped between two runs.
+
+    Args:
+        connection: Open history connection.
+        base_run: Run to compare against (default: the run before `run`).
+        run: Run to check (default: the latest run).
+        min_drop: Minimum drop in percentage points to report.
+
+    Returns:
+        Rows of (assembly, class, base coverage %, coverage %, drop), largest drop first.
+    """
+    if run is None:
+        row = connection.execute("SELECT MAX(id) FROM runs").fetchone()
+        run = row[0] if row else None
+    if run is not None and base_run is None:
+        row = connection.execute("SELECT MAX(id) FROM runs WHERE id < ?", (run,)).fetchone()
+        base_run = row[0] if row else None
+    if run is None or base_run is None:
+        return []
+
+    return connection.execute(
+        """
+        SELECT cur.assembly, cur.class,
+               ROUND(100.0 * prev.covered_lines / prev.coverable_lines, 1) AS base_rate,
+               ROUND(100.0 * cur.covered_lines / cur.coverable_lines, 1) AS rate,
+               ROUND(100.0 * prev.covered_lines / prev.coverable_lines
+                     - 100.0 * cur.covered_lines / cur.coverable_lines, 1) AS drop_points
+        FROM class_coverage cur
+        JOIN class_coverage prev
+          ON prev.run_id = ? AND prev.assembly = cur.assembly AND prev.class = cur.class
+        WHERE cur.run_id = ? AND cur.coverable_lines > 0 AND prev.coverable_lines > 0
+          AND 100.0 * prev.covered_lines / prev.coverable_lines
+              - 100.0 * cur.covered_lines / cur.coverable_lines > ?
+        ORDER BY drop_points DESC, cur.assembly, cur.class
+        """, (base_run, run, min_drop)).fetchall()
@@ -31,7 +31,7 @@ def process_json_content(json_string: str, logger: logging.Logger, file_path_for
         # ensure_ascii=False preserves non-ASCII characters directly
         compacted_json = json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
 
-        logger.debug(f"Successfully compacted JSON content from {file_path_for_log.name}")
+        logger.debug("Successfully compacted JSON content from %s", file_path_for_log.name)
         return compacted_json
     except json.JSONDecodeError as e:
         # Log a warning if the JSON is invalid
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for merge_code.py run metrics.
+Keeps cheap always-on counters (time per stage, files and bytes in/out per
+extension, the slowest files) in a plain dictionary and writes them as a
+JSON metrics report.
+Uses the built-in 'heapq' and 'json' libraries.
+"""
+
+import heapq
+import json
+import logging
+import time
+from pathlib import Path
+
+from imports.timing_utils import current_peak_rss_bytes
+
+# --- Constants ---
+METRICS_VERSION = 1
+# Stages of a merge run; "walk" is the part of the folder processing not spent reading, decoding or processing files
+STAGES = ("walk", "read", "decode", "xml", "json", "csharp", "chunk", "serialize")
+
+
+def new_metrics(top_files: int = 10, exact_sizes: bool = False) -> dict:
+    """
+    Creates empty run metrics.
+
+    Args:
+        top_files: Number of slowest files to keep.
+        exact_sizes: Count the output in UTF-8 bytes (encodes every output a
+                     second time, so only when the metrics are written);
+                     otherwise it is counted in characters.
+
+    Returns:
+        Metrics dictionary: the callers add seconds to metrics["stages"][stage]
+        directly and count files with record_file().
+    """
+    return {
+        "stages": {stage: 0.0 for stage in STAGES},
+        "extensions": {},   # extension -> [files, bytes in, bytes out]
+        "folders": 0,
+        "files": 0,
+        "excluded_files": 0,
+        "read_errors": 0,
+        "resumed_files": 0, # taken from a checkpoint (--resume) instead of being read
+        "_slowest": [],     # min-heap of (seconds, path)
+        "_top": top_files,
+        "_exact_sizes": exact_sizes,
+    }
+
+
+def output_size(metrics: dict, content: str) -> int:
+    """Returns the size of an output as counted by the metrics (UTF-8 bytes or characters, see new_metrics())."""
+    return len(content.encode('utf-8')) if metrics["_exact_sizes"] else len(content)
+
+
+def record_file(metrics: dict, file_path: Path, bytes_in: int, bytes_out: int | None, seconds: float):
+    """
+    Counts one processed file.
+
+    Args:
+        metrics: Metrics created by new_metrics().
+        file_path: The file.
+        bytes_in: Size of the file on disk.
+        bytes_out: Size of the content written to the output, from output_size() (None if the file was excluded).
+        seconds: Total time spent on the file (read, decode and processing).
+    """
+    extension = file_path.suffix.lower() or "(none)"
+    counters = metrics["extensions"].get(extension)
+    if counters is None:
+        counters = metrics["extensions"][extension] = [0, 0, 0]
+    counters[0] += 1
+    counters[1] += bytes_in
+    if bytes_out is None:
+        metrics["excluded_files"] += 1
+    else:
+        counters[2] += bytes_out
+        metrics["files"] += 1
+
+    slowest = metrics["_slowest"]
+    if len(slowest) < metrics["_top"]:
+        heapq.heappush(slowest, (seconds, str(file_path)))
+    elif slowest and seconds > slowest[0][0]:
+        heapq.heapreplace(slowest, (seconds, str(file_path)))
+
+
+def finish_metrics(metrics: dict, process_seconds: float, total_seconds: float) -> dict:
+    """
+    Completes the metrics of a run and returns the report.
+
+    Args:
+        metrics: Metrics created by new_metrics().
+        process_seconds: Wall time of the folder processing (walk, read, decode and processors).
+        total_seconds: Wall time of the whole run.
+
+    Returns:
+        The metrics report (JSON-serializable).
+    """
+    stages = metrics["stages"]
+    file_seconds = sum(stages[stage] for stage in ("read", "decode", "xml", "json", "csharp"))
+    stages["walk"] = max(0.0, process_seconds - file_seconds)
+    extensions = {}
+    for extension, (files, bytes_in, bytes_out) in sorted(metrics["extensions"].items()):
+        extensions[extension] = {"files": files, "bytes_in": bytes_in, "bytes_out": bytes_out,
+                                 "ratio": round(bytes_out / bytes_in, 4) if bytes_in else None}
+    total_in = sum(e["bytes_in"] for e in extensions.values())
+    total_out = sum(e["bytes_out"] for e in extensions.values())
+    return {
+        "version": METRICS_VERSION,
+        "finished_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "total_seconds": round(total_seconds, 4),
+        "stages": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "folders": metrics["folders"],
+        "files": metrics["files"],
+        "excluded_files": metrics["excluded_files"],
+        "read_errors": metrics["read_errors"],
+        "resumed_files": metrics["resumed_files"],
+        "bytes_in": total_in,
+        "bytes_out": total_out,
+        "bytes_out_exact": metrics["_exact_sizes"], # False: bytes_out counts characters
+        "extensions": extensions,
+        "slowest_files": [{"path": path, "seconds": round(seconds, 4)}
+                          for seconds, path in sorted(metrics["_slowest"], reverse=True)],
+        "peak_rss_bytes": current_peak_rss_bytes(),
+    }
+
+
+def write_metrics(report: dict, output_path: Path, logger: logging.Logger) -> bool:
+    """
+    Writes a metrics report as JSON.
+
+    Returns:
+        True if the report was written, False otherwise.
+    """
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as metrics_fh:
+            json.dump(report, metrics_fh, indent=2)
+        logger.info(f"Metrics written to: {output_path}")
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write metrics '{output_path}': {e}")
+        return False
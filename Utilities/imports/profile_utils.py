@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for profiling the Utilities scripts (--profile).
+Runs a script's main() under cProfile (writing a .pstats file) and/or a
+low-overhead stack sampler (writing collapsed stacks, one
+"frame;frame;frame count" line per stack, as read by flamegraph.pl,
+speedscope or inferno).
+Uses the built-in 'cProfile' and 'threading' libraries.
+"""
+
+import argparse
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# --- Constants ---
+PROFILE_MODES = ("cprofile", "sample")
+# Seconds between two stack samples
+SAMPLE_INTERVAL = 0.005
+
+# --- Logging Setup ---
+log = logging.getLogger(__name__)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """Adds the shared --profile options to a script's argument parser."""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile this run and write <prefix>.pstats (cprofile mode) and <prefix>.collapsed (stacks for flamegraph tools)."
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=PROFILE_MODES,
+        default="cprofile",
+        help="'cprofile': deterministic profile plus stack samples; 'sample': stack samples only (lowest overhead)."
+    )
+    parser.add_argument(
+        "--profile-output",
+        default=None,
+        help="Path prefix of the profile files (default: <script>-<timestamp> in CWD)."
+    )
+
+
+def _frame_name(frame) -> str:
+    """Returns the flamegraph label of a frame ('function (file:line)')."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _sample_stacks(stacks: dict[str, int], stopped: threading.Event, interval: float):
+    """Counts the call stacks of all other threads every `interval` seconds until `stopped` is set."""
+    sampler_id = threading.get_ident()
+    thread_names = {}
+    while not stopped.wait(interval):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+            if thread_id not in thread_names:
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            names.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            stack = ";".join(reversed(names))
+            stacks[stack] = stacks.get(stack, 0) + 1
+
+
+def write_collapsed_stacks(stacks: dict[str, int], output_path: Path):
+    """Writes stack sample counts in the collapsed-stack format."""
+    with open(output_path, 'w', encoding='utf-8') as stacks_fh:
+        for stack, count in sorted(stacks.items()):
+            stacks_fh.write(f"{stack} {count}\n")
+
+
+def run_main(main, script_name: str):
+    """
+    Runs a script's main(), profiled when --profile is on the command line.
+
+    The profile options are read here, before main() parses its own
+    arguments (main() declares them too via add_profile_arguments(), so they
+    show up in --help and are accepted). The profile files are written even
+    when main() exits with an error.
+
+    Args:
+        main: The script's main function.
+        script_name: Script name used for the default profile file names.
+    """
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    add_profile_arguments(profile_parser)
+    profile_args, _ = profile_parser.parse_known_args()
+    if not profile_args.profile:
+        main()
+        return
+
+    prefix = profile_args.profile_output or f"{script_name}-{time.strftime('%Y%m%d-%H%M%S')}"
+    prefix_path = Path(prefix).resolve()
+    profiler = cProfile.Profile() if profile_args.profile_mode == "cprofile" else None
+    stacks: dict[str, int] = {}
+    stopped = threading.Event()
+    sampler = threading.Thread(target=_sample_stacks, args=(stacks, stopped, SAMPLE_INTERVAL),
+                               name="profile-sampler", daemon=True)
+    sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        main()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stopped.set()
+        sampler.join()
+        try:
+            prefix_path.parent.mkdir(parents=True, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(f"{prefix_path}.pstats")
+                log.info(f"cProfile statistics written to: {prefix_path}.pstats")
+            write_collapsed_stacks(stacks, Path(f"{prefix_path}.collapsed"))
+            log.info(f"Collapsed stacks ({sum(stacks.values())} samples) written to: {prefix_path}.collapsed")
+        except OSError as e:
+            log.warning(f"Could not write profile '{prefix_path}': {e}")
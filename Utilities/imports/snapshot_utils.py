@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for the merge_code.py snapshot server ('serve').
+Keeps the files of a merged snapshot in memory (path -> content), refreshes
+them incrementally from the source tree (only new or modified files are
+re-read), and answers list, get, subtree, search, refresh and stats requests
+over stdio (JSON lines) or localhost HTTP. Encoded responses are kept in an
+LRU cache that is cleared whenever a refresh changes the snapshot.
+Uses the built-in 'http.server' and 'threading' libraries.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+# --- Constants ---
+OPERATIONS = ("list", "get", "subtree", "search", "refresh", "stats")
+DEFAULT_SEARCH_LIMIT = 100
+# Longest matching line returned by a search
+MAX_MATCH_LINE = 300
+
+# --- Logging Setup ---
+log = logging.getLogger(__name__)
+
+
+# --- Snapshot ---
+
+def flatten_snapshot(root_data: dict | None) -> dict[str, str]:
+    """
+    Converts a merged tree (as written by merge_code.py) to a flat mapping.
+
+    Args:
+        root_data: The merged root folder node, or None for an empty snapshot.
+
+    Returns:
+        Dictionary of file path (relative to the root folder, '/'-separated) -> content.
+    """
+    files = {}
+    if not root_data:
+        return files
+    pending = [("", root_data)]
+    while pending:
+        prefix, folder = pending.pop()
+        for child in folder.get("children", []):
+            path = f"{prefix}{child['name']}"
+            if child.get("type") == "folder":
+                pending.append((f"{path}/", child))
+            else:
+                files[path] = child.get("content") or ""
+    return files
+
+
+def build_subtree(files: dict[str, str], folder: str, root_name: str) -> dict | None:
+    """
+    Builds the merged-format tree of one folder of the snapshot.
+
+    Args:
+        files: Snapshot files (path -> content).
+        folder: Folder path ('' for the root).
+        root_name: Name of the root folder node.
+
+    Returns:
+        The folder node ({"type": "folder", "name", "children"}), or None if the folder has no files.
+    """
+    prefix = f"{folder}/" if folder else ""
+    root = {"type": "folder", "name": folder.rsplit('/', 1)[-1] if folder else root_name, "children": []}
+    folders = {"": root}
+    found = False
+    for path in sorted(files):
+        if not path.startswith(prefix):
+            continue
+        found = True
+        parts = path[len(prefix):].split('/')
+        parent_key = ""
+        for part in parts[:-1]:
+            key = f"{parent_key}/{part}" if parent_key else part
+            if key not in folders:
+                node = {"type": "folder", "name": part, "children": []}
+                folders[parent_key]["children"].append(node)
+                folders[key] = node
+            parent_key = key
+        folders[parent_key]["children"].append({"type": "file", "name": parts[-1], "content": files[path]})
+    return root if found else None
+
+
+def scan_tree(root: Path, exclude_dirs: set, allowed_exts: set) -> dict[str, tuple[int, int]]:
+    """
+    Lists the files merge_code.py would include, with their modification stamps.
+
+    Args:
+        root: Directory the snapshot was built from.
+        exclude_dirs: Set of lowercase directory names to exclude.
+        allowed_exts: Set of lowercase extensions to include.
+
+    Returns:
+        Dictionary of file path (relative to root, '/'-separated) -> (mtime_ns, size).
+    """
+    stamps = {}
+    pending = [(root, "")]
+    while pending:
+        folder, prefix = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if entry.name.lower() not in exclude_dirs:
+                                pending.append((entry.path, f"{prefix}{entry.name}/"))
+                        elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in allowed_exts:
+                            stat = entry.stat()
+                            stamps[f"{prefix}{entry.name}"] = (stat.st_mtime_ns, stat.st_size)
+                    except OSError:
+                        continue
+        except OSError as e:
+            log.warning(f"Could not scan directory '{folder}': {e}")
+    return stamps
+
+
+def new_snapshot_state(root: Path, files: dict[str, str], snapshot_mtime_ns: int, cache_entries: int) -> dict:
+    """
+    Creates the in-memory state of the server.
+
+    Args:
+        root: Directory the snapshot was built from.
+        files: Snapshot files (path -> content), e.g. from flatten_snapshot().
+        snapshot_mtime_ns: Modification time of the snapshot file; source files
+                           modified later are re-read by the first refresh.
+        cache_entries: Maximum number of encoded responses kept in the LRU cache.
+
+    Returns:
+        State dictionary used by refresh_snapshot() and answer_request().
+    """
+    return {
+        "root": root,
+        "files": files,
+        # path -> (mtime_ns, size); None until the first refresh has scanned the tree
+        "stamps": None,
+        "snapshot_mtime_ns": snapshot_mtime_ns,
+        "generation": 0,
+        "lock": threading.Lock(),
+        "refresh_lock": threading.Lock(),
+        "cache": OrderedDict(),
+        "cache_entries": cache_entries,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "requests": 0,
+        "last_refresh": None,
+        # Set by the caller: callable() -> dict that refreshes the state
+        "refresh": None,
+    }
+
+
+def refresh_snapshot(state: dict, exclude_dirs: set, allowed_exts: set, read_content,
+                     logger: logging.Logger) -> dict:
+    """
+    Brings the snapshot up to date with the source tree.
+
+    Only new files and files whose modification time or size changed are read
+    again; files that disappeared are dropped. On the first refresh, snapshot
+    files not modified since the snapshot was written are kept as they are.
+    Requests keep being answered from the previous state while files are read.
+
+    Args:
+        state: State created by new_snapshot_state().
+        exclude_dirs: Set of lowercase directory names to exclude.
+        allowed_exts: Set of lowercase extensions to include.
+        read_content: Callable(Path) -> str | None returning the processed
+                      content of a file (None if the file is excluded).
+        logger: Logger instance.
+
+    Returns:
+        Counts of the refresh: {"added", "changed", "removed", "seconds"}.
+    """
+    with state["refresh_lock"]:
+        start_time = time.perf_counter()
+        root = state["root"]
+        stamps = scan_tree(root, exclude_dirs, allowed_exts)
+        with state["lock"]:
+            old_stamps = state["stamps"]
+            files = state["files"]
+            if old_stamps is None:
+                # First refresh: trust the snapshot for files not modified after it was written
+                limit = state["snapshot_mtime_ns"]
+                to_read = [p for p, (mtime_ns, _) in stamps.items() if p not in files or mtime_ns > limit]
+            else:
+                to_read = [p for p, stamp in stamps.items() if old_stamps.get(p) != stamp]
+            removed = [p for p in files if p not in stamps]
+
+        contents = {}
+        for path in to_read:
+            content = read_content(root / path)
+            if content is not None:
+                contents[path] = content
+            else:
+                removed.append(path)
+
+        with state["lock"]:
+            files = state["files"]
+            added = sum(1 for p in contents if p not in files)
+            changed = [p for p, content in contents.items() if p in files and files[p] != content]
+            files.update(contents)
+            for path in removed:
+                files.pop(path, None)
+            state["stamps"] = stamps
+            if added or changed or removed:
+                state["generation"] += 1
+                state["cache"].clear()
+            state["last_refresh"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+        counts = {"added": added, "changed": len(changed), "removed": len(removed),
+                  "seconds": round(time.perf_counter() - start_time, 4)}
+        if added or changed or removed:
+            logger.info(f"Snapshot refreshed: {added} added, {len(changed)} changed, {len(removed)} removed "
+                        f"({counts['seconds']:.3f}s).")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Snapshot up to date (%s files scanned in %.3fs).", len(stamps), counts["seconds"])
+        return counts
+
+
+def start_refresh_thread(state: dict, interval: float, logger: logging.Logger) -> threading.Thread:
+    """Calls state["refresh"] every `interval` seconds in a daemon thread."""
+    def refresh_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                state["refresh"]()
+            except Exception:
+                logger.exception("Snapshot refresh failed.")
+
+    thread = threading.Thread(target=refresh_loop, name="snapshot-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+# --- Requests ---
+
+def _flag(value) -> bool:
+    """Reads a boolean request parameter (JSON value or query string)."""
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _text(request: dict, name: str) -> str:
+    """Reads a string request parameter ('' when missing); raises ValueError for other types."""
+    value = request.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"'{name}' must be a string.")
+    return value
+
+
+def _limit(request: dict) -> int:
+    """Reads the positive integer "limit" parameter (JSON number or query string); raises ValueError otherwise."""
+    value = request.get("limit")
+    if value is None or value == "":
+        return DEFAULT_SEARCH_LIMIT
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise ValueError("'limit' must be a positive integer.")
+    return value
+
+
+def _search(files: dict[str, str], request: dict) -> dict:
+    """Finds the lines matching a substring or regular expression."""
+    query = _text(request, "query")
+    if not query:
+        raise ValueError("'query' is required.")
+    prefix = _text(request, "prefix")
+    limit = _limit(request)
+    ignore_case = _flag(request.get("ignore_case", False))
+    if _flag(request.get("regex", False)):
+        try:
+            pattern = re.compile(query, re.IGNORECASE if ignore_case else 0)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+        matches_line = pattern.search
+        contains = pattern.search
+    else:
+        needle = query.lower() if ignore_case else query
+        if ignore_case:
+            matches_line = lambda line: needle in line.lower()
+        else:
+            matches_line = lambda line: needle in line
+        contains = matches_line
+
+    matches = []
+    truncated = False
+    for path in sorted(files):
+        if not path.startswith(prefix):
+            continue
+        content = files[path]
+        # Whole-file check first: most files do not match at all
+        if not contains(content):
+            continue
+        for line_number, line in enumerate(content.split('\n'), 1):
+            if matches_line(line):
+                if len(matches) == limit:
+                    truncated = True
+                    break
+                matches.append({"path": path, "line": line_number, "text": line.strip()[:MAX_MATCH_LINE]})
+        if truncated:
+            break
+    return {"matches": matches, "truncated": truncated}
+
+
+def _answer(state: dict, op: str, request: dict) -> tuple[int, dict]:
+    """Computes the response of one request (called with the state lock held)."""
+    files = state["files"]
+    try:
+        if op == "list":
+            prefix = _text(request, "prefix")
+            paths = sorted(p for p in files if p.startswith(prefix))
+            return 200, {"files": paths, "count": len(paths)}
+        if op == "get":
+            path = _text(request, "path")
+            if path not in files:
+                return 404, {"error": f"File not found: '{path}'"}
+            return 200, {"path": path, "content": files[path]}
+        if op == "subtree":
+            folder = _text(request, "path").strip('/')
+            subtree = build_subtree(files, folder, state["root"].name)
+            if subtree is None:
+                return 404, {"error": f"Folder not found: '{folder}'"}
+            return 200, subtree
+        if op == "search":
+            return 200, _search(files, request)
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    return 400, {"error": f"Unknown operation '{op}'. Expected one of: {', '.join(OPERATIONS)}"}
+
+
+def answer_request(state: dict, request: dict) -> tuple[int, bytes]:
+    """
+    Answers one request.
+
+    Requests are dictionaries with an "op" ("list", "get", "subtree",
+    "search", "refresh" or "stats") and its parameters: "prefix" (list,
+    search), "path" (get, subtree), "query", "regex", "ignore_case" and
+    "limit" (search). Parameters of the wrong type (or a "limit" that is not
+    a positive integer) are answered with 400. Responses of list, get,
+    subtree and search are cached until the snapshot changes.
+
+    Args:
+        state: State created by new_snapshot_state().
+        request: The request.
+
+    Returns:
+        Tuple of (HTTP-style status code, UTF-8 encoded JSON response).
+    """
+    op = request.get("op")
+    if op == "refresh":
+        status, response = 200, state["refresh"]()
+    elif op == "stats":
+        with state["lock"]:
+            response = {
+                "root": str(state["root"]),
+                "files": len(state["files"]),
+                "chars": sum(len(content) for content in state["files"].values()),
+                "generation": state["generation"],
+                "requests": state["requests"],
+                "cache_entries": len(state["cache"]),
+                "cache_hits": state["cache_hits"],
+                "cache_misses": state["cache_misses"],
+                "last_refresh": state["last_refresh"],
+            }
+        status = 200
+    else:
+        key = json.dumps(request, sort_keys=True)
+        with state["lock"]:
+            state["requests"] += 1
+            cache = state["cache"]
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                state["cache_hits"] += 1
+                return cached
+            state["cache_misses"] += 1
+            status, response = _answer(state, op, request)
+            body = json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            if status == 200 and state["cache_entries"] > 0:
+                cache[key] = (status, body)
+                if len(cache) > state["cache_entries"]:
+                    cache.popitem(last=False)
+            return status, body
+    return status, json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+# --- Transports ---
+
+def _answer_safely(state: dict, request: dict, logger: logging.Logger) -> tuple[int, bytes]:
+    """Answers one request; an unexpected error is answered with 500 instead of stopping the server."""
+    try:
+        return answer_request(state, request)
+    except Exception as e:
+        logger.exception(f"Unexpected error answering request {request!r}")
+        return 500, json.dumps({"error": f"Internal error: {e}"}, ensure_ascii=False,
+                               separators=(',', ':')).encode('utf-8')
+
+def serve_stdio(state: dict, logger: logging.Logger, input_stream=None, output_stream=None):
+    """
+    Serves JSON-line requests from stdin until it is closed.
+
+    Each input line is one request object; each answer is written as one
+    line: the response object, with "status" added for errors.
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout.buffer
+    logger.info("Serving snapshot requests on stdio (one JSON request per line).")
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            status, body = 400, json.dumps({"error": f"Invalid request: {e}"}, separators=(',', ':')).encode('utf-8')
+        else:
+            status, body = _answer_safely(state, request, logger)
+        if status != 200 and body.startswith(b'{"error"'):
+            body = body[:-1] + f',"status":{status}}}'.encode('utf-8')
+        output_stream.write(body + b"\n")
+        output_stream.flush()
+
+
+def serve_http(state: dict, port: int, logger: logging.Logger, host: str = "127.0.0.1"):
+    """
+    Serves the snapshot over HTTP on localhost until interrupted.
+
+    Endpoints are the operations (GET /list, /get, /subtree, /search,
+    /refresh, /stats) with their parameters in the query string, e.g.
+    /get?path=Domain/Model/Asset.cs or /search?query=TODO&prefix=Domain/.
+    """
+    class SnapshotRequestHandler(BaseHTTPRequestHandler):
+        """Maps GET requests to answer_request()."""
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            request = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            request["op"] = url.path.strip('/') or "stats"
+            status, body = _answer_safely(state, request, logger)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("HTTP %s", format % args)
+
+    server = ThreadingHTTPServer((host, port), SnapshotRequestHandler)
+    server.daemon_threads = True
+    logger.info(f"Serving snapshot on http://{host}:{server.server_port}/ (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Server stopped.")
+    finally:
+        server.server_close()
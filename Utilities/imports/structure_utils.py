@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for rendering a project structure map.
+The structure is a stream of (event, level, payload) tuples, produced by
+list_project_structure.py's directory walk or by merge_code.py's folder
+processing (--structure), and written as a Markdown nested list, compact
+indented text or JSON.
+Uses the built-in 'json' library.
+"""
+
+import json
+
+# --- Constants ---
+# Structure events consumed by the renderers
+EVENT_FILE = "file"
+EVENT_ENTER = "enter"
+EVENT_LEAVE = "leave"
+EVENT_SKIPPED = "skipped"
+EVENT_COLLAPSED = "collapsed"
+
+
+# --- Renderers ---
+
+def render_markdown(events, output_fh, root_name: str, indent_unit: str):
+    """Writes the structure events as a Markdown nested list."""
+    # Write the header
+    output_fh.write("# Project Structure\n\n")
+    for event, level, payload in events:
+        current_indent = indent_unit * level
+        if event == EVENT_FILE:
+            output_fh.write(f"{current_indent}- {payload}\n")
+        elif event == EVENT_ENTER:
+            # Write directory name (bold)
+            output_fh.write(f"{current_indent}- **{payload}**\n")
+        elif event == EVENT_SKIPPED:
+            dir_name, reason = payload
+            output_fh.write(f"{current_indent}- *[Skipped: {reason} {dir_name}]*\n")
+        elif event == EVENT_COLLAPSED:
+            file_count, dir_count = payload
+            output_fh.write(f"{current_indent}- *[Collapsed: {file_count} files, {dir_count} directories]*\n")
+
+
+def render_text(events, output_fh, root_name: str, indent_unit: str):
+    """Writes the structure events as compact indented text (directories end with '/')."""
+    output_fh.write(f"{root_name}/\n")
+    for event, level, payload in events:
+        current_indent = indent_unit * (level + 1)
+        if event == EVENT_FILE:
+            output_fh.write(f"{current_indent}{payload}\n")
+        elif event == EVENT_ENTER:
+            output_fh.write(f"{current_indent}{payload}/\n")
+        elif event == EVENT_SKIPPED:
+            dir_name, reason = payload
+            output_fh.write(f"{current_indent}[skipped: {reason} {dir_name}]\n")
+        elif event == EVENT_COLLAPSED:
+            file_count, dir_count = payload
+            output_fh.write(f"{current_indent}[{file_count} files, {dir_count} directories]\n")
+
+
+def render_json(events, output_fh, root_name: str, indent_unit: str):
+    """
+    Writes the structure events as compact JSON, using the same folder/file
+    node layout as merge_code.py (without file contents).
+    """
+    # One flag per open folder: True until its first child has been written
+    first_child = [True]
+
+    def write_node(text: str):
+        if not first_child[-1]:
+            output_fh.write(",")
+        first_child[-1] = False
+        output_fh.write(text)
+
+    output_fh.write(f'{{"type":"folder","name":{json.dumps(root_name, ensure_ascii=False)},"children":[')
+    for event, level, payload in events:
+        if event == EVENT_FILE:
+            write_node(f'{{"type":"file","name":{json.dumps(payload, ensure_ascii=False)}}}')
+        elif event == EVENT_ENTER:
+            write_node(f'{{"type":"folder","name":{json.dumps(payload, ensure_ascii=False)},"children":[')
+            first_child.append(True)
+        elif event == EVENT_LEAVE:
+            first_child.pop()
+            output_fh.write("]}")
+        elif event == EVENT_SKIPPED:
+            dir_name, reason = payload
+            write_node(json.dumps({"type": "skipped", "name": dir_name, "reason": reason},
+                                  ensure_ascii=False, separators=(',', ':')))
+        elif event == EVENT_COLLAPSED:
+            file_count, dir_count = payload
+            write_node(f'{{"type":"collapsed","files":{file_count},"folders":{dir_count}}}')
+    output_fh.write("]}\n")
+
+
+RENDERERS = {
+    "markdown": (render_markdown, ".md"),
+    "json": (render_json, ".json"),
+    "text": (render_text, ".txt"),
+}
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for timing script steps and the processes they run.
+Records wall time, CPU time and peak memory per step and per child process
+in a plain dictionary that can be written as a JSON run report or printed
+as a summary table.
+Uses the built-in 'resource' library where available (not on Windows,
+where only wall times are recorded).
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- Constants ---
+RUN_REPORT_VERSION = 1
+
+
+def _usage_seconds(usage) -> tuple[float, float]:
+    """Returns (user CPU seconds, system CPU seconds) of a resource usage record."""
+    return usage.ru_utime, usage.ru_stime
+
+
+def peak_rss_bytes(usage) -> int:
+    """Converts ru_maxrss to bytes (it is reported in bytes on macOS and in KiB elsewhere)."""
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def current_peak_rss_bytes() -> int | None:
+    """Returns the peak RSS of this process so far (None where 'resource' is unavailable)."""
+    return peak_rss_bytes(resource.getrusage(resource.RUSAGE_SELF)) if resource else None
+
+
+def new_run_report(command: str) -> dict:
+    """
+    Creates an empty run report.
+
+    Args:
+        command: Name of the script (or command) being timed.
+
+    Returns:
+        Report dictionary that steps are added to by timed_step().
+    """
+    return {
+        "version": RUN_REPORT_VERSION,
+        "command": command,
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "wall_seconds": 0.0,
+        "status": "running",
+        "steps": [],
+        "_start": time.perf_counter(),
+    }
+
+
+@contextmanager
+def timed_step(run_report: dict, name: str):
+    """
+    Times one step of a run and adds it to the run report.
+
+    The CPU time of the step is split into the script's own time and the
+    time of the child processes that finished during the step; the peak RSS
+    of the step is that of its largest process. Processes run by the step
+    are listed in the yielded step's "processes" list (see
+    run_timed_process()). A step left by an exception (including
+    sys.exit()) is recorded as failed.
+
+    Args:
+        run_report: Report created by new_run_report().
+        name: Step name.
+
+    Yields:
+        The step dictionary (extra keys, e.g. "skipped", may be added to it).
+    """
+    step = {"name": name, "status": "ok", "wall_seconds": 0.0, "processes": []}
+    run_report["steps"].append(step)
+    self_before = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    start = time.perf_counter()
+    try:
+        yield step
+    except BaseException:
+        step["status"] = "failed"
+        raise
+    finally:
+        step["wall_seconds"] = round(time.perf_counter() - start, 3)
+        if resource:
+            self_after = resource.getrusage(resource.RUSAGE_SELF)
+            children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            step["self_cpu_seconds"] = round(sum(_usage_seconds(self_after)) - sum(_usage_seconds(self_before)), 3)
+            step["children_cpu_seconds"] = round(
+                sum(_usage_seconds(children_after)) - sum(_usage_seconds(children_before)), 3)
+            # The script's own peak is a high-water mark for the whole run, so it is kept apart
+            step["self_peak_rss_bytes"] = peak_rss_bytes(self_after)
+            process_peaks = [p["peak_rss_bytes"] for p in step["processes"] if p.get("peak_rss_bytes")]
+            step["peak_rss_bytes"] = max(process_peaks) if process_peaks else None
+
+
+def run_timed_process(command_args: list[str], timings: list | None, **popen_kwargs) -> int:
+    """
+    Runs a process to completion and records its wall time, CPU time and peak RSS.
+
+    The process is reaped with os.wait4() where available, so the figures
+    belong to this process (and the descendants it waited for) even when
+    several processes run concurrently.
+
+    Args:
+        command_args: The command and its arguments.
+        timings: List the process record is appended to (None to not record).
+        **popen_kwargs: Passed on to subprocess.Popen.
+
+    Returns:
+        The exit code of the process.
+
+    Raises:
+        OSError: If the process cannot be started (e.g. FileNotFoundError).
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command_args, **popen_kwargs)
+    record = {"command": command_args[0], "args": command_args[1:]}
+    try:
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            # Tell Popen the process is reaped so it does not wait for it again
+            process.returncode = os.waitstatus_to_exitcode(status)
+            user_seconds, system_seconds = _usage_seconds(usage)
+            record.update(user_cpu_seconds=round(user_seconds, 3), system_cpu_seconds=round(system_seconds, 3),
+                          peak_rss_bytes=peak_rss_bytes(usage))
+        else:
+            process.wait()
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - start, 3)
+        record["exit_code"] = process.returncode
+        if timings is not None:
+            timings.append(record)
+    return process.returncode
+
+
+def finish_run_report(run_report: dict, status: str):
+    """Stores the total wall time and final status of a run."""
+    run_report["wall_seconds"] = round(time.perf_counter() - run_report["_start"], 3)
+    run_report["status"] = status
+
+
+def write_run_report(run_report: dict, report_path: Path, logger: logging.Logger) -> bool:
+    """
+    Writes a run report as JSON.
+
+    Args:
+        run_report: Report created by new_run_report().
+        report_path: Destination file.
+        logger: Logger instance.
+
+    Returns:
+        True if the report was written, False otherwise.
+    """
+    try:
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as report_fh:
+            json.dump({k: v for k, v in run_report.items() if not k.startswith('_')}, report_fh, indent=2)
+        logger.info(f"Run report written to: {report_path}")
+        return True
+    except OSError as e:
+        logger.warning(f"Could not write run report '{report_path}': {e}")
+        return False
+
+
+def format_timing_table(run_report: dict) -> list[str]:
+    """
+    Formats the steps and processes of a run report as a summary table.
+
+    Returns:
+        Table lines (without trailing newlines).
+    """
+    def cell(value, unit=""):
+        return "-" if value is None else f"{value:.1f}{unit}"
+
+    lines = [f"{'Step / process':40}  {'Wall':>9}  {'CPU':>9}  {'Peak RSS':>10}  Status"]
+    for step in run_report["steps"]:
+        cpu = None
+        if "children_cpu_seconds" in step:
+            cpu = step["self_cpu_seconds"] + step["children_cpu_seconds"]
+        rss = step.get("peak_rss_bytes")
+        status = "skipped" if step.get("skipped") else step["status"]
+        lines.append(f"{step['name'][:40]:40}  {cell(step['wall_seconds'], 's'):>9}  {cell(cpu, 's'):>9}  "
+                     f"{cell(rss / 1048576 if rss else None, ' MB'):>10}  {status}")
+        for process in step["processes"]:
+            cpu = None
+            if "user_cpu_seconds" in process:
+                cpu = process["user_cpu_seconds"] + process["system_cpu_seconds"]
+            rss = process.get("peak_rss_bytes")
+            label = "  " + " ".join([process["command"]] + process["args"][:1])
+            lines.append(f"{label[:40]:40}  {cell(process['wall_seconds'], 's'):>9}  {cell(cpu, 's'):>9}  "
+                         f"{cell(rss / 1048576 if rss else None, ' MB'):>10}  exit {process['exit_code']}")
+    lines.append(f"{'Total':40}  {cell(run_report['wall_seconds'], 's'):>9}")
+    return lines
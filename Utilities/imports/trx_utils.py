@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utility functions for test durations.
+Streams Visual Studio TRX test result files (written by 'dotnet test
+--logger trx') with iterparse, ranks the slowest tests, classes and
+projects, keeps a rolling duration history per project and class, and
+plans time-balanced shards of test projects from that history.
+Uses the built-in 'xml.etree.ElementTree' library.
+
+Test results are dictionaries:
+    {"project": str, "class": str, "name": str, "seconds": float, "outcome": str}
+"""
+
+import heapq
+import json
+import logging
+import statistics
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# --- Constants ---
+DURATION_HISTORY_VERSION = 1
+# Number of recent runs kept per project and class
+DURATION_HISTORY_RUNS = 10
+
+
+def parse_trx_duration(duration: str) -> float:
+    """
+    Converts a TRX duration ("hh:mm:ss.fffffff", optionally prefixed by "d.") to seconds.
+
+    Returns:
+        The duration in seconds (0.0 if it cannot be parsed).
+    """
+    try:
+        days = 0
+        hours, minutes, seconds = duration.split(':')
+        if '.' in hours:
+            days, hours = hours.split('.', 1)
+        return int(days) * 86400 + int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except ValueError:
+        return 0.0
+
+
+def read_trx(trx_path: Path, logger: logging.Logger) -> list[dict] | None:
+    """
+    Streams a TRX file and returns its test results.
+
+    Only top-level results are returned: the inner results of data-driven
+    tests are already included in their parent's duration.
+
+    Args:
+        trx_path: Path to the .trx file.
+        logger: Logger instance.
+
+    Returns:
+        List of test result dictionaries, or None if the file cannot be read.
+    """
+    results = []           # (test id, test name, seconds, outcome)
+    definitions = {}       # test id -> (project, class)
+    result_depth = 0
+    test_id = storage = class_name = None
+    try:
+        for event, elem in ET.iterparse(trx_path, events=('start', 'end')):
+            # TRX files use the TeamTest XML namespace
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if event == 'start':
+                if tag == 'UnitTestResult':
+                    result_depth += 1
+                elif tag == 'UnitTest':
+                    test_id, storage, class_name = elem.get('id'), elem.get('storage', ''), ''
+                continue
+
+            # --- 'end' events ---
+            if tag == 'UnitTestResult':
+                result_depth -= 1
+                if result_depth == 0:
+                    results.append((elem.get('testId'), elem.get('testName', ''),
+                                    parse_trx_duration(elem.get('duration', '')), elem.get('outcome', '')))
+                    elem.clear()
+            elif tag == 'TestMethod':
+                # className may be assembly-qualified ("Ns.Class, Assembly, Version=...")
+                class_name = elem.get('className', '').split(',', 1)[0].strip()
+            elif tag == 'UnitTest':
+                project = Path(storage.replace('\\', '/')).stem if storage else trx_path.stem
+                definitions[test_id] = (project, class_name)
+                elem.clear()
+    except (ET.ParseError, OSError) as e:
+        logger.error(f"Could not read TRX file '{trx_path}': {e}")
+        return None
+
+    tests = []
+    for result_id, name, seconds, outcome in results:
+        project, class_name = definitions.get(result_id, (trx_path.stem, ''))
+        tests.append({"project": project, "class": class_name, "name": name,
+                      "seconds": seconds, "outcome": outcome})
+    logger.debug(f"Read {len(tests)} test results from '{trx_path}'.")
+    return tests
+
+
+def read_trx_files(trx_paths: list[Path], logger: logging.Logger) -> list[dict]:
+    """Reads the test results of several TRX files (unreadable files are skipped)."""
+    tests = []
+    for trx_path in trx_paths:
+        tests.extend(read_trx(trx_path, logger) or [])
+    return tests
+
+
+def total_durations(tests: list[dict], key: str) -> dict[str, float]:
+    """
+    Sums test durations by a result key ("project" or "class").
+
+    Returns:
+        Dictionary mapping each key value to its total seconds.
+    """
+    totals: dict[str, float] = {}
+    for test in tests:
+        totals[test[key]] = totals.get(test[key], 0.0) + test["seconds"]
+    return totals
+
+
+def log_slowest(tests: list[dict], top: int, logger: logging.Logger):
+    """Logs the slowest projects, classes and tests of a run."""
+    if not tests:
+        logger.info("No test results found.")
+        return
+    logger.info(f"{len(tests)} tests ran for {sum(t['seconds'] for t in tests):.1f}s in total.")
+    for title, key in (("projects", "project"), ("classes", "class")):
+        totals = total_durations(tests, key)
+        logger.info(f"Slowest {title}:")
+        for name, seconds in heapq.nlargest(top, totals.items(), key=lambda item: item[1]):
+            logger.info(f"  {seconds:9.2f}s  {name}")
+    logger.info("Slowest tests:")
+    for test in heapq.nlargest(top, tests, key=lambda t: t["seconds"]):
+        logger.info(f"  {test['seconds']:9.2f}s  {test['class']}.{test['name']} ({test['outcome']})")
+
+
+def load_duration_history(history_path: Path, logger: logging.Logger) -> dict:
+    """
+    Loads the duration history (recent total seconds per project and class).
+
+    Returns:
+        Dictionary {"version", "projects": {name: [seconds, ...]}, "classes": {name: [seconds, ...]}}
+        (empty history if the file is missing, unreadable or of another version).
+    """
+    history = {"version": DURATION_HISTORY_VERSION, "projects": {}, "classes": {}}
+    try:
+        with open(history_path, 'r', encoding='utf-8') as history_fh:
+            data = json.load(history_fh)
+        if data.get("version") == DURATION_HISTORY_VERSION:
+            history["projects"] = data.get("projects", {})
+            history["classes"] = data.get("classes", {})
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Could not read duration history '{history_path}'. Ignoring it. Error: {e}")
+    return history
+
+
+def update_duration_history(history: dict, tests: list[dict]):
+    """Appends the project and class totals of a run to the history, keeping the last runs only."""
+    for section, key in (("projects", "project"), ("classes", "class")):
+        for name, seconds in total_durations(tests, key).items():
+            samples = history[section].setdefault(name, [])
+            samples.append(round(seconds, 3))
+            del samples[:-DURATION_HISTORY_RUNS]
+
+
+def save_duration_history(history: dict, history_path: Path, logger: logging.Logger):
+    """Writes the duration history."""
+    try:
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(history_path, 'w', encoding='utf-8') as history_fh:
+            json.dump(history, history_fh, indent=2)
+        logger.debug(f"Duration history written to: {history_path}")
+    except OSError as e:
+        logger.warning(f"Could not write duration history '{history_path}': {e}")
+
+
+def estimate_durations(project_names: list[str], history: dict) -> dict[str, float]:
+    """
+    Estimates the duration of each project from the median of its recent runs.
+
+    Projects without history get the median estimate of the known projects
+    (1 second if nothing is known), so new projects are neither ignored nor
+    treated as the slowest.
+
+    Returns:
+        Dictionary mapping each project name to its estimated seconds.
+    """
+    known = {name.lower(): statistics.median(samples)
+             for name, samples in history["projects"].items() if samples}
+    default = statistics.median(known.values()) if known else 1.0
+    return {name: known.get(name.lower(), default) for name in project_names}
+
+
+def plan_shards(project_names: list[str], history: dict, shard_count: int) -> list[tuple[float, list[str]]]:
+    """
+    Splits projects into time-balanced shards.
+
+    Uses the longest-processing-time-first heuristic: projects are taken
+    from slowest to fastest and each is added to the currently shortest
+    shard.
+
+    Args:
+        project_names: Names of the projects to distribute.
+        history: Duration history (see load_duration_history()).
+        shard_count: Number of shards.
+
+    Returns:
+        List of (estimated seconds, project names) per shard, in shard order.
+    """
+    estimates = estimate_durations(project_names, history)
+    shards = [(0.0, index, []) for index in range(max(1, shard_count))]
+    heapq.heapify(shards)
+    for name in sorted(project_names, key=lambda n: (-estimates[n], n)):
+        seconds, index, names = heapq.heappop(shards)
+        names.append(name)
+        heapq.heappush(shards, (seconds + estimates[name], index, names))
+    return [(round(seconds, 3), names) for seconds, _, names in sorted(shards, key=lambda shard: shard[1])]
@@ -34,7 +34,7 @@ def process_xml_content(xml_string: str, logger: logging.Logger, file_path_for_l
         # pretty_print=False ensures no extra whitespace is added back.
         compacted_xml = etree.tostring(root, encoding='unicode', pretty_print=False)
 
-        logger.debug(f"Successfully compacted XML content from {file_path_for_log.name}")
+        logger.debug("Successfully compacted XML content from %s", file_path_for_log.name)
         return compacted_xml
     except etree.XMLSyntaxError as e:
         # Log a warning if the XML is invalid
@@ -2,82 +2,197 @@
 # -*- coding: utf-8 -*-
 
 """
-Generates a Markdown file representing a project directory structure as a
-nested list. Excludes specified directories and includes only specified
-file extensions based on command-line arguments or defaults.
+Generates a file representing a project directory structure as a Markdown
+nested list, compact indented text or JSON. Excludes specified directories
+and includes only specified file extensions based on command-line arguments
+or defaults.
+Directory listings are kept in a snapshot cache keyed by directory path and
+mtime, so unchanged subtrees are not re-listed on the next run.
 """
 
 import argparse
+import json
 import logging
+import os
 import sys
 from pathlib import Path
 
+# Assuming 'imports' is a folder in the same directory as this script.
+try:
+    from imports.profile_utils import add_profile_arguments, run_main
+    from imports.structure_utils import EVENT_COLLAPSED, EVENT_ENTER, EVENT_FILE, EVENT_LEAVE, EVENT_SKIPPED, RENDERERS
+except ImportError as e:
+    print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'profile_utils.py', 'structure_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
 # --- Constants ---
 # Default indentation string (two spaces per level)
 DEFAULT_INDENT_SPACES = "  "
+# Bump when the layout of the snapshot cache file changes
+SNAPSHOT_CACHE_VERSION = 1
 
 # --- Logging Setup ---
 log = logging.getLogger(__name__)
 # Basic configuration will be done in main()
 
+# --- Snapshot Cache ---
+
+def load_snapshot_cache(cache_path: Path) -> dict:
+    """
+    Loads the directory snapshot cache written by a previous run.
+
+    Args:
+        cache_path: Path to the JSON cache file.
+
+    Returns:
+        Dictionary mapping directory paths to their cached snapshot
+        (empty if the cache is missing, unreadable or from another version).
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as cache_fh:
+            data = json.load(cache_fh)
+    except FileNotFoundError:
+        log.debug(f"No snapshot cache found at '{cache_path}'.")
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning(f"Could not read snapshot cache '{cache_path}'. Ignoring it. Error: {e}")
+        return {}
+
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_CACHE_VERSION:
+        log.info(f"Snapshot cache '{cache_path}' has an unsupported format. Ignoring it.")
+        return {}
+    return data.get("directories", {})
+
+
+def save_snapshot_cache(cache_path: Path, snapshots: dict):
+    """
+    Writes the directory snapshot cache atomically (temp file + replace).
+
+    Args:
+        cache_path: Path to the JSON cache file.
+        snapshots: Dictionary mapping directory paths to their snapshot.
+    """
+    temp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as cache_fh:
+            json.dump({"version": SNAPSHOT_CACHE_VERSION, "directories": snapshots},
+                      cache_fh, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, cache_path)
+        log.debug(f"Saved snapshot cache with {len(snapshots)} directories to '{cache_path}'.")
+    except OSError as e:
+        log.warning(f"Could not write snapshot cache '{cache_path}': {e}")
+        temp_path.unlink(missing_ok=True)
+
+
+def scan_directory(current_dir: Path, old_snapshots: dict, new_snapshots: dict) -> tuple[list[str], list[str]]:
+    """
+    Lists the files and subdirectories of a directory, reusing the cached
+    snapshot when the directory mtime has not changed since the last run.
+
+    Args:
+        current_dir: Path object for the directory to list.
+        old_snapshots: Snapshots loaded from the previous run (may be empty).
+        new_snapshots: Snapshots collected by this run (updated in place).
+
+    Returns:
+        Tuple of (file names, directory names), each sorted case-insensitively.
+
+    Raises:
+        OSError: If the directory cannot be stat'ed or listed.
+    """
+    key = str(current_dir)
+    mtime_ns = os.stat(current_dir).st_mtime_ns
+
+    cached = old_snapshots.get(key)
+    if cached is not None and cached.get("mtime_ns") == mtime_ns:
+        new_snapshots[key] = cached
+        return cached["files"], cached["dirs"]
+
+    files = []
+    dirs = []
+    # Separate files and directories
+    with os.scandir(current_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(entry.name)
+            elif entry.is_file():
+                files.append(entry.name)
+
+    # Sort files and directories alphabetically (case-insensitive)
+    files.sort(key=str.lower)
+    dirs.sort(key=str.lower)
+
+    new_snapshots[key] = {"mtime_ns": mtime_ns, "files": files, "dirs": dirs}
+    return files, dirs
+
+
 # --- Core Logic ---
 
-def process_directory(current_dir: Path, level: int, output_fh,
-                      exclude_dirs: set, allowed_exts: set, indent_unit: str):
+def walk_directory(current_dir: Path, level: int,
+                   exclude_dirs: set, allowed_exts: set,
+                   old_snapshots: dict, new_snapshots: dict,
+                   max_depth: int | None = None, collapse_over: int | None = None):
     """
-    Recursively processes a directory, writing its structure to the output file handle.
+    Recursively walks a directory, yielding its structure as a stream of events.
+
+    Only the listing of the directories on the current path is held in memory,
+    so renderers can write the output as the walk progresses.
 
     Args:
         current_dir: Path object for the directory to process.
         level: Current recursion depth (integer, starting from 0).
-        output_fh: File handle for the output Markdown file.
         exclude_dirs: Set of lowercase directory names to exclude.
         allowed_exts: Set of lowercase file extensions (with dot) to include.
-        indent_unit: String used for one level of indentation.
-    """
-    # Calculate indentation string for the current level
-    current_indent = indent_unit * level
-    files = []
-    dirs = []
+        old_snapshots: Directory snapshots from the previous run (empty to force a rescan).
+        new_snapshots: Directory snapshots collected by this run (updated in place).
+        max_depth: Maximum number of levels to list (None for unlimited).
+        collapse_over: Fold subdirectories with more included entries than this
+                       into a summary line (None to never collapse).
 
+    Yields:
+        Tuples of (event, level, payload):
+        - (EVENT_FILE, level, file_name)
+        - (EVENT_ENTER, level, dir_name) and later (EVENT_LEAVE, level, dir_name)
+        - (EVENT_SKIPPED, level, (dir_name, reason))
+        - (EVENT_COLLAPSED, level, (file_count, dir_count))
+    """
     try:
-        # Separate files and directories, handle potential access errors
-        for item in current_dir.iterdir():
-            if item.is_dir():
-                dirs.append(item)
-            elif item.is_file():
-                files.append(item)
+        files, dirs = scan_directory(current_dir, old_snapshots, new_snapshots)
     except PermissionError:
         log.warning(f"Permission denied reading directory: {current_dir}. Skipping.")
-        output_fh.write(f"{current_indent}- *[Skipped: Permission Denied reading {current_dir.name}]*\n")
+        yield EVENT_SKIPPED, level, (current_dir.name, "Permission Denied reading")
         return
     except OSError as e:
         log.warning(f"Could not read directory {current_dir}. Skipping. Error: {e}")
-        output_fh.write(f"{current_indent}- *[Skipped: Error reading {current_dir.name}]*\n")
+        yield EVENT_SKIPPED, level, (current_dir.name, "Error reading")
         return
 
-    # Sort files alphabetically (case-insensitive)
-    files.sort(key=lambda p: p.name.lower())
-    # Sort directories alphabetically (case-insensitive)
-    dirs.sort(key=lambda p: p.name.lower())
+    # Check file extensions and directory names (case-insensitive)
+    included_files = [f for f in files if os.path.splitext(f)[1].lower() in allowed_exts]
+    included_dirs = [d for d in dirs if d.lower() not in exclude_dirs]
+
+    # The starting directory itself is never collapsed
+    if collapse_over is not None and level > 0 and len(included_files) + len(included_dirs) > collapse_over:
+        log.debug(f"Collapsing directory: {current_dir}")
+        yield EVENT_COLLAPSED, level, (len(included_files), len(included_dirs))
+        return
 
     # --- Process Files First ---
-    for file_item in files:
-        # Check if the file extension is allowed (case-insensitive)
-        if file_item.suffix.lower() in allowed_exts:
-            output_fh.write(f"{current_indent}- {file_item.name}\n")
+    for file_name in included_files:
+        yield EVENT_FILE, level, file_name
 
     # --- Process Directories Second ---
-    for dir_item in dirs:
-        # Check if the directory name should be excluded (case-insensitive)
-        if dir_item.name.lower() not in exclude_dirs:
-            # Write directory name (bold)
-            output_fh.write(f"{current_indent}- **{dir_item.name}**\n")
-            # Recursively call for the subdirectory with increased level
-            process_directory(dir_item, level + 1, output_fh,
-                              exclude_dirs, allowed_exts, indent_unit)
-        else:
-            log.debug(f"Excluding directory: {dir_item}")
+    for dir_name in included_dirs:
+        yield EVENT_ENTER, level, dir_name
+        if max_depth is None or level + 1 < max_depth:
+            # Recursively walk the subdirectory with increased level
+            yield from walk_directory(current_dir / dir_name, level + 1,
+                                      exclude_dirs, allowed_exts,
+                                      old_snapshots, new_snapshots,
+                                      max_depth, collapse_over)
+        yield EVENT_LEAVE, level, dir_name
 
 
 def main():
@@ -89,7 +204,7 @@ def main():
 
     # --- Argument Parsing ---
     parser = argparse.ArgumentParser(
-        description="Generate a Markdown project structure list.",
+        description="Generate a project structure list (Markdown, JSON or indented text).",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter # Show defaults in help
     )
     parser.add_argument(
@@ -100,8 +215,27 @@ def main():
     )
     parser.add_argument(
         "-o", "--output",
-        default="Design/PROJECT_STRUCTURE.md",
-        help="Path to the output Markdown file."
+        default=None, # Default calculated later
+        help="Path to the output file (default: Design/PROJECT_STRUCTURE with the extension of --format)."
+    )
+    parser.add_argument(
+        "--format",
+        choices=sorted(RENDERERS),
+        default="markdown",
+        help="Output format."
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        help="Maximum number of directory levels to list (default: unlimited)."
+    )
+    parser.add_argument(
+        "--collapse-over",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Fold subdirectories with more than N included entries into a summary line."
     )
     parser.add_argument(
         "--exclude-dirs",
@@ -119,12 +253,24 @@ def main():
         default=2,
         help="Number of spaces per indentation level."
     )
+    parser.add_argument(
+        "--cache-file",
+        default=None, # Default calculated later
+        help="Path to the directory snapshot cache (default: the output path with a .cache.json extension)."
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Ignore the snapshot cache and rescan every directory."
+    )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
         help="Enable verbose (DEBUG) logging."
     )
 
+    add_profile_arguments(parser)
+
     args = parser.parse_args()
 
     # --- Setup Logging ---
@@ -133,23 +279,40 @@ def main():
 
     # --- Process Arguments ---
     start_path = Path(args.start_dir)
-    output_file_path = Path(args.output)
+    renderer, default_ext = RENDERERS[args.format]
+    output_file_path = Path(args.output) if args.output else Path("Design/PROJECT_STRUCTURE" + default_ext)
     # Convert comma-separated strings from args to sets of lowercase strings
     exclude_dirs_set = {d.strip().lower() for d in args.exclude_dirs.split(',') if d.strip()}
     allowed_exts_set = {e.strip().lower() for e in args.allowed_exts.split(',') if e.strip() and e.startswith('.')}
     indent_unit = " " * args.indent
+    cache_file_path = Path(args.cache_file) if args.cache_file else output_file_path.with_suffix(".cache.json")
 
     log.info(f"Starting directory: {start_path.resolve()}")
-    log.info(f"Output file: {output_file_path}")
+    log.info(f"Output file: {output_file_path} (format: {args.format})")
+    log.info(f"Snapshot cache: {cache_file_path}" + (" (rebuilding)" if args.rebuild else ""))
     log.debug(f"Excluded directories: {exclude_dirs_set}")
     log.debug(f"Allowed extensions: {allowed_exts_set}")
     log.debug(f"Indentation: {args.indent} spaces")
+    log.debug(f"Max depth: {args.max_depth}, collapse over: {args.collapse_over}")
+
+    if args.max_depth is not None and args.max_depth < 1:
+        log.error("--max-depth must be at least 1.")
+        sys.exit(1)
+    if args.collapse_over is not None and args.collapse_over < 0:
+        log.error("--collapse-over must not be negative.")
+        sys.exit(1)
 
     # --- Validate Start Directory ---
     if not start_path.is_dir():
         log.error(f"Starting directory not found or is not a directory: '{start_path}'")
         sys.exit(1)
 
+    # --- Load Snapshot Cache ---
+    # Snapshots are keyed by absolute path so the cache survives a change of CWD
+    start_path = start_path.resolve()
+    old_snapshots = {} if args.rebuild else load_snapshot_cache(cache_file_path)
+    new_snapshots = {}
+
     # --- Execute ---
     try:
         # Ensure the output directory exists
@@ -158,15 +321,23 @@ def main():
 
         # Open the output file for writing
         with open(output_file_path, 'w', encoding='utf-8') as output_fh:
-            # Write the header
-            output_fh.write("# Project Structure\n\n")
-
-            # Start processing from the specified directory
+            # Start processing from the specified directory, rendering as the walk progresses
             log.info("Processing directory structure...")
-            process_directory(start_path, 0, output_fh,
-                              exclude_dirs_set, allowed_exts_set, indent_unit)
+            events = walk_directory(start_path, 0,
+                                    exclude_dirs_set, allowed_exts_set,
+                                    old_snapshots, new_snapshots,
+                                    args.max_depth, args.collapse_over)
+            renderer(events, output_fh, start_path.name, indent_unit)
 
         log.info(f"Project structure saved successfully to '{output_file_path}'")
+        reused = sum(1 for key, snapshot in new_snapshots.items() if old_snapshots.get(key) is snapshot)
+        log.info(f"Scanned {len(new_snapshots)} directories ({reused} reused from snapshot cache).")
+
+        # A full walk keeps only the directories it visited, so removed subtrees drop out
+        # of the cache; a limited walk keeps the snapshots of the subtrees it did not reach
+        if args.max_depth is not None or args.collapse_over is not None:
+            new_snapshots = {**old_snapshots, **new_snapshots}
+        save_snapshot_cache(cache_file_path, new_snapshots)
 
     except OSError as e:
         log.error(f"Could not create/write output file '{output_file_path}': {e}")
@@ -176,4 +347,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "list_project_structure")
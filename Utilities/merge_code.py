@@ -13,8 +13,14 @@ Imports utilities from an 'imports' subfolder.
 import os
 import sys
 import argparse
+import atexit
+import hashlib
 import logging
+import logging.handlers
 import json
+import locale
+import queue
+import time
 from pathlib import Path
 
 # Assuming 'imports' is a folder in the same directory as this script
@@ -23,31 +29,92 @@ from pathlib import Path
 try:
     from imports.json_utils import process_json_content
     from imports.xml_utils import process_xml_content
-    from imports.csharp_utils import process_csharp_content
+    from imports.csharp_utils import chunk_csharp_content, process_csharp_content
+    from imports.checkpoint_utils import (NOT_CHECKPOINTED, checkpoint_path_for, close_checkpoint, flush_checkpoint,
+                                          lookup_checkpoint, open_checkpoint, record_checkpoint)
+    from imports.metrics_utils import finish_metrics, new_metrics, output_size, record_file, write_metrics
+    from imports.profile_utils import add_profile_arguments, run_main
+    from imports.structure_utils import EVENT_ENTER, EVENT_FILE, EVENT_LEAVE, EVENT_SKIPPED, RENDERERS
+    from imports.snapshot_utils import (flatten_snapshot, new_snapshot_state, refresh_snapshot, serve_http,
+                                        serve_stdio, start_refresh_thread)
 except ImportError as e:
     print(f"FATAL: Could not import utility functions from 'imports' folder. {e}", file=sys.stderr)
-    print(f"Ensure 'xml_utils.py', 'json_utils.py', 'csharp_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
+    print(f"Ensure 'xml_utils.py', 'json_utils.py', 'csharp_utils.py', 'checkpoint_utils.py', 'metrics_utils.py', 'profile_utils.py', 'snapshot_utils.py', 'structure_utils.py' exist in an 'imports' subfolder.", file=sys.stderr)
     sys.exit(1)
 
+# --- Default Configurations ---
+DEFAULT_EXCLUDE_DIRS = ".git,.vs,.cursor,.github,.vscode,migrations,obj,bin,pkg,lib,node_modules,properties,testresults,coveragereports,uploads"
+DEFAULT_ALLOWED_EXTS = ".md,.slnx,.sln,.csproj,.cs,.razor,.json,.xml,.vbproj,.fsproj,.shproj,.proj,.props,.targets,.nuspec,.config,.settings,.resx,.runsettings,.ruleset,.pubxml,.xdt,.vcxproj.filter,.py,.cmd,.sh"
+DEFAULT_XML_EXTS = ".xml,.slnx,.csproj,.vbproj,.fsproj,.shproj,.proj,.props,.targets,.nuspec,.config,.settings,.resx,.runsettings,.ruleset,.pubxml,.xdt,.vcxproj.filter"
+DEFAULT_JSON_EXTS = ".json"
+DEFAULT_CSHARP_EXTS = ".cs"
+
 # --- Logging Setup ---
 # Logger instance configured in main()
 log = logging.getLogger(__name__)
 
 # --- Helper Functions ---
 
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the formatting to the listener thread.
+
+    The stdlib QueueHandler.prepare() formats the message (the %-interpolation)
+    on the calling thread so records can cross process boundaries; the queue
+    here stays in this process, so the record is queued as is. Log arguments
+    are therefore formatted later: callers pass immutable values (strings,
+    numbers, paths).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def start_log_listener(logger: logging.Logger, handlers: list[logging.Handler],
+                       level: int) -> logging.handlers.QueueListener:
+    """
+    Routes a logger through a queue to the given handlers.
+
+    The logging call only puts the record on the queue (see
+    DeferredQueueHandler); a background listener thread interpolates and
+    formats it and does the console/file I/O, so the processing code is never
+    blocked by log output. The listener is stopped (and the queue flushed) at
+    interpreter exit.
+
+    Args:
+        logger: Logger to configure (the root logger for the script).
+        handlers: Handlers the listener writes to (their levels are respected).
+        level: Level of the logger.
+
+    Returns:
+        The started listener.
+    """
+    log_queue = queue.SimpleQueue()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    logger.setLevel(level)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
 def setup_logging(verbose_mode: bool, log_file_path: Path):
-    """Configures logging based on debug mode."""
-    log_level = logging.DEBUG if verbose_mode else logging.INFO
-    # Configure root logger
-    logging.basicConfig(level=log_level,
-                        format='%(asctime)s - %(levelname)s - %(message)s',
-                        datefmt='%Y-%m-%d %H:%M:%S',
-                        handlers=[logging.StreamHandler(sys.stderr)]) # Log basic info/errors to stderr
+    """
+    Configures logging based on debug mode.
 
-    log.info(f"Logging level set to {logging.getLevelName(log_level)}")
+    Records are written by a background listener (see start_log_listener()).
+    In debug mode the detailed DEBUG output goes to the log file only and the
+    console keeps INFO level, so each record is written (and formatted) once
+    per destination it is meant for.
+    """
+    log_level = logging.DEBUG if verbose_mode else logging.INFO
+    # Log basic info/errors to stderr
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    handlers: list[logging.Handler] = [console_handler]
 
+    file_error = None
     if verbose_mode:
-        log.info(f"Debug mode enabled.")
         try:
              # Ensure parent directory exists for the log file
              log_file_path.parent.mkdir(parents=True, exist_ok=True)
@@ -55,17 +122,26 @@ def setup_logging(verbose_mode: bool, log_file_path: Path):
              file_handler = logging.FileHandler(log_file_path, mode='w', encoding='utf-8')
              file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
              file_handler.setFormatter(file_formatter)
-             # Add handler ONLY to our specific logger, not root, to avoid duplicate console logs
-             log.addHandler(file_handler)
-             # Set propagate to False if using basicConfig AND adding handler to specific logger
-             # log.propagate = False # Avoid double logging to console if basicConfig used stream handler
-             log.info(f"Logging detailed debug output to: {log_file_path}")
+             handlers.append(file_handler)
+             # The console does not repeat the DEBUG records written to the file
+             console_handler.setLevel(logging.INFO)
         except OSError as e:
-             log.warning(f"Could not create or write to log file '{log_file_path}': {e}")
+             file_error = e
+
+    start_log_listener(logging.getLogger(), handlers, log_level)
+    log.info(f"Logging level set to {logging.getLevelName(log_level)}")
+
+    if verbose_mode:
+        log.info(f"Debug mode enabled.")
+        if file_error is None:
+             log.info(f"Logging detailed debug output to: {log_file_path}")
+        else:
+             log.warning(f"Could not create or write to log file '{log_file_path}': {file_error}")
 
 def read_file_content(file_path: Path, logger: logging.Logger,
                       xml_exts: set, json_exts: set, csharp_exts: set,
-                      compact_xml_flag: bool, compact_json_flag: bool) -> str | None:
+                      compact_xml_flag: bool, compact_json_flag: bool,
+                      metrics: dict | None = None) -> str | None:
     """
     Reads file content, handles BOM, applies type-specific processing conditionally.
 
@@ -77,72 +153,116 @@ def read_file_content(file_path: Path, logger: logging.Logger,
         csharp_exts: Set of lowercase C# extensions.
         compact_xml_flag: Boolean indicating if XML should be compacted.
         compact_json_flag: Boolean indicating if JSON should be compacted.
+        metrics: Run metrics updated with the time and sizes of this file (see imports.metrics_utils).
 
     Returns:
         Processed content string, empty string on read error, or None if excluded.
     """
-    logger.debug(f"Reading content of: {file_path}")
+    # Hot path: debug messages are only formatted when DEBUG is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Reading content of: %s", file_path)
+    start_time = time.perf_counter()
+    raw_bytes = None
+    try:
+        raw_bytes = file_path.read_bytes()
+    except OSError as e:
+        logger.error(f"OS error reading {file_path}: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error reading {file_path}: {e}")
+
+    if raw_bytes is None:
+        if metrics is not None:
+            metrics["read_errors"] += 1
+        return "" # Return empty string on error
+    read_time = time.perf_counter()
+
     raw_content = None
     try:
-        raw_content = file_path.read_text(encoding='utf-8', errors='strict')
-        logger.debug(f"Successfully read {file_path} as UTF-8.")
+        raw_content = raw_bytes.decode('utf-8', errors='strict')
+        if debug:
+            logger.debug("Successfully read %s as UTF-8.", file_path)
     except UnicodeDecodeError as e_utf8:
         logger.warning(f"Encoding error reading {file_path} as UTF-8: {e_utf8}. Trying default encoding.")
         try:
-            raw_content = file_path.read_text(encoding=None, errors='replace')
-            logger.debug(f"Successfully read {file_path} with default encoding.")
+            raw_content = raw_bytes.decode(locale.getpreferredencoding(False), errors='replace')
+            if debug:
+                logger.debug("Successfully read %s with default encoding.", file_path)
         except Exception as e_fallback:
             logger.error(f"Error reading {file_path} with default encoding: {e_fallback}")
-            return "" # Return empty string on error as per user's version
-    except OSError as e:
-        logger.error(f"OS error reading {file_path}: {e}")
-        return "" # Return empty string on error
-    except Exception as e:
-        logger.error(f"Unexpected error reading {file_path}: {e}")
-        return "" # Return empty string on error
+            raw_content = None
 
     if raw_content is None:
-         return ""
+        if metrics is not None:
+            metrics["read_errors"] += 1
+        return "" # Return empty string on error as per user's version
+
+    # Translate line endings like Path.read_text() (universal newlines)
+    if '\r' in raw_content:
+        raw_content = raw_content.replace('\r\n', '\n').replace('\r', '\n')
 
     if raw_content.startswith('\ufeff'):
-        logger.debug(f"Removing leading ZWNBSP/BOM from {file_path.name}")
+        if debug:
+            logger.debug("Removing leading ZWNBSP/BOM from %s", file_path.name)
         raw_content = raw_content[1:]
+    decode_time = time.perf_counter()
 
     file_ext_lower = file_path.suffix.lower()
 
     # --- Apply processing based on extension and flags ---
+    processor = None
+    content = raw_content
     if file_ext_lower in xml_exts:
         if compact_xml_flag:
-            logger.debug(f"Attempting XML compaction for {file_path.name}...")
-            return process_xml_content(raw_content, logger, file_path)
-        else:
-            logger.debug(f"XML compaction disabled for {file_path.name}, using raw content.")
-            return raw_content # Compaction disabled
+            if debug:
+                logger.debug("Attempting XML compaction for %s...", file_path.name)
+            processor = "xml"
+            content = process_xml_content(raw_content, logger, file_path)
+        elif debug:
+            logger.debug("XML compaction disabled for %s, using raw content.", file_path.name)
 
     elif file_ext_lower in json_exts:
         if compact_json_flag:
-            logger.debug(f"Attempting JSON compaction for {file_path.name}...")
-            return process_json_content(raw_content, logger, file_path)
-        else:
-            logger.debug(f"JSON compaction disabled for {file_path.name}, using raw content.")
-            return raw_content # Compaction disabled
+            if debug:
+                logger.debug("Attempting JSON compaction for %s...", file_path.name)
+            processor = "json"
+            content = process_json_content(raw_content, logger, file_path)
+        elif debug:
+            logger.debug("JSON compaction disabled for %s, using raw content.", file_path.name)
 
     elif file_ext_lower in csharp_exts:
-        logger.debug(f"Attempting C# processing for {file_path.name}...")
-        return process_csharp_content(raw_content, logger, file_path)
+        if debug:
+            logger.debug("Attempting C# processing for %s...", file_path.name)
+        processor = "csharp"
+        content = process_csharp_content(raw_content, logger, file_path)
 
-    else:
-        # File type not designated for special processing
-        return raw_content
+    # Otherwise the file type is not designated for special processing
+
+    if metrics is not None:
+        end_time = time.perf_counter()
+        stages = metrics["stages"]
+        stages["read"] += read_time - start_time
+        stages["decode"] += decode_time - read_time
+        if processor is not None:
+            stages[processor] += end_time - decode_time
+        record_file(metrics, file_path, len(raw_bytes),
+                    None if content is None else output_size(metrics, content), end_time - start_time)
+    return content
 
 
 def process_folder(folder_path: Path, base_processing_dir: Path, logger: logging.Logger,
                    exclude_dirs: set, allowed_exts: set,
                    xml_exts: set, json_exts: set, csharp_exts: set,
-                   compact_xml_flag: bool, compact_json_flag: bool) -> dict | None:
+                   compact_xml_flag: bool, compact_json_flag: bool,
+                   metrics: dict | None = None,
+                   structure: list | None = None, level: int = 0,
+                   checkpoint: dict | None = None) -> dict | None:
     """
     Recursively processes a folder, building a dictionary representation.
 
+    Each folder is listed once; the same listing also feeds the structure map
+    (--structure), so a combined run does not walk the tree twice.
+
     Args:
         folder_path: Path object for the folder currently being processed.
         base_processing_dir: Top-level directory processing started from.
@@ -154,50 +274,97 @@ def process_folder(folder_path: Path, base_processing_dir: Path, logger: logging
         csharp_exts: Set of lowercase C# extensions for processing.
         compact_xml_flag: Boolean indicating if XML should be compacted.
         compact_json_flag: Boolean indicating if JSON should be compacted.
+        metrics: Run metrics updated with folder and file counters (see imports.metrics_utils).
+        structure: List extended with the structure events of this folder
+                   (see imports.structure_utils), in list_project_structure.py order:
+                   files first, then folders, each sorted case-insensitively.
+        level: Depth of this folder below the processed folder (for the structure events).
+        checkpoint: Checkpoint of the run (see imports.checkpoint_utils): unchanged files
+                    recorded by an interrupted run are taken from it, processed files are added to it.
 
     Returns:
         A dictionary representing the folder structure, or None if empty/excluded.
     """
+    # Hot path: debug messages are only formatted when DEBUG is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
     folder_name = folder_path.name
     try:
         log_rel_path = folder_path.relative_to(base_processing_dir)
     except ValueError:
         log_rel_path = folder_path
 
-    logger.debug(f"Processing folder: {log_rel_path}")
+    if debug:
+        logger.debug("Processing folder: %s", log_rel_path)
     children = []
+    if metrics is not None:
+        metrics["folders"] += 1
 
+    file_names = []
+    dir_names = []
     try:
-        items = sorted(folder_path.iterdir())
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dir_names.append(entry.name)
+                elif entry.is_file():
+                    file_names.append(entry.name)
     except PermissionError:
         logger.warning(f"Permission denied reading directory: {folder_path}. Skipping.")
+        if structure is not None:
+            structure.append((EVENT_SKIPPED, level, (folder_name, "Permission Denied reading")))
         return None
     except OSError as e:
         logger.error(f"Error reading directory {folder_path}: {e}")
+        if structure is not None:
+            structure.append((EVENT_SKIPPED, level, (folder_name, "Error reading")))
         return None
 
-    for item in items:
-        if item.is_dir():
+    # Structure events of each included subfolder, by name
+    subfolder_structures = {}
+    dir_name_set = set(dir_names)
+    for item in sorted(folder_path / name for name in file_names + dir_names):
+        if item.name in dir_name_set:
             if item.name.lower() not in exclude_dirs:
-                logger.debug(f"  Found allowed subdir: {item.name}, processing recursively...")
+                if debug:
+                    logger.debug("  Found allowed subdir: %s, processing recursively...", item.name)
+                subfolder_structure = None
+                if structure is not None:
+                    subfolder_structure = subfolder_structures[item.name] = []
                 subfolder_data = process_folder(
                     item, base_processing_dir, logger,
                     exclude_dirs, allowed_exts,
                     xml_exts, json_exts, csharp_exts, # Pass sets
-                    compact_xml_flag, compact_json_flag # Pass flags
+                    compact_xml_flag, compact_json_flag, # Pass flags
+                    metrics, subfolder_structure, level + 1, checkpoint
                 )
                 if subfolder_data:
                     children.append(subfolder_data)
-            else:
-                logger.debug(f"  Excluding subdir: {item.name}")
-        elif item.is_file():
+            elif debug:
+                logger.debug("  Excluding subdir: %s", item.name)
+        else:
             if item.suffix.lower() in allowed_exts:
-                logger.debug(f"  Found allowed file: {item.name}")
-                # Pass extension sets and compaction flags to read_file_content
-                file_content = read_file_content(
-                    item, logger, xml_exts, json_exts, csharp_exts,
-                    compact_xml_flag, compact_json_flag
-                )
+                if debug:
+                    logger.debug("  Found allowed file: %s", item.name)
+                file_content = NOT_CHECKPOINTED
+                stat = None
+                if checkpoint is not None:
+                    # Stamped before reading, so a file saved meanwhile is not reused with its old content
+                    try:
+                        stat = os.stat(item)
+                    except OSError:
+                        pass
+                    else:
+                        file_content = lookup_checkpoint(checkpoint, item, stat)
+                if file_content is NOT_CHECKPOINTED:
+                    # Pass extension sets and compaction flags to read_file_content
+                    file_content = read_file_content(
+                        item, logger, xml_exts, json_exts, csharp_exts,
+                        compact_xml_flag, compact_json_flag, metrics
+                    )
+                    if stat is not None:
+                        record_checkpoint(checkpoint, item, stat, file_content, logger)
+                elif metrics is not None:
+                    metrics["resumed_files"] += 1
 
                 if file_content is not None: # Check for exclusion signal
                     children.append({
@@ -205,16 +372,26 @@ def process_folder(folder_path: Path, base_processing_dir: Path, logger: logging
                         "name": item.name,
                         "content": file_content
                     })
-                else:
-                    logger.debug(f"  Skipping file {item.name} due to exclusion signal.")
-            else:
-                logger.debug(f"  Excluding file: {item.name} (extension {item.suffix})")
+                elif debug:
+                    logger.debug("  Skipping file %s due to exclusion signal.", item.name)
+            elif debug:
+                logger.debug("  Excluding file: %s (extension %s)", item.name, item.suffix)
+
+    if structure is not None:
+        for file_name in sorted(file_names, key=str.lower):
+            if os.path.splitext(file_name)[1].lower() in allowed_exts:
+                structure.append((EVENT_FILE, level, file_name))
+        for dir_name in sorted(subfolder_structures, key=str.lower):
+            structure.append((EVENT_ENTER, level, dir_name))
+            structure.extend(subfolder_structures[dir_name])
+            structure.append((EVENT_LEAVE, level, dir_name))
 
     if not children:
-        logger.debug(f"Skipping empty or fully excluded folder: {log_rel_path}")
+        if debug:
+            logger.debug("Skipping empty or fully excluded folder: %s", log_rel_path)
         return None
 
-    logger.info(f"Finished processing folder '{log_rel_path}'. Found {len(children)} included items.")
+    logger.info("Finished processing folder '%s'. Found %s included items.", log_rel_path, len(children))
     return {
         "type": "folder",
         "name": folder_name,
@@ -222,36 +399,47 @@ def process_folder(folder_path: Path, base_processing_dir: Path, logger: logging
     }
 
 
-# --- Main Execution ---
+def write_chunks(root_data: dict, output_fh, csharp_exts: set, logger: logging.Logger,
+                 metrics: dict | None = None) -> int:
+    """
+    Writes the merged tree in the 'chunks' layout: one JSON object per line.
 
-def main():
-    """Parses arguments, sets up logging, and starts the merge process."""
+    C# files are split into namespace, type and member chunks (see
+    imports.csharp_utils.chunk_csharp_content); any other file is one chunk
+    of kind "file". Paths start with the name of the processed folder.
 
-    # --- Default Configurations ---
-    DEFAULT_EXCLUDE_DIRS = ".git,.vs,.cursor,.github,.vscode,migrations,obj,bin,pkg,lib,node_modules,properties,testresults,coveragereports,uploads"
-    DEFAULT_ALLOWED_EXTS = ".md,.slnx,.sln,.csproj,.cs,.razor,.json,.xml,.vbproj,.fsproj,.shproj,.proj,.props,.targets,.nuspec,.config,.settings,.resx,.runsettings,.ruleset,.pubxml,.xdt,.vcxproj.filter,.py,.cmd,.sh"
-    DEFAULT_XML_EXTS = ".xml,.slnx,.csproj,.vbproj,.fsproj,.shproj,.proj,.props,.targets,.nuspec,.config,.settings,.resx,.runsettings,.ruleset,.pubxml,.xdt,.vcxproj.filter"
-    DEFAULT_JSON_EXTS = ".json"
-    DEFAULT_CSHARP_EXTS = ".cs"
+    Args:
+        root_data: The merged root folder node from process_folder().
+        output_fh: Text file handle the JSON lines are written to.
+        csharp_exts: Set of lowercase C# extensions.
+        logger: Logger instance.
+        metrics: Run metrics updated with the chunking time.
 
-    # --- Argument Parsing ---
-    parser = argparse.ArgumentParser(
-        description="Merge source files from CWD into a single JSON file. Optionally compacts XML/JSON, processes C#.",
-        # Corrected epilog to be a static example
-        epilog="Example: python path/to/script/merge_script.py Source -d --compact-xml --compact-json",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter
-    )
-    parser.add_argument(
-        "relative_path",
-        nargs='?',
-        default="Source",
-        help="Path relative to the current working directory to process."
-    )
-    parser.add_argument(
-        "-o", "--output",
-        default=None, # Default calculated later
-        help="Path to the output JSON file (default: <CWD_Name>.<Input_Rel_Path>.<Output_Extension> in CWD)."
-    )
+    Returns:
+        Number of chunks written.
+    """
+    count = 0
+    for path, content in sorted(flatten_snapshot(root_data).items()):
+        relative_path = f"{root_data['name']}/{path}"
+        if os.path.splitext(path)[1].lower() in csharp_exts:
+            start_time = time.perf_counter()
+            chunks = chunk_csharp_content(content, relative_path, logger)
+            if metrics is not None:
+                metrics["stages"]["chunk"] += time.perf_counter() - start_time
+        else:
+            line_count = content.count('\n') + (0 if content.endswith('\n') or not content else 1)
+            chunks = [{"id": relative_path, "path": relative_path, "kind": "file", "name": path.rsplit('/', 1)[-1],
+                       "parent": None, "start_line": 1, "end_line": max(1, line_count),
+                       "hash": hashlib.blake2b(content.encode('utf-8'), digest_size=8).hexdigest(), "content": content}]
+        for chunk in chunks:
+            output_fh.write(json.dumps(chunk, ensure_ascii=False, separators=(',', ':')))
+            output_fh.write('\n')
+        count += len(chunks)
+    return count
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser):
+    """Adds the file selection and processing options shared by the merge and 'serve'."""
     parser.add_argument(
         "--exclude-dirs",
         default=DEFAULT_EXCLUDE_DIRS,
@@ -287,49 +475,26 @@ def main():
         action="store_true",
         help="Enable compaction for JSON files identified by --json-exts."
     )
-    parser.add_argument(
-        "-v", "--verbose",
-        action="store_true",
-        help="Enable verbose (DEBUG level) logging."
-    )
-    parser.add_argument(
-        "--output-ext",
-        default=".src",
-        help="Extension for the output file (e.g., .json, .src)."
-    )
-    parser.add_argument(
-        "--pretty-json",
-        action="store_true",
-        help="Indent the output JSON file for readability (default: compact)."
-    )
-
-
-    args = parser.parse_args()
-
-    # --- Setup Logging ---
-    log_file_path = Path.cwd() / "MergeCode.log"
-    setup_logging(args.verbose, log_file_path)
-
-    # --- Process Arguments ---
-    current_working_dir = Path.cwd()
-    log.info(f"Current Working Directory (base for operations): {current_working_dir}")
 
-    relative_path_input = args.relative_path
-    if relative_path_input in ('\\', '/'):
-        relative_path_input = '.'
+def parse_filter_sets(args: argparse.Namespace) -> tuple[set, set, set, set, set]:
+    """
+    Converts the comma-separated filter options to sets of lowercase strings.
 
-    # Convert comma-separated args to sets of lowercase strings
+    Returns:
+        Tuple of (exclude dirs, allowed exts, XML exts, JSON exts, C# exts).
+    """
     exclude_dirs_set = {d.strip().lower() for d in args.exclude_dirs.split(',') if d.strip()}
     allowed_exts_set = {e.strip().lower() for e in args.allowed_exts.split(',') if e.strip() and e.startswith('.')}
     xml_exts_set = {e.strip().lower() for e in args.xml_exts.split(',') if e.strip() and e.startswith('.')}
     json_exts_set = {e.strip().lower() for e in args.json_exts.split(',') if e.strip() and e.startswith('.')}
     csharp_exts_set = {e.strip().lower() for e in args.csharp_exts.split(',') if e.strip() and e.startswith('.')}
+    return exclude_dirs_set, allowed_exts_set, xml_exts_set, json_exts_set, csharp_exts_set
 
-    # Compaction flags
-    compact_xml_flag = args.compact_xml
-    compact_json_flag = args.compact_json
-
-    # --- Path Validation ---
+def resolve_target_dir(current_working_dir: Path, relative_path_input: str) -> Path:
+    """
+    Resolves the directory to process (relative to CWD, or absolute).
+    Logs an error and exits if the path is invalid.
+    """
     if ".." in relative_path_input:
         log.error("Parent path references ('..') are not allowed in relative_path.")
         sys.exit(1)
@@ -359,34 +524,286 @@ def main():
     if not absolute_path.is_dir():
         log.error(f"Resolved path '{absolute_path}' is not a directory.")
         sys.exit(1)
+    return absolute_path
+
+def default_output_path(current_working_dir: Path, relative_path_input: str, output_ext: str) -> Path:
+    """Returns the default output file: <CWD_Name>.<Input_Rel_Path><output_ext> in CWD."""
+    current_folder_name = current_working_dir.name or "Root"
+    relative_path_cleaned = relative_path_input.strip('.\\/')
+    if not relative_path_cleaned or relative_path_cleaned == '.':
+         relative_path_dots = ""
+    else:
+        relative_path_dots = relative_path_cleaned.replace('\\', '.').replace('/', '.').strip('.')
+
+    if not relative_path_dots:
+        file_name_base = current_folder_name
+    else:
+        file_name_base = f"{current_folder_name}.{relative_path_dots}"
+    # Use specified or default extension
+    output_filename = f"{file_name_base.replace(' ', '')}{output_ext}"
+    return current_working_dir / output_filename
+
+
+def serve_main(argv: list[str]):
+    """
+    Runs 'merge_code.py serve': a local server answering list, get, subtree
+    and search requests from a merged snapshot kept up to date with the tree.
+    """
+    parser = argparse.ArgumentParser(
+        prog="merge_code.py serve",
+        description="Serve a merged snapshot over stdio (JSON lines) or localhost HTTP, refreshing it incrementally as the tree changes.",
+        epilog="Example: python path/to/script/merge_code.py serve Source --compact-xml --compact-json --port 8765",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "relative_path",
+        nargs='?',
+        default="Source",
+        help="Path relative to the current working directory the snapshot is built from (and refreshed against)."
+    )
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        help="Merged snapshot to load (default: the merge output file; the tree is merged in memory if it does not exist). "
+             "Use the same filter and compaction options it was merged with."
+    )
+    parser.add_argument(
+        "--output-ext",
+        default=".src",
+        help="Extension of the default snapshot file."
+    )
+    add_filter_arguments(parser)
+    parser.add_argument(
+        "--stdio",
+        action="store_true",
+        help="Answer JSON-line requests on stdin/stdout instead of HTTP."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port of the HTTP server (bound to 127.0.0.1 only)."
+    )
+    parser.add_argument(
+        "--cache-entries",
+        type=int,
+        default=256,
+        help="Number of encoded responses kept in the LRU cache (0 disables it)."
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between two checks of the tree for changes (0 disables them; 'refresh' requests still work)."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable verbose (DEBUG level) logging: DEBUG output goes to MergeCode.log in the CWD and the console "
+             "stays at INFO (DEBUG on the console only if the log file cannot be created)."
+    )
+    add_profile_arguments(parser)
+
+    args = parser.parse_args(argv)
+    setup_logging(args.verbose, Path.cwd() / "MergeCode.log")
+
+    current_working_dir = Path.cwd()
+    relative_path_input = args.relative_path
+    if relative_path_input in ('\\', '/'):
+        relative_path_input = '.'
+    absolute_path = resolve_target_dir(current_working_dir, relative_path_input)
+    exclude_dirs_set, allowed_exts_set, xml_exts_set, json_exts_set, csharp_exts_set = parse_filter_sets(args)
+    snapshot_path = Path(args.snapshot) if args.snapshot else \
+        default_output_path(current_working_dir, relative_path_input, args.output_ext)
+
+    # Processed the same way as by a merge, so refreshed files match the snapshot
+    def read_content(file_path: Path) -> str | None:
+        return read_file_content(file_path, log, xml_exts_set, json_exts_set, csharp_exts_set,
+                                 args.compact_xml, args.compact_json)
+
+    start_time = time.perf_counter()
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as snapshot_fh:
+            files = flatten_snapshot(json.load(snapshot_fh))
+        snapshot_mtime_ns = snapshot_path.stat().st_mtime_ns
+        log.info(f"Loaded snapshot '{snapshot_path}' ({len(files)} files).")
+    except FileNotFoundError:
+        log.info(f"Snapshot '{snapshot_path}' not found. Merging '{absolute_path}' in memory...")
+        files = {}
+        snapshot_mtime_ns = 0
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.error(f"Could not load snapshot '{snapshot_path}': {e}")
+        sys.exit(1)
+
+    state = new_snapshot_state(absolute_path, files, snapshot_mtime_ns, args.cache_entries)
+    state["refresh"] = lambda: refresh_snapshot(state, exclude_dirs_set, allowed_exts_set, read_content, log)
+    state["refresh"]()
+    log.info(f"Snapshot of '{absolute_path}' ready: {len(state['files'])} files in {time.perf_counter() - start_time:.2f}s.")
+
+    if args.refresh_interval > 0:
+        start_refresh_thread(state, args.refresh_interval, log)
+    if args.stdio:
+        serve_stdio(state, log)
+    else:
+        try:
+            serve_http(state, args.port, log)
+        except OSError as e:
+            log.error(f"Could not start the HTTP server on port {args.port}: {e}")
+            sys.exit(1)
+
+
+# --- Main Execution ---
+
+def main():
+    """Parses arguments, sets up logging, and starts the merge process."""
+    # 'serve' runs the snapshot server instead of a merge
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve_main(sys.argv[2:])
+        return
+
+    # --- Argument Parsing ---
+    parser = argparse.ArgumentParser(
+        description="Merge source files from CWD into a single JSON file. Optionally compacts XML/JSON, processes C#.",
+        # Corrected epilog to be a static example
+        epilog="Example: python path/to/script/merge_script.py Source -d --compact-xml --compact-json",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "relative_path",
+        nargs='?',
+        default="Source",
+        help="Path relative to the current working directory to process."
+    )
+    parser.add_argument(
+        "-o", "--output",
+        default=None, # Default calculated later
+        help="Path to the output JSON file (default: <CWD_Name>.<Input_Rel_Path>.<Output_Extension> in CWD)."
+    )
+    add_filter_arguments(parser)
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable verbose (DEBUG level) logging: DEBUG output goes to MergeCode.log in the CWD and the console "
+             "stays at INFO (DEBUG on the console only if the log file cannot be created)."
+    )
+    parser.add_argument(
+        "--output-ext",
+        default=None,
+        help="Extension for the output file (e.g., .json, .src; default: .src, or .jsonl with --layout chunks)."
+    )
+    parser.add_argument(
+        "--pretty-json",
+        action="store_true",
+        help="Indent the output JSON file for readability (default: compact)."
+    )
+    parser.add_argument(
+        "--layout",
+        choices=("tree", "chunks"),
+        default="tree",
+        help="'tree': one JSON folder tree; 'chunks': JSON lines of files, with C# files split into namespace, "
+             "type and member chunks (stable IDs and line ranges)."
+    )
+    parser.add_argument(
+        "--structure",
+        nargs='?',
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Also write the project structure map (as list_project_structure.py does) from the same folder walk "
+             "(PATH default: Design/PROJECT_STRUCTURE with the extension of --structure-format)."
+    )
+    parser.add_argument(
+        "--structure-format",
+        choices=sorted(RENDERERS),
+        default="markdown",
+        help="Format of the structure map."
+    )
+    parser.add_argument(
+        "--structure-indent",
+        type=int,
+        default=2,
+        help="Number of spaces per indentation level of the structure map."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="Keep the processed files in <output>.checkpoint so an interrupted run can continue with --resume. "
+             "This writes all the processed content a second time (about doubling the output I/O)."
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between two flushes of the checkpoint to disk (with --checkpoint or --resume)."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted --checkpoint run from its checkpoint (files changed since are processed "
+             "again); implies --checkpoint."
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Write run metrics (time per stage, files and bytes in/out per extension, slowest files, peak RSS) to this JSON file."
+    )
+    parser.add_argument(
+        "--metrics-top",
+        type=int,
+        default=10,
+        help="Number of slowest files listed in the metrics."
+    )
+
+
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    if args.output_ext is None:
+        args.output_ext = ".jsonl" if args.layout == "chunks" else ".src"
+    run_start_time = time.perf_counter()
+
+    # --- Setup Logging ---
+    log_file_path = Path.cwd() / "MergeCode.log"
+    setup_logging(args.verbose, log_file_path)
+
+    # --- Process Arguments ---
+    current_working_dir = Path.cwd()
+    log.info(f"Current Working Directory (base for operations): {current_working_dir}")
+
+    relative_path_input = args.relative_path
+    if relative_path_input in ('\\', '/'):
+        relative_path_input = '.'
+
+    # Convert comma-separated args to sets of lowercase strings
+    exclude_dirs_set, allowed_exts_set, xml_exts_set, json_exts_set, csharp_exts_set = parse_filter_sets(args)
+
+    # Compaction flags
+    compact_xml_flag = args.compact_xml
+    compact_json_flag = args.compact_json
+
+    # --- Path Validation ---
+    absolute_path = resolve_target_dir(current_working_dir, relative_path_input)
 
     # --- Determine Output File Path ---
     if args.output:
         # If output is specified, use it directly but ensure correct extension
         output_file_path = Path(args.output).with_suffix(args.output_ext)
     else:
-        # Default output filename calculation
-        current_folder_name = current_working_dir.name or "Root"
-        relative_path_cleaned = relative_path_input.strip('.\\/')
-        if not relative_path_cleaned or relative_path_cleaned == '.':
-             relative_path_dots = ""
-        else:
-            relative_path_dots = relative_path_cleaned.replace('\\', '.').replace('/', '.').strip('.')
+        output_file_path = default_output_path(current_working_dir, relative_path_input, args.output_ext)
 
-        if not relative_path_dots:
-            file_name_base = current_folder_name
-        else:
-            file_name_base = f"{current_folder_name}.{relative_path_dots}"
-        # Use specified or default extension
-        output_filename = f"{file_name_base.replace(' ', '')}{args.output_ext}"
-        output_file_path = current_working_dir / output_filename
+    structure_renderer, structure_ext = RENDERERS[args.structure_format]
+    structure_file_path = None
+    if args.structure is not None:
+        structure_file_path = Path(args.structure or "Design/PROJECT_STRUCTURE" + structure_ext)
 
-    # Ensure output directory exists
-    try:
-        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-    except OSError as e:
-        log.error(f"Could not create output directory '{output_file_path.parent}': {e}")
-        sys.exit(1)
+    # Ensure output directories exist
+    output_dirs = [output_file_path.parent] + ([structure_file_path.parent] if structure_file_path else [])
+    for output_dir in output_dirs:
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            log.error(f"Could not create output directory '{output_dir}': {e}")
+            sys.exit(1)
 
     # --- Log Final Configuration ---
     log.info(f"Target directory to process: {absolute_path}")
@@ -396,37 +813,107 @@ def main():
     log.info(f"C# processing enabled for extensions: {csharp_exts_set}")
     log.debug(f"Excluded Directories: {exclude_dirs_set}")
     log.debug(f"Allowed Extensions (all included files): {allowed_exts_set}")
+    log.info(f"Output layout: {args.layout}")
+    if structure_file_path is not None:
+        log.info(f"Structure map location: {structure_file_path} (format: {args.structure_format})")
     log.info(f"Output JSON indented: {args.pretty_json}")
 
     # --- Execute Processing ---
+    # Metrics are cheap counters, always collected; --metrics only decides whether they are written
+    metrics = new_metrics(args.metrics_top, exact_sizes=args.metrics is not None)
+    # Structure events collected by the same folder walk (only with --structure)
+    structure_events = [] if structure_file_path is not None else None
+
+    # The outputs are written to temporary files and replaced at the end, so an interrupted
+    # run keeps the previous outputs; with --checkpoint its progress is kept for --resume
+    checkpoint = None
+    if args.checkpoint or args.resume:
+        checkpoint_settings = {
+            "target": str(absolute_path),
+            "exclude_dirs": sorted(exclude_dirs_set), "allowed_exts": sorted(allowed_exts_set),
+            "xml_exts": sorted(xml_exts_set), "json_exts": sorted(json_exts_set), "csharp_exts": sorted(csharp_exts_set),
+            "compact_xml": compact_xml_flag, "compact_json": compact_json_flag,
+        }
+        checkpoint = open_checkpoint(checkpoint_path_for(output_file_path), checkpoint_settings,
+                                     args.resume, args.checkpoint_interval, log)
+    temp_output_path = output_file_path.with_name(output_file_path.name + ".tmp")
+    temp_structure_path = structure_file_path.with_name(structure_file_path.name + ".tmp") if structure_file_path else None
+    committed = False
     try:
-        output_file_path.unlink(missing_ok=True) # Delete existing output file
+        process_start_time = time.perf_counter()
         root_data = process_folder(
             absolute_path, current_working_dir, log,
             exclude_dirs_set, allowed_exts_set,
             xml_exts_set, json_exts_set, csharp_exts_set, # Pass sets
-            compact_xml_flag, compact_json_flag # Pass flags
+            compact_xml_flag, compact_json_flag, # Pass flags
+            metrics, structure_events, 0, checkpoint
         )
+        process_seconds = time.perf_counter() - process_start_time
+        serialize_start_time = time.perf_counter()
 
         if root_data is None:
              log.warning(f"No allowed files or subdirectories found in '{absolute_path}'. Output file will be empty.")
-             output_file_path.write_text("{}", encoding='utf-8')
+             temp_output_path.write_text("" if args.layout == "chunks" else "{}", encoding='utf-8')
+        elif args.layout == "chunks":
+            log.info(f"Writing chunks to {output_file_path}...")
+            with open(temp_output_path, 'w', encoding='utf-8') as output_fh:
+                chunk_count = write_chunks(root_data, output_fh, csharp_exts_set, log, metrics)
         else:
             log.info(f"Writing JSON data to {output_file_path}...")
-            with open(output_file_path, 'w', encoding='utf-8') as output_fh:
+            with open(temp_output_path, 'w', encoding='utf-8') as output_fh:
                 # Control indentation based on flag
                 indent_level = 2 if args.pretty_json else None
                 # Use separators for compact JSON if not pretty printing
                 separators = (',', ':') if not args.pretty_json else (', ', ': ')
                 json.dump(root_data, output_fh, indent=indent_level, ensure_ascii=False, separators=separators)
+
+        if structure_file_path is not None:
+            with open(temp_structure_path, 'w', encoding='utf-8') as structure_fh:
+                structure_renderer(structure_events, structure_fh, absolute_path.name, " " * args.structure_indent)
+
+        # --- Commit Outputs ---
+        os.replace(temp_output_path, output_file_path)
+        if root_data is not None and args.layout == "chunks":
+            log.info(f"Successfully wrote {chunk_count} chunks to '{output_file_path}'")
+        elif root_data is not None:
             log.info(f"Successfully completed merging files into '{output_file_path}'")
+        if structure_file_path is not None:
+            os.replace(temp_structure_path, structure_file_path)
+            log.info(f"Project structure saved successfully to '{structure_file_path}'")
+        committed = True
+        # Chunking is counted in its own stage
+        metrics["stages"]["serialize"] += time.perf_counter() - serialize_start_time - metrics["stages"]["chunk"]
 
     except OSError as e:
         log.error(f"Aborted due to OS error during processing/writing: {e}")
         sys.exit(1)
+    except KeyboardInterrupt:
+        log.error("Interrupted.")
+        sys.exit(1)
     except Exception as e:
         log.exception("An unexpected error occurred during processing.")
         sys.exit(1)
+    finally:
+        temp_output_path.unlink(missing_ok=True)
+        if temp_structure_path is not None:
+            temp_structure_path.unlink(missing_ok=True)
+        if checkpoint is not None:
+            if not committed:
+                try:
+                    flush_checkpoint(checkpoint)
+                    log.info(f"Progress kept in checkpoint '{checkpoint['path']}'. Rerun with --resume to continue.")
+                except OSError as e:
+                    log.warning(f"Could not write checkpoint '{checkpoint['path']}': {e}")
+            close_checkpoint(checkpoint, remove=committed)
+
+    report = finish_metrics(metrics, process_seconds, time.perf_counter() - run_start_time)
+    if report["resumed_files"]:
+        log.info(f"Reused {report['resumed_files']} unchanged files from the checkpoint.")
+    log.info(f"Merged {report['files']} files ({report['bytes_in'] / 1048576:.1f} MB in, "
+             f"{report['bytes_out'] / 1048576:.1f} {'MB' if report['bytes_out_exact'] else 'M chars'} out) "
+             f"in {report['total_seconds']:.2f}s.")
+    if args.metrics:
+        write_metrics(report, Path(args.metrics), log)
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "merge_code")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks the Utilities scripts on a deterministic synthetic repository.
+Generates (or reuses) a synthetic .NET tree, times the walk, read, compact,
+merge (with and without DEBUG logging), serialize and clean benchmarks over
+several rounds, and saves or compares JSON baselines with a regression
+threshold.
+Runs offline with the standard library only.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Assuming 'benchmarks' is a folder in the same directory as this script.
+try:
+    from benchmarks.suite import BENCHMARKS
+    from benchmarks.synthetic_tree import PRESETS, generate_tree
+except ImportError as e:
+    print(f"FATAL: Could not import benchmark modules from 'benchmarks' folder. {e}", file=sys.stderr)
+    print(f"Ensure 'suite.py' and 'synthetic_tree.py' exist in a 'benchmarks' subfolder.", file=sys.stderr)
+    sys.exit(1)
+
+# --- Constants ---
+BASELINE_VERSION = 1
+DEFAULT_BASELINE_DIR = Path(__file__).resolve().parent / "benchmarks" / "baselines"
+
+# --- Logging Setup ---
+log = logging.getLogger(__name__)
+
+# --- Helper Functions ---
+
+def run_benchmark(name: str, tree_dir: Path, work_dir: Path, rounds: int, warmup: int,
+                  logger: logging.Logger) -> dict | None:
+    """
+    Times one benchmark.
+
+    Args:
+        name: Benchmark name (key of BENCHMARKS).
+        tree_dir: Synthetic tree the benchmark reads.
+        work_dir: Scratch directory for benchmarks that modify files.
+        rounds: Number of timed rounds.
+        warmup: Number of untimed rounds run first.
+        logger: Logger instance.
+
+    Returns:
+        Statistics in seconds {"rounds", "min", "max", "mean", "median", "stddev"},
+        or None if the benchmark could not run.
+    """
+    setup, run, setup_each_round = BENCHMARKS[name]
+    # The scripts' own logging is not what is being measured
+    script_logger = logging.getLogger(f"benchmarks.{name}")
+    script_logger.setLevel(logging.DEBUG if logger.isEnabledFor(logging.DEBUG) else logging.ERROR)
+    try:
+        state = setup(tree_dir, work_dir, script_logger)
+        timings = []
+        for round_index in range(warmup + rounds):
+            if setup_each_round and round_index:
+                state = setup(tree_dir, work_dir, script_logger)
+            start = time.perf_counter()
+            run(state)
+            elapsed = time.perf_counter() - start
+            if round_index >= warmup:
+                timings.append(elapsed)
+    except ImportError as e:
+        logger.warning(f"Skipping benchmark '{name}': {e}")
+        return None
+
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+def load_baseline(baseline_path: Path, logger: logging.Logger) -> dict | None:
+    """Loads a saved baseline (None if missing or unreadable)."""
+    try:
+        with open(baseline_path, 'r', encoding='utf-8') as baseline_fh:
+            baseline = json.load(baseline_fh)
+    except FileNotFoundError:
+        logger.error(f"Baseline not found: '{baseline_path}'. Save one with --save first.")
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read baseline '{baseline_path}': {e}")
+        return None
+    if baseline.get("version") != BASELINE_VERSION:
+        logger.error(f"Baseline '{baseline_path}' has an unsupported version.")
+        return None
+    return baseline
+
+def save_baseline(baseline_path: Path, tree_settings: dict, results: dict, logger: logging.Logger) -> bool:
+    """Writes the results of this run as a baseline."""
+    baseline = {
+        "version": BASELINE_VERSION,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "tree": tree_settings,
+        "benchmarks": results,
+    }
+    try:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as baseline_fh:
+            json.dump(baseline, baseline_fh, indent=2)
+        logger.info(f"Baseline saved to: {baseline_path}")
+        return True
+    except OSError as e:
+        logger.error(f"Could not write baseline '{baseline_path}': {e}")
+        return False
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compares median times with a baseline.
+
+    Args:
+        results: Statistics of this run by benchmark name.
+        baseline: Baseline loaded by load_baseline().
+        threshold: Allowed slowdown in percent before a benchmark counts as a regression.
+
+    Returns:
+        Names of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"{'Benchmark':12}  {'Baseline':>10}  {'Current':>10}  {'Change':>8}")
+    for name, stats in results.items():
+        base_stats = baseline["benchmarks"].get(name)
+        if base_stats is None:
+            print(f"{name:12}  {'-':>10}  {stats['median'] * 1000:9.1f}ms  {'new':>8}")
+            continue
+        change = 100.0 * (stats["median"] - base_stats["median"]) / base_stats["median"] if base_stats["median"] else 0.0
+        regressed = change > threshold
+        print(f"{name:12}  {base_stats['median'] * 1000:9.1f}ms  {stats['median'] * 1000:9.1f}ms  {change:+7.1f}%"
+              + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def print_results(results: dict):
+    """Prints the statistics of a run as a table (milliseconds)."""
+    print(f"{'Benchmark':12}  {'Min':>10}  {'Median':>10}  {'Mean':>10}  {'StdDev':>10}  Rounds")
+    for name, stats in results.items():
+        print(f"{name:12}  {stats['min'] * 1000:9.1f}ms  {stats['median'] * 1000:9.1f}ms  "
+              f"{stats['mean'] * 1000:9.1f}ms  {stats['stddev'] * 1000:9.1f}ms  {stats['rounds']}")
+
+
+# --- Main Execution ---
+
+def main():
+    """Parses arguments, prepares the synthetic tree and runs the benchmarks."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Utilities scripts on a deterministic synthetic repository.",
+        epilog="Example: python Utilities/run_benchmarks.py --preset medium --compare main --threshold 10",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "--preset",
+        choices=sorted(PRESETS),
+        default="medium",
+        help="Size of the synthetic tree."
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic tree.")
+    parser.add_argument("--projects", type=int, default=None, help="Override the number of projects of the preset.")
+    parser.add_argument("--files-per-project", type=int, default=None, help="Override the source files per project of the preset.")
+    parser.add_argument("--depth", type=int, default=None, help="Override the folder depth of the preset.")
+    parser.add_argument("--file-size", type=int, default=None, help="Override the average file size (bytes) of the preset.")
+    parser.add_argument(
+        "--tree",
+        default=None,
+        help="Directory for the synthetic tree. It is generated if missing and kept afterwards (default: a temporary directory)."
+    )
+    parser.add_argument(
+        "--only",
+        default=",".join(BENCHMARKS),
+        help="Comma-separated list of benchmarks to run."
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="Number of timed rounds per benchmark.")
+    parser.add_argument("--warmup", type=int, default=1, help="Number of untimed warm-up rounds per benchmark.")
+    parser.add_argument("--save", default=None, metavar="NAME", help="Save the results as baseline NAME.")
+    parser.add_argument("--compare", default=None, metavar="NAME", help="Compare the results with baseline NAME.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="Slowdown of the median in percent that counts as a regression in --compare."
+    )
+    parser.add_argument(
+        "--baseline-dir",
+        default=str(DEFAULT_BASELINE_DIR),
+        help="Directory of the saved baselines."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable verbose (DEBUG level) logging, including the scripts' own logging."
+    )
+
+    args = parser.parse_args()
+
+    # --- Setup Logging ---
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s', stream=sys.stderr)
+
+    names = [n.strip() for n in args.only.split(',') if n.strip()]
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        log.error(f"Unknown benchmarks: {', '.join(unknown)}. Available: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    if args.rounds < 1 or args.warmup < 0:
+        log.error("--rounds must be at least 1 and --warmup at least 0.")
+        sys.exit(1)
+
+    tree_settings = dict(PRESETS[args.preset], seed=args.seed)
+    for key in ("projects", "files_per_project", "depth", "file_size"):
+        if getattr(args, key) is not None:
+            tree_settings[key] = getattr(args, key)
+
+    baseline = None
+    baseline_dir = Path(args.baseline_dir)
+    if args.compare:
+        baseline = load_baseline(baseline_dir / f"{args.compare}.json", log)
+        if baseline is None:
+            sys.exit(1)
+        if baseline["tree"] != tree_settings:
+            log.warning(f"Baseline '{args.compare}' was taken on a different tree: {baseline['tree']}")
+
+    scratch_dir = Path(tempfile.mkdtemp(prefix="utilities-bench-"))
+    try:
+        tree_dir = Path(args.tree).resolve() if args.tree else scratch_dir / "tree"
+        if tree_dir.exists():
+            log.info(f"Using existing synthetic tree: {tree_dir}")
+        else:
+            log.info(f"Generating synthetic tree in {tree_dir}: {tree_settings}")
+            start = time.perf_counter()
+            stats = generate_tree(tree_dir, **tree_settings)
+            log.info(f"Generated {stats['files']} files ({stats['bytes'] / 1048576:.1f} MB, "
+                     f"{stats['source_files']} source files) in {time.perf_counter() - start:.1f}s.")
+
+        results = {}
+        for name in names:
+            log.info(f"Running benchmark '{name}' ({args.warmup} warm-up + {args.rounds} rounds)...")
+            stats = run_benchmark(name, tree_dir, scratch_dir / "work", args.rounds, args.warmup, log)
+            if stats is not None:
+                results[name] = stats
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if not results:
+        log.error("No benchmark could run.")
+        sys.exit(1)
+    print_results(results)
+
+    if args.save and not save_baseline(baseline_dir / f"{args.save}.json", tree_settings, results, log):
+        sys.exit(1)
+    if baseline is not None:
+        print()
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            log.error(f"{len(regressions)} benchmarks regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+        log.info(f"No benchmark regressed by more than {args.threshold:g}%.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regression cases for chunk_csharp_content() (merge_code.py --layout chunks).
+Run from the Utilities folder: python -m unittest discover -s tests -t .
+"""
+
+import logging
+import unittest
+
+from imports.csharp_utils import chunk_csharp_content
+
+# --- Constants ---
+HANDLERS_SOURCE = """namespace VttTools.Library.Handlers;
+
+internal static class AdventureHandlers {
+    internal static async Task<IResult> GetAdventureByIdHandler([FromRoute] Guid id, [FromServices] IAdventureService adventureService)
+        => await adventureService.GetAdventureByIdAsync(id) is { } adv
+            ? Results.Ok(adv)
+            : Results.NotFound();
+
+    internal static string Describe(int size) => size switch {
+        0 => "empty",
+        _ => "sized",
+    };
+
+    public static bool operator ==(AdventureHandlers left, AdventureHandlers right) {
+        return true;
+    }
+
+    internal static IResult DeleteHandler() {
+        return Results.NoContent();
+    }
+}
+"""
+
+
+def chunk(source: str) -> list[dict]:
+    """Chunks a C# source (warnings are not part of the cases)."""
+    return chunk_csharp_content(source, "Handlers.cs", logging.getLogger("tests"))
+
+
+class ExpressionBodyTests(unittest.TestCase):
+    """A '{' inside an expression body belongs to the member, not a new block."""
+
+    def setUp(self):
+        self.chunks = chunk(HANDLERS_SOURCE)
+        self.members = {c["name"]: c for c in self.chunks if c["kind"] in ("method", "operator")}
+
+    def test_property_pattern_does_not_split_member(self):
+        member = self.members["GetAdventureByIdHandler(Guid,IAdventureService)"]
+        self.assertEqual((member["start_line"], member["end_line"]), (4, 7))
+        self.assertNotIn("Results.Ok(adv)", self.members)
+
+    def test_switch_expression_body_ends_at_semicolon(self):
+        member = self.members["Describe(int)"]
+        self.assertEqual((member["start_line"], member["end_line"]), (9, 12))
+
+    def test_equality_operator_keeps_block_body(self):
+        member = self.members["operator==(AdventureHandlers,AdventureHandlers)"]
+        self.assertEqual((member["start_line"], member["end_line"]), (14, 16))
+
+    def test_every_line_is_in_one_chunk(self):
+        members = sorted((c["start_line"], c["end_line"]) for c in self.members.values())
+        self.assertEqual(len(members), 4)
+        for (_, end_line), (next_start, _) in zip(members, members[1:]):
+            self.assertLess(end_line, next_start)
+
+
+if __name__ == "__main__":
+    unittest.main()